@@ -1,65 +1,274 @@
-from fastapi import APIRouter, HTTPException, Header
-from pydantic import BaseModel, Field
-from typing import Optional, List
-from app.services.llm_service import analyze_claim
-from app.services.token_service import check_and_consume_token, get_free_trial_status
-from app.metrics import fact_check_requests, tokens_consumed
+import asyncio
+import time
+import orjson
+from fastapi import APIRouter, HTTPException, Header, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from starlette.background import BackgroundTask
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, List
+from app.config import get_settings
+from app.schemas.fact_check import ClaimRequest, ClaimPoint, SourceAnalysis, FactCheckResult
+from app.services import accounting
+from app.services.accounting import ledger
+from app.services.fact_check_service import iter_batch, run_fact_check, stream_fact_check
+from app.services.rate_limit import check_rate_limit, set_llm_priority
+from app.services.resilience import CircuitOpenError, LLMBusyError
+from app.services.token_service import (
+    check_and_consume_token, get_free_trial_status, refund_token, refund_reservation, reserve_tokens
+)
+from app.metrics import (
+    fact_check_batch_size, fact_check_requests, fact_check_stream_first_event, tokens_consumed, tokens_refunded
+)
 
 router = APIRouter()
 
 
-class ClaimRequest(BaseModel):
-    claim: str = Field(..., min_length=10, max_length=5000, description="The claim to fact-check")
-    language: str = Field(default="en", description="Response language code")
+class BatchCheckRequest(BaseModel):
+    claims: List[ClaimRequest] = Field(..., min_length=1, description="Claims to fact-check")
+    stream: bool = Field(default=False, description="Stream per-claim results as NDJSON in completion order")
 
 
-class ClaimPoint(BaseModel):
-    point: str
-    assessment: str  # "likely_true", "uncertain", "likely_false"
-    explanation: str
+class BatchItemResult(BaseModel):
+    index: int  # position in the request's claims list
+    status: str  # "ok", "error"
+    result: Optional[FactCheckResult] = None
+    error: Optional[str] = None
 
 
-class SourceAnalysis(BaseModel):
-    likely_origin: str
-    spread_pattern: str
-    red_flags: List[str]
+class BatchCheckResponse(BaseModel):
+    results: List[BatchItemResult]
+    tokens_charged: int
 
 
-class FactCheckResult(BaseModel):
-    credibility_score: float = Field(..., ge=0, le=100)
-    credibility_level: str  # "high", "medium", "low"
-    summary: str
-    key_points: List[ClaimPoint]
-    contradictions: List[str]
-    source_analysis: SourceAnalysis
-    disclaimer: str
+async def _consume_token(device_id: str) -> str:
+    """Consume a token for the device or fail with 402. Returns the kind of token used."""
+    with accounting.timed("token_check"):
+        can_use, reason = await check_and_consume_token(device_id)
+    if not can_use:
+        fact_check_requests.labels(tool="fact-checker", status="payment_required").inc()
+        raise HTTPException(
+            status_code=402,
+            detail={"error": reason, "code": "payment_required"}
+        )
+    return reason
+
+
+def _client_ip(http_request: Request) -> Optional[str]:
+    return http_request.client.host if http_request.client else None
+
+
+def _once(settle: Callable[..., Awaitable[None]]) -> Callable[..., Awaitable[None]]:
+    """Wrap a streamed response's settlement (token refund, ledger entry) so it runs exactly once.
+
+    The body generator settles when it ends, which includes the client going
+    away mid-stream; the settlement runs shielded so that disconnect cannot cut
+    it short. It is also the response's background task, for clients that
+    disconnect before the generator ever starts. Later calls, and their
+    arguments, are ignored.
+    """
+    task: Optional[asyncio.Task] = None
+
+    async def run(*args) -> None:
+        nonlocal task
+        if task is None:
+            task = asyncio.ensure_future(settle(*args))
+        await asyncio.shield(task)
+
+    return run
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
 
 
 @router.post("/check", response_model=FactCheckResult)
 async def check_claim(
     request: ClaimRequest,
+    http_request: Request,
     x_device_id: Optional[str] = Header(None, alias="X-Device-Id")
 ):
     """Analyze a claim for factual accuracy."""
+    await check_rate_limit(x_device_id, _client_ip(http_request))
     device_id = x_device_id or "anonymous"
-    
-    # Check token availability
-    can_use, reason = await check_and_consume_token(device_id)
-    if not can_use:
-        fact_check_requests.labels(tool="fact-checker", status="payment_required").inc()
-        raise HTTPException(
-            status_code=402,
-            detail={"error": reason, "code": "payment_required"}
-        )
+    entry = accounting.begin("check", device_id, request.language)
+    entry.token_kind = reason = await _consume_token(device_id)
+    set_llm_priority(reason, device_id)
     
     try:
-        result = await analyze_claim(request.claim, request.language)
+        result = await run_fact_check(request.claim, request.language)
+        entry.add_result(result)
         fact_check_requests.labels(tool="fact-checker", status="success").inc()
         tokens_consumed.labels(tool="fact-checker").inc()
         return result
     except Exception as e:
+        entry.status = "error"
         fact_check_requests.labels(tool="fact-checker", status="error").inc()
+        # A coalesced upstream failure reaches every waiting caller; none of them should pay for it
+        await refund_token(device_id, reason)
+        tokens_refunded.labels(tool="fact-checker", kind=reason).inc()
+        if isinstance(e, (CircuitOpenError, LLMBusyError)):
+            raise HTTPException(
+                status_code=503,
+                detail=f"Analysis failed: {str(e)}",
+                headers={"Retry-After": str(max(1, round(e.retry_in)))}
+            )
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+    finally:
+        await ledger.submit(entry)
+
+
+@router.post("/check/stream")
+async def check_claim_stream(
+    request: ClaimRequest,
+    http_request: Request,
+    x_device_id: Optional[str] = Header(None, alias="X-Device-Id")
+):
+    """Analyze a claim, streaming the result as server-sent events.
+    
+    Emits `credibility_score`, `credibility_level`, `summary`, one `key_point`
+    per claim point, `contradictions` and `source_analysis` as soon as the model
+    has produced each of them, then a final validated `result` event (or an
+    `error` event).
+    """
+    await check_rate_limit(x_device_id, _client_ip(http_request))
+    device_id = x_device_id or "anonymous"
+    entry = accounting.begin("stream", device_id, request.language)
+    entry.token_kind = reason = await _consume_token(device_id)
+    
+    @_once
+    async def settle(status: str) -> None:
+        """Keep the token if the result was delivered, refund it otherwise."""
+        fact_check_requests.labels(tool="fact-checker", status=status).inc()
+        if status == "success":
+            tokens_consumed.labels(tool="fact-checker").inc()
+        else:
+            entry.status = "error"
+            await refund_token(device_id, reason)
+            tokens_refunded.labels(tool="fact-checker", kind=reason).inc()
+        await ledger.submit(entry)
+    
+    async def events() -> AsyncIterator[str]:
+        accounting.resume(entry)
+        set_llm_priority(reason, device_id)
+        started = time.perf_counter()
+        first = True
+        status = "disconnected"
+        try:
+            async for event, data in stream_fact_check(request.claim, request.language):
+                if event == "result":
+                    entry.add_result(data)
+                    data = FactCheckResult(**data).model_dump()
+                if first:
+                    fact_check_stream_first_event.labels(tool="fact-checker").observe(time.perf_counter() - started)
+                    first = False
+                yield _sse(event, data)
+            status = "success"
+        except Exception as e:
+            await settle("error")
+            yield _sse("error", {"error": f"Analysis failed: {str(e)}", "code": "analysis_failed"})
+        finally:
+            await settle(status)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep nginx from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(settle, "disconnected")
+    )
+
+
+def _batch_item(
+    index: int, result: Optional[dict], error: Optional[Exception], entry: accounting.RequestCost
+) -> BatchItemResult:
+    if error is None:
+        entry.add_result(result)
+        try:
+            item = BatchItemResult(index=index, status="ok", result=FactCheckResult(**result))
+            fact_check_requests.labels(tool="fact-checker", status="success").inc()
+            return item
+        except ValidationError as e:
+            error = e
+    fact_check_requests.labels(tool="fact-checker", status="error").inc()
+    return BatchItemResult(index=index, status="error", error=f"Analysis failed: {str(error)}")
+
+
+async def _settle_batch(
+    device_id: str, reserved: Dict[str, int], count: int, succeeded: int, entry: accounting.RequestCost
+) -> None:
+    """Keep the tokens of successful items and refund the rest."""
+    tokens_consumed.labels(tool="fact-checker").inc(succeeded)
+    failed = count - succeeded
+    # Partly failed batches count as errors in the ledger; `claims` - `cached_claims` still says what was analyzed
+    entry.status = "error" if failed else "success"
+    await ledger.submit(entry)
+    if failed:
+        await refund_reservation(device_id, reserved, failed)
+        tokens_refunded.labels(tool="fact-checker", kind="batch").inc(failed)
+
+
+@router.post("/check/batch", response_model=BatchCheckResponse)
+async def check_claims_batch(
+    request: BatchCheckRequest,
+    http_request: Request,
+    x_device_id: Optional[str] = Header(None, alias="X-Device-Id")
+):
+    """Analyze many claims in one request.
+    
+    One token per claim is reserved up front in a single transaction; tokens
+    for claims that fail are refunded. With `stream: true` the response is
+    NDJSON, one `BatchItemResult` per line as each claim finishes.
+    """
+    await check_rate_limit(x_device_id, _client_ip(http_request))
+    settings = get_settings()
+    device_id = x_device_id or "anonymous"
+    count = len(request.claims)
+    if count > settings.BATCH_MAX_CLAIMS:
+        raise HTTPException(status_code=422, detail=f"At most {settings.BATCH_MAX_CLAIMS} claims per batch")
+    
+    languages = {c.language for c in request.claims}
+    entry = accounting.begin("batch", device_id, languages.pop() if len(languages) == 1 else "mixed", claims=count)
+    with accounting.timed("token_check"):
+        reserved = await reserve_tokens(device_id, count)
+    if reserved is None:
+        fact_check_requests.labels(tool="fact-checker", status="payment_required").inc()
+        raise HTTPException(
+            status_code=402,
+            detail={"error": f"Not enough tokens for {count} claims. Please purchase more.", "code": "payment_required"}
+        )
+    fact_check_batch_size.labels(tool="fact-checker").observe(count)
+    entry.token_kind = "paid_token" if reserved["paid_token"] else "free_trial"
+    set_llm_priority(entry.token_kind, device_id)
+    
+    items = iter_batch([(c.claim, c.language) for c in request.claims], settings.BATCH_CONCURRENCY)
+    
+    if request.stream:
+        @_once
+        async def settle(succeeded: int) -> None:
+            await items.aclose()
+            await _settle_batch(device_id, reserved, count, succeeded, entry)
+        
+        async def lines() -> AsyncIterator[str]:
+            accounting.resume(entry)
+            succeeded = 0
+            try:
+                async for index, result, error in items:
+                    item = _batch_item(index, result, error, entry)
+                    succeeded += item.status == "ok"
+                    yield item.model_dump_json() + "\n"
+            finally:
+                # Also runs when the client disconnects mid-batch: undelivered claims are refunded
+                await settle(succeeded)
+        
+        return StreamingResponse(
+            lines(), media_type="application/x-ndjson", background=BackgroundTask(settle, 0)
+        )
+    
+    results = [_batch_item(index, result, error, entry) async for index, result, error in items]
+    results.sort(key=lambda item: item.index)
+    succeeded = sum(item.status == "ok" for item in results)
+    await _settle_batch(device_id, reserved, count, succeeded, entry)
+    return BatchCheckResponse(results=results, tokens_charged=succeeded)
 
 
 @router.get("/trial-status")
@@ -1,8 +1,27 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
+from fastapi.responses import ORJSONResponse
+from app.responses import PrecomputedJSON
+from app.services.startup import startup
 
 router = APIRouter()
 
+HEALTH = PrecomputedJSON({"status": "healthy", "service": "ai-fact-checker"})
+ALIVE = PrecomputedJSON({"status": "alive"}, cache_control="no-store")
+
 
 @router.get("/health")
-async def health_check():
-    return {"status": "healthy", "service": "ai-fact-checker"}
+async def health_check(request: Request):
+    return HEALTH.response(request)
+
+
+@router.get("/livez")
+async def liveness(request: Request):
+    """The process is up and its event loop is responsive; restart it if this fails."""
+    return ALIVE.response(request)
+
+
+@router.get("/readyz")
+async def readiness():
+    """Startup warmup is done and the database answers; route traffic here only while this is 200."""
+    ready, body = await startup.readiness()
+    return ORJSONResponse(body, status_code=200 if ready else 503, headers={"Cache-Control": "no-store"})
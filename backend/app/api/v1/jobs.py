@@ -0,0 +1,69 @@
+import json
+from fastapi import APIRouter, HTTPException, Header, Request
+from pydantic import BaseModel, HttpUrl, field_validator
+from typing import Optional
+from datetime import datetime
+from app.api.v1.fact_check import _consume_token
+from app.schemas.fact_check import ClaimRequest, FactCheckResult
+from app.services.job_queue import job_queue
+from app.services.rate_limit import check_rate_limit
+
+router = APIRouter()
+
+
+class JobRequest(ClaimRequest):
+    callback_url: Optional[HttpUrl] = None  # POSTed the final job status when the job finishes
+
+    @field_validator("callback_url")
+    @classmethod
+    def _https_only(cls, url: Optional[HttpUrl]) -> Optional[HttpUrl]:
+        if url is not None and url.scheme != "https":
+            raise ValueError("callback_url must use https")
+        return url
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: str  # "queued", "running", "succeeded", "failed"
+    result: Optional[FactCheckResult] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+@router.post("/jobs", response_model=JobStatus, status_code=202)
+async def create_job(
+    request: JobRequest,
+    http_request: Request,
+    x_device_id: Optional[str] = Header(None, alias="X-Device-Id")
+):
+    """Queue a claim for background analysis and return its job id immediately."""
+    await check_rate_limit(x_device_id, http_request.client.host if http_request.client else None)
+    device_id = x_device_id or "anonymous"
+    token_kind = await _consume_token(device_id)
+    
+    job = await job_queue.submit(
+        device_id,
+        request.claim,
+        request.language,
+        token_kind=token_kind,
+        callback_url=str(request.callback_url) if request.callback_url else None
+    )
+    return JobStatus(job_id=job.id, status=job.status)
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    """Poll a job's status and, once it has finished, its result or error."""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return JobStatus(
+        job_id=job.id,
+        status=job.status,
+        result=json.loads(job.result) if job.result else None,
+        error=job.error,
+        created_at=job.created_at,
+        finished_at=job.finished_at
+    )
@@ -5,20 +5,12 @@ from fastapi import APIRouter, HTTPException, Header, Request
 from pydantic import BaseModel
 from typing import Optional
 from app.config import get_settings
-from app.services.token_service import add_tokens
-from app.metrics import payment_success, payment_revenue
-from app.database import get_db_session
-from app.models.token import PaymentTransaction
-import httpx
+from app.responses import PrecomputedJSON
+from app.services.http_client import get_http_client
+from app.services.webhook_processor import webhook_processor
 
 router = APIRouter()
 
-# Product configurations
-PRODUCTS = {
-    "basic": {"tokens": 3, "price_cents": 799},
-    "standard": {"tokens": 10, "price_cents": 1999},
-}
-
 
 class CheckoutRequest(BaseModel):
     product_id: str
@@ -45,29 +37,29 @@ async def create_checkout(request: CheckoutRequest):
     if not creem_product_id:
         raise HTTPException(status_code=400, detail=f"Unknown product: {request.product_id}")
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://api.creem.io/v1/checkouts",
-            headers={
-                "x-api-key": settings.CREEM_API_KEY,
-                "Content-Type": "application/json"
-            },
-            json={
-                "product_id": creem_product_id,
-                "success_url": request.success_url,
-                "request_id": f"{request.device_id}_{request.product_id}",
-                "metadata": {
-                    "device_id": request.device_id,
-                    "product_sku": request.product_id
-                }
+    client = get_http_client("creem")
+    response = await client.post(
+        "/v1/checkouts",
+        headers={
+            "x-api-key": settings.CREEM_API_KEY,
+            "Content-Type": "application/json"
+        },
+        json={
+            "product_id": creem_product_id,
+            "success_url": request.success_url,
+            "request_id": f"{request.device_id}_{request.product_id}",
+            "metadata": {
+                "device_id": request.device_id,
+                "product_sku": request.product_id
             }
-        )
-        
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail="Failed to create checkout")
-        
-        data = response.json()
-        return {"checkout_url": data.get("checkout_url")}
+        }
+    )
+    
+    if response.status_code != 200:
+        raise HTTPException(status_code=500, detail="Failed to create checkout")
+    
+    data = response.json()
+    return {"checkout_url": data.get("checkout_url")}
 
 
 @router.post("/webhook/creem")
@@ -75,78 +67,60 @@ async def creem_webhook(
     request: Request,
     creem_signature: Optional[str] = Header(None, alias="creem-signature")
 ):
-    """Handle Creem payment webhooks."""
+    """Handle Creem payment webhooks.
+    
+    The verified event is stored and acknowledged; tokens are granted in the
+    background by `webhook_processor`. Redeliveries are acknowledged too.
+    """
     settings = get_settings()
     
     body = await request.body()
     
     # Verify signature
-    if settings.CREEM_WEBHOOK_SECRET and creem_signature:
+    if settings.CREEM_WEBHOOK_SECRET:
         expected = hmac.new(
             settings.CREEM_WEBHOOK_SECRET.encode(),
             body,
             hashlib.sha256
         ).hexdigest()
         
-        if not hmac.compare_digest(expected, creem_signature):
+        if not creem_signature or not hmac.compare_digest(expected, creem_signature):
             raise HTTPException(status_code=401, detail="Invalid signature")
     
-    data = await request.json()
-    event_type = data.get("type")
-    
-    if event_type == "checkout.completed":
-        checkout = data.get("object", {})
-        metadata = checkout.get("metadata", {})
-        
-        device_id = metadata.get("device_id")
-        product_sku = metadata.get("product_sku")
-        transaction_id = checkout.get("id")
-        amount_cents = checkout.get("amount", 0)
-        
-        if device_id and product_sku and transaction_id:
-            product = PRODUCTS.get(product_sku)
-            if product:
-                # Add tokens
-                await add_tokens(device_id, product["tokens"], product_sku, transaction_id)
-                
-                # Record transaction
-                async with get_db_session() as session:
-                    txn = PaymentTransaction(
-                        transaction_id=transaction_id,
-                        device_id=device_id,
-                        product_id=product_sku,
-                        amount_cents=amount_cents,
-                        status="completed"
-                    )
-                    session.add(txn)
-                    await session.commit()
-                
-                # Update metrics
-                payment_success.labels(tool="fact-checker", product_sku=product_sku).inc()
-                payment_revenue.labels(tool="fact-checker").inc(amount_cents)
+    try:
+        data = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="Invalid event")
     
+    await webhook_processor.record("creem", data, body)
     return {"status": "ok"}
 
 
+# Product catalog; changes only with a deploy, so it is serialized once
+PRODUCT_CATALOG = PrecomputedJSON({
+    "products": [
+        {
+            "id": "basic",
+            "name": "3 Checks",
+            "tokens": 3,
+            "price": "$7.99",
+            "price_cents": 799
+        },
+        {
+            "id": "standard", 
+            "name": "10 Checks",
+            "tokens": 10,
+            "price": "$19.99",
+            "price_cents": 1999,
+            "popular": True
+        }
+    ]
+}, cache_control="public, max-age=3600")
+
+
 @router.get("/products")
-async def get_products():
+async def get_products(request: Request):
     """Get available products."""
-    return {
-        "products": [
-            {
-                "id": "basic",
-                "name": "3 Checks",
-                "tokens": 3,
-                "price": "$7.99",
-                "price_cents": 799
-            },
-            {
-                "id": "standard", 
-                "name": "10 Checks",
-                "tokens": 10,
-                "price": "$19.99",
-                "price_cents": 1999,
-                "popular": True
-            }
-        ]
-    }
+    return PRODUCT_CATALOG.response(request)
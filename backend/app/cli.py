@@ -0,0 +1,151 @@
+"""Operational commands, run against the configured DATABASE_URL.
+
+    python -m app.cli replay-webhooks [--status failed] [--id EVENT_ID ...]
+    python -m app.cli backfill-webhooks events.jsonl
+    python -m app.cli ingest claims.jsonl [--concurrency 8] [--claim-field title]
+    python -m app.cli usage-report [--by day --by model] [--since 2026-10-01] [--device DEVICE_ID]
+"""
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime
+from typing import List, Optional
+from app.config import get_settings
+from app.database import engine, init_db
+from app.services.accounting import GROUPS, ledger
+from app.services.claim_index import claim_index
+from app.services.claim_ingest import IngestProgress, count_records, ingest_claims, load_checkpoint, read_claims
+from app.services.http_client import http_clients
+from app.services.webhook_processor import event_id, webhook_processor
+
+
+async def replay_webhooks(args: argparse.Namespace) -> int:
+    counts = await webhook_processor.replay(statuses=args.status or ("pending", "failed"), ids=args.id or ())
+    print(json.dumps(counts))
+    return 1 if counts.get("failed") or counts.get("pending") else 0
+
+
+async def backfill_webhooks(args: argparse.Namespace) -> int:
+    """Store and process events missed by the endpoint, one JSON body per line.
+
+    Events already received are skipped, and purchases already granted are not
+    granted again, so the same file can be backfilled more than once.
+    """
+    counts = {"duplicate": 0}
+    with open(args.file, "rb") as lines:
+        for number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError:
+                print(f"line {number}: not JSON, skipped", file=sys.stderr)
+                continue
+            if not await webhook_processor.record(args.source, data, line):
+                counts["duplicate"] += 1
+                continue
+            key = event_id(data, line)
+            status = await webhook_processor.process(key)
+            counts[status] = counts.get(status, 0) + 1
+            if status not in ("processed", "ignored"):
+                print(f"line {number}: event {key} {status}", file=sys.stderr)
+    print(json.dumps(counts))
+    return 1 if counts.get("failed") or counts.get("pending") else 0
+
+
+async def ingest(args: argparse.Namespace) -> int:
+    """Fact-check every claim in a JSONL or CSV file so the results are cached before users ask.
+
+    Progress is checkpointed to FILE.checkpoint; running the same command
+    again resumes after the last checkpoint unless --restart is given.
+    """
+    settings = get_settings()
+    if not (settings.RESULT_CACHE_ENABLED and settings.RESULT_CACHE_PERSISTENT):
+        print("ingest needs RESULT_CACHE_ENABLED and RESULT_CACHE_PERSISTENT, or results are lost on exit",
+              file=sys.stderr)
+        return 2
+    checkpoint = args.checkpoint or f"{args.file}.checkpoint"
+    skipped = 0 if args.restart else load_checkpoint(checkpoint)
+    progress = IngestProgress(count_records(args.file, args.format), skipped)
+    if skipped:
+        print(f"resuming after record {skipped}", file=sys.stderr)
+
+    await claim_index.load()
+    try:
+        counts = await ingest_claims(
+            read_claims(args.file, args.format, args.claim_field, args.language_field, args.language),
+            progress,
+            concurrency=args.concurrency,
+            checkpoint=checkpoint,
+            report=lambda p: print(p.format(), file=sys.stderr),
+            report_interval=args.report_interval
+        )
+    finally:
+        await http_clients.aclose()
+    print(progress.format(), file=sys.stderr)
+    print(json.dumps(counts))
+    return 1 if counts["failed"] else 0
+
+
+async def usage_report(args: argparse.Namespace) -> int:
+    """Requests, LLM tokens and mean phase latencies from the request ledger, one JSON object per group."""
+    rows = await ledger.summary(args.by or ["day"], since=args.since, until=args.until, device_id=args.device)
+    for row in rows:
+        print(json.dumps(row))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    replay = commands.add_parser("replay-webhooks", help="process stored webhook events again")
+    replay.add_argument("--status", action="append", choices=("pending", "failed", "processed", "ignored"),
+                        help="events in this status (repeatable; default: pending and failed)")
+    replay.add_argument("--id", action="append", help="a specific event id (repeatable)")
+    replay.set_defaults(handler=replay_webhooks)
+
+    backfill = commands.add_parser("backfill-webhooks", help="import and process webhook bodies from a JSONL file")
+    backfill.add_argument("file")
+    backfill.add_argument("--source", default="creem")
+    backfill.set_defaults(handler=backfill_webhooks)
+
+    bulk = commands.add_parser("ingest", help="fact-check claims from a JSONL or CSV file into the result cache")
+    bulk.add_argument("file")
+    bulk.add_argument("--format", choices=("jsonl", "csv"), help="default: from the file extension")
+    bulk.add_argument("--claim-field", default="claim")
+    bulk.add_argument("--language-field", default="language")
+    bulk.add_argument("--language", default="en", help="for records without a language")
+    bulk.add_argument("--concurrency", type=int, default=get_settings().BATCH_CONCURRENCY)
+    bulk.add_argument("--checkpoint", help="default: FILE.checkpoint")
+    bulk.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the top")
+    bulk.add_argument("--report-interval", type=float, default=5.0, help="seconds between progress lines")
+    bulk.set_defaults(handler=ingest)
+
+    report = commands.add_parser("usage-report", help="aggregate per-request costs and latencies from the ledger")
+    report.add_argument("--by", action="append", choices=tuple(GROUPS),
+                        help="group by this column (repeatable; default: day)")
+    report.add_argument("--since", type=datetime.fromisoformat, help="UTC date or time, inclusive")
+    report.add_argument("--until", type=datetime.fromisoformat, help="UTC date or time, exclusive")
+    report.add_argument("--device", help="only this device")
+    report.set_defaults(handler=usage_report)
+    return parser
+
+
+async def _run(args: argparse.Namespace) -> int:
+    await init_db()
+    try:
+        return await args.handler(args)
+    finally:
+        await engine.dispose()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,114 @@
+import asyncio
+import time
+import weakref
 from contextlib import asynccontextmanager
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy import event, exc, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from app.config import get_settings
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
+from app.config import Settings, get_settings
+from app.metrics import (
+    TOOL_NAME, db_commits, db_pool_checkout, db_pool_connections, db_pool_saturation, db_pool_timeouts,
+    db_query_duration, register_scrape_hook
+)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records how long each checkout takes."""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            db_pool_timeouts.labels(tool=TOOL_NAME).inc()
+            raise
+        finally:
+            db_pool_checkout.labels(tool=TOOL_NAME).observe(time.perf_counter() - started)
+
+
+def _sqlite_pragmas(settings: Settings):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if settings.SQLITE_WAL:
+            # Readers no longer block the writer (and vice versa)
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.close()
+    return on_connect
+
+
+_STATEMENT_KINDS = ("SELECT", "INSERT", "UPDATE", "DELETE", "BEGIN", "PRAGMA")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's own context: a failing statement never reaches the after hook
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    kind = statement.lstrip()[:6].rstrip().upper()
+    db_query_duration.labels(tool=TOOL_NAME, statement=kind if kind in _STATEMENT_KINDS else "OTHER").observe(elapsed)
+
+
+def _count_commit(conn):
+    db_commits.labels(tool=TOOL_NAME).inc()
+
+
+def _instrument(engine: AsyncEngine) -> AsyncEngine:
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "commit", _count_commit)
+    return engine
+
+
+def create_engine_from_settings(settings: Settings) -> AsyncEngine:
+    """Build the async engine for DATABASE_URL, tuned for its backend.
+    
+    SQLite connections get WAL journaling, relaxed fsync, a busy timeout and
+    memory-mapped I/O. Server databases (e.g. postgresql+asyncpg) get a sized
+    pool with pre-ping and recycling.
+    """
+    url = make_url(settings.DATABASE_URL)
+    options = {"echo": False, "future": True}
+    
+    if url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            # Every connection to an in-memory database is a new empty database
+            options.update(poolclass=StaticPool, connect_args={"check_same_thread": False})
+        else:
+            options.update(
+                poolclass=TimedQueuePool,
+                pool_size=settings.DB_POOL_SIZE,
+                max_overflow=settings.DB_MAX_OVERFLOW,
+                pool_timeout=settings.DB_POOL_TIMEOUT,
+                connect_args={"timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000}
+            )
+        engine = create_async_engine(url, **options)
+        event.listen(engine.sync_engine, "connect", _sqlite_pragmas(settings))
+        return _instrument(engine)
+    
+    return _instrument(create_async_engine(
+        url,
+        poolclass=TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        **options
+    ))
+
 
 settings = get_settings()
 
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=False,
-    future=True
-)
+engine = create_engine_from_settings(settings)
 
 async_session_maker = async_sessionmaker(
     engine,
@@ -19,6 +118,18 @@ async_session_maker = async_sessionmaker(
 
 Base = declarative_base()
 
+# SQLite allows a single writer; queue this process's writers on a lock (one per
+# event loop) instead of busy-polling the file lock
+_sqlite_write_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+
+def _sqlite_write_lock() -> asyncio.Lock:
+    loop = asyncio.get_running_loop()
+    lock = _sqlite_write_locks.get(loop)
+    if lock is None:
+        lock = _sqlite_write_locks[loop] = asyncio.Lock()
+    return lock
+
 
 @asynccontextmanager
 async def get_db_session():
@@ -29,6 +140,75 @@ async def get_db_session():
             await session.close()
 
 
-async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+@asynccontextmanager
+async def get_write_session():
+    """Session for read-then-write transactions that must not lose a lock race.
+    
+    SQLite starts transactions as DEFERRED: a transaction that has read and then
+    needs to write can fail straight away with "database is locked" when another
+    writer is active, without waiting for the busy timeout. Taking the write lock
+    up front with BEGIN IMMEDIATE makes concurrent writers queue instead.
+    """
+    if engine.dialect.name != "sqlite":
+        async with get_db_session() as session:
+            yield session
+        return
+    
+    async with _sqlite_write_lock():
+        async with get_db_session() as session:
+            await session.execute(text("BEGIN IMMEDIATE"))
+            yield session
+
+
+def dialect_insert(session: AsyncSession):
+    """INSERT construct of the session's dialect, for ON CONFLICT upserts."""
+    if session.bind.dialect.name == "postgresql":
+        return pg_insert
+    return sqlite_insert
+
+
+def _refresh_pool_metrics() -> None:
+    pool = engine.sync_engine.pool
+    if not isinstance(pool, AsyncAdaptedQueuePool):
+        return
+    checked_out = pool.checkedout()
+    db_pool_connections.labels(tool=TOOL_NAME, state="checked_out").set(checked_out)
+    db_pool_connections.labels(tool=TOOL_NAME, state="idle").set(pool.checkedin())
+    capacity = pool.size() + max(settings.DB_MAX_OVERFLOW, 0)
+    # A pool_size of 0 means no limit to SQLAlchemy, so there is nothing to saturate
+    db_pool_saturation.labels(tool=TOOL_NAME).set(checked_out / capacity if capacity > 0 else 0.0)
+
+
+register_scrape_hook(_refresh_pool_metrics)
+
+
+async def init_db(attempts: int = 3):
+    """Create the tables of every model that do not exist yet.
+    
+    Workers starting together can race between checking for a table and
+    creating it; the loser sees "already exists" and simply checks again.
+    """
+    import app.models  # noqa: F401 - registers every table on Base.metadata
+    for attempt in range(attempts):
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            return
+        except exc.DBAPIError:
+            if attempt + 1 == attempts:
+                raise
+
+
+async def _select_one() -> None:
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def warm_pool(connections: int) -> None:
+    """Open `connections` pooled connections now instead of on the first requests."""
+    await asyncio.gather(*(_select_one() for _ in range(connections)))
+
+
+async def ping_db(timeout: float) -> None:
+    """Round trip to the database; raises if it fails or takes longer than `timeout` seconds."""
+    await asyncio.wait_for(_select_one(), timeout)
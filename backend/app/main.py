@@ -1,12 +1,56 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import math
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.v1 import fact_check, health, tokens, payment
-from app.metrics import metrics_router
+from app.api.v1 import fact_check, health, jobs, tokens, payment
+from app.config import get_settings
+from app.metrics import MULTIPROCESS, mark_process_dead, metrics_router, sample_periodically
+from app.middleware import MetricsMiddleware
+from app.services.http_client import http_clients
+from app.services.job_queue import job_queue
+from app.services.rate_limit import RateLimitExceeded
+from app.services.shared_state import shared_state
+from app.services.startup import startup
+from app.services.webhook_processor import webhook_processor
+from app.services.write_behind import write_behind
+
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    if MULTIPROCESS and settings.DATABASE_URL.startswith("sqlite"):
+        logger.warning("Running several workers on SQLite; use a server database to scale beyond one node")
+    await startup.prepare()
+    await write_behind.start()
+    await http_clients.start()
+    await job_queue.start()
+    await webhook_processor.start()
+    warmup = asyncio.create_task(startup.warm_up())
+    sampler = asyncio.create_task(sample_periodically(settings.METRICS_SAMPLE_INTERVAL)) if MULTIPROCESS else None
+    yield
+    warmup.cancel()
+    if sampler is not None:
+        sampler.cancel()
+    await webhook_processor.stop()
+    await job_queue.stop()
+    await write_behind.stop()  # after everything that may still write through it
+    await http_clients.aclose()
+    await shared_state.close()
+    mark_process_dead()
+
 
 app = FastAPI(
     title="AI Fact Checker API",
     description="AI-powered fact checking and misinformation analysis",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS
@@ -18,9 +62,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request count and latency per route template
+app.add_middleware(MetricsMiddleware)
+
+
+@app.exception_handler(RateLimitExceeded)
+async def rate_limited(request: Request, exc: RateLimitExceeded):
+    return ORJSONResponse(
+        status_code=429,
+        content={"detail": {"error": str(exc), "code": "rate_limited"}},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))}
+    )
+
+
 # Routers
 app.include_router(health.router, tags=["Health"])
 app.include_router(fact_check.router, prefix="/api/v1", tags=["Fact Check"])
+app.include_router(jobs.router, prefix="/api/v1", tags=["Jobs"])
 app.include_router(tokens.router, prefix="/api/v1", tags=["Tokens"])
 app.include_router(payment.router, prefix="/api/v1", tags=["Payment"])
 app.include_router(metrics_router, tags=["Metrics"])
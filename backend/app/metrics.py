@@ -1,10 +1,19 @@
+import asyncio
 import os
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from typing import Callable, List
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess, CONTENT_TYPE_LATEST
+)
 from fastapi import APIRouter
 from fastapi.responses import Response
 
 TOOL_NAME = os.getenv("TOOL_NAME", "fact-checker")
 
+# With several workers, set PROMETHEUS_MULTIPROC_DIR to an empty directory before they
+# start: each worker then writes its samples there and /metrics adds them up. Gauges say
+# how their per-worker values combine (multiprocess_mode).
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
 # HTTP metrics
 http_requests = Counter(
     "http_requests_total",
@@ -18,6 +27,93 @@ http_duration = Histogram(
     ["tool", "endpoint", "method"]
 )
 
+# Upstream LLM metrics
+llm_request_duration = Histogram(
+    "llm_request_duration_seconds",
+    "LLM proxy call latency",
+    ["tool", "model", "outcome"],
+    buckets=(0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 20.0, 30.0, 45.0, 60.0, 90.0)
+)
+
+llm_model_selections = Counter(
+    "llm_model_selections_total",
+    "Models that served a fact check, and whether it was the router's first choice",
+    ["tool", "model", "choice"]  # choice: first, fallback
+)
+
+llm_model_latency = Gauge(
+    "llm_model_latency_seconds",
+    "Rolling median latency of successful calls per model, as used by the router",
+    ["tool", "model"],
+    multiprocess_mode="livemax"
+)
+
+llm_model_error_rate = Gauge(
+    "llm_model_error_rate",
+    "Rolling share of failed calls per model, as used by the router",
+    ["tool", "model"],
+    multiprocess_mode="livemax"
+)
+
+llm_tokens = Counter(
+    "llm_tokens_total",
+    "Tokens reported by the LLM proxy",
+    ["tool", "model", "kind"]
+)
+
+llm_tokens_per_request = Histogram(
+    "llm_tokens_per_request",
+    "Prompt and completion tokens per LLM call",
+    ["tool", "model", "kind"],
+    buckets=(100, 250, 500, 750, 1000, 1500, 2000, 3000, 4000, 8000)
+)
+
+llm_prompt_tokens_estimated = Histogram(
+    "llm_prompt_tokens_estimated",
+    "Locally estimated prompt tokens per LLM call",
+    ["tool"],
+    buckets=(250, 500, 750, 1000, 1250, 1500, 2000, 3000, 4000)
+)
+
+llm_max_tokens = Histogram(
+    "llm_max_tokens",
+    "Output token budget (max_tokens) requested per LLM call",
+    ["tool"],
+    buckets=(500, 750, 1000, 1250, 1500, 1750, 2000, 3000, 4000)
+)
+
+claim_compaction_saved_chars = Counter(
+    "claim_compaction_saved_chars_total",
+    "Characters removed from long claims before they were sent to the LLM",
+    ["tool"]
+)
+
+llm_output_parses = Counter(
+    "llm_output_parses_total",
+    "LLM analyses by how their JSON had to be recovered",
+    ["tool", "outcome"]  # outcome: clean, repaired, reasked, failed
+)
+
+llm_output_repairs = Counter(
+    "llm_output_repairs_total",
+    "Repairs applied to LLM JSON output, by kind",
+    ["tool", "kind"]
+)
+
+# Database metrics
+db_query_duration = Histogram(
+    "db_query_duration_seconds",
+    "Database statement execution time",
+    ["tool", "statement"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+)
+
+db_commits = Counter(
+    "db_commits_total",
+    "Database transactions committed",
+    ["tool"]
+)
+
 # Fact check metrics
 fact_check_requests = Counter(
     "fact_check_requests_total",
@@ -25,6 +121,181 @@ fact_check_requests = Counter(
     ["tool", "status"]
 )
 
+fact_check_stream_first_event = Histogram(
+    "fact_check_stream_first_event_seconds",
+    "Time from request to the first streamed fact check event",
+    ["tool"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+)
+
+fact_check_batch_size = Histogram(
+    "fact_check_batch_size",
+    "Claims per batch fact check request",
+    ["tool"],
+    buckets=(1, 2, 5, 10, 20, 50, 100)
+)
+
+# Job queue metrics
+fact_check_jobs = Counter(
+    "fact_check_jobs_total",
+    "Fact check jobs by final status",
+    ["tool", "status"]
+)
+
+fact_check_job_wait = Histogram(
+    "fact_check_job_wait_seconds",
+    "Time jobs spend queued before a worker picks them up",
+    ["tool"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+)
+
+fact_check_job_queue_depth = Gauge(
+    "fact_check_job_queue_depth",
+    "Jobs waiting for a worker",
+    ["tool"],
+    multiprocess_mode="livesum"
+)
+
+job_callbacks = Counter(
+    "fact_check_job_callbacks_total",
+    "Job completion callbacks by outcome",
+    ["tool", "outcome"]
+)
+
+# Result cache metrics
+result_cache_hits = Counter(
+    "result_cache_hits_total",
+    "Fact check result cache hits",
+    ["tool", "tier"]
+)
+
+result_cache_misses = Counter(
+    "result_cache_misses_total",
+    "Fact check result cache misses",
+    ["tool"]
+)
+
+result_cache_evictions = Counter(
+    "result_cache_evictions_total",
+    "Fact check result cache evictions",
+    ["tool", "reason"]
+)
+
+result_cache_size = Gauge(
+    "result_cache_entries",
+    "Entries held in the in-process result cache",
+    ["tool"],
+    multiprocess_mode="livesum"
+)
+
+# Near-duplicate claim index metrics
+claim_dedup_lookups = Counter(
+    "claim_dedup_lookups_total",
+    "Near-duplicate lookups after an exact cache miss",
+    ["tool", "outcome"]  # outcome: near_duplicate, no_match, result_expired
+)
+
+claim_index_size = Gauge(
+    "claim_index_entries",
+    "Fingerprints held in the near-duplicate claim index",
+    ["tool"],
+    multiprocess_mode="livemax"
+)
+
+# Upstream resilience metrics
+upstream_retries = Counter(
+    "upstream_retries_total",
+    "Upstream calls retried, by the error that triggered the retry",
+    ["tool", "upstream", "reason"]  # reason: HTTP status, "timeout" or "transport"
+)
+
+upstream_hedges = Counter(
+    "upstream_hedges_total",
+    "Hedged upstream calls",
+    ["tool", "upstream", "outcome"]  # outcome: fired, primary_won, hedge_won, both_failed
+)
+
+upstream_hedge_delay = Gauge(
+    "upstream_hedge_delay_seconds",
+    "Current delay before a hedged call is sent",
+    ["tool", "upstream"],
+    multiprocess_mode="livemax"
+)
+
+circuit_state = Gauge(
+    "circuit_breaker_state",
+    "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ["tool", "upstream"],
+    multiprocess_mode="livemax"
+)
+
+circuit_transitions = Counter(
+    "circuit_breaker_transitions_total",
+    "Circuit breaker state changes",
+    ["tool", "upstream", "state"]
+)
+
+circuit_rejections = Counter(
+    "circuit_breaker_rejections_total",
+    "Calls failed fast because the circuit was open",
+    ["tool", "upstream"]
+)
+
+stale_results_served = Counter(
+    "stale_results_served_total",
+    "Expired cached results served because the LLM proxy was unavailable",
+    ["tool"]
+)
+
+# Rate limiting and LLM concurrency metrics
+rate_limit_rejections = Counter(
+    "rate_limit_rejections_total",
+    "Requests rejected with 429 by a token bucket",
+    ["tool", "scope"]  # scope: device, ip
+)
+
+llm_governor_in_flight = Gauge(
+    "llm_governor_in_flight",
+    "LLM calls holding a concurrency slot",
+    ["tool"],
+    multiprocess_mode="livesum"
+)
+
+llm_governor_queue_depth = Gauge(
+    "llm_governor_queue_depth",
+    "LLM calls waiting for a concurrency slot",
+    ["tool", "priority"],
+    multiprocess_mode="livesum"
+)
+
+llm_governor_wait = Histogram(
+    "llm_governor_wait_seconds",
+    "Time LLM calls waited for a concurrency slot",
+    ["tool", "priority"],
+    buckets=(0, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+llm_governor_rejections = Counter(
+    "llm_governor_rejections_total",
+    "LLM calls turned away without a concurrency slot",
+    ["tool", "priority", "reason"]  # reason: queue_full, timeout
+)
+
+# Shared state backend metrics
+shared_state_errors = Counter(
+    "shared_state_errors_total",
+    "Failed commands to the shared state backend",
+    ["tool", "kind"]  # kind: connection, reply
+)
+
+# Request coalescing metrics
+single_flight_followers = Histogram(
+    "single_flight_followers",
+    "Callers served by each coalesced upstream call, besides its leader",
+    ["tool", "flight"],
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250)
+)
+
 # Payment metrics
 payment_success = Counter(
     "payment_success_total",
@@ -38,6 +309,33 @@ payment_revenue = Counter(
     ["tool"]
 )
 
+# Webhook metrics
+webhook_events = Counter(
+    "webhook_events_total",
+    "Verified webhook deliveries",
+    ["tool", "source", "outcome"]  # outcome: accepted, duplicate
+)
+
+webhook_processed = Counter(
+    "webhook_processed_total",
+    "Webhook events processed from the outbox",
+    ["tool", "outcome"]  # outcome: granted, already_granted, ignored, retry, failed
+)
+
+webhook_processing_lag = Histogram(
+    "webhook_processing_lag_seconds",
+    "Time from receiving a webhook to finishing its processing",
+    ["tool"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0, 300.0, 3600.0)
+)
+
+webhook_queue_depth = Gauge(
+    "webhook_queue_depth",
+    "Webhook events waiting for a worker",
+    ["tool"],
+    multiprocess_mode="livesum"
+)
+
 # Token metrics
 tokens_consumed = Counter(
     "tokens_consumed_total",
@@ -45,6 +343,18 @@ tokens_consumed = Counter(
     ["tool"]
 )
 
+tokens_refunded = Counter(
+    "tokens_refunded_total",
+    "Tokens returned after a failed analysis",
+    ["tool", "kind"]
+)
+
+balance_cache_requests = Counter(
+    "balance_cache_requests_total",
+    "Token balance lookups by cache outcome",
+    ["tool", "outcome"]
+)
+
 free_trial_used = Counter(
     "free_trial_used_total",
     "Free trials used",
@@ -64,9 +374,116 @@ crawler_visits = Counter(
     ["tool", "bot"]
 )
 
+# Outbound HTTP pool metrics
+http_client_connections = Gauge(
+    "http_client_pool_connections",
+    "Pooled outbound HTTP connections",
+    ["tool", "upstream", "state"],
+    multiprocess_mode="livesum"
+)
+
+http_client_pool_wait = Histogram(
+    "http_client_pool_wait_seconds",
+    "Time spent waiting for a pooled outbound connection",
+    ["tool", "upstream"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+)
+
+# Database pool metrics
+db_pool_checkout = Histogram(
+    "db_pool_checkout_seconds",
+    "Time to check a connection out of the database pool",
+    ["tool"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+
+db_pool_timeouts = Counter(
+    "db_pool_timeouts_total",
+    "Database pool checkouts that timed out",
+    ["tool"]
+)
+
+db_pool_connections = Gauge(
+    "db_pool_connections",
+    "Database pool connections",
+    ["tool", "state"],
+    multiprocess_mode="livesum"
+)
+
+db_pool_saturation = Gauge(
+    "db_pool_saturation_ratio",
+    "Checked-out database connections over the pool's maximum (size + overflow)",
+    ["tool"],
+    multiprocess_mode="livemax"
+)
+
+# Write-behind buffer metrics
+write_behind_rows = Counter(
+    "write_behind_rows_total",
+    "Rows of non-critical writes applied in bulk, or dropped because the buffer was full",
+    ["tool", "table", "outcome"]  # outcome: written, dropped
+)
+
+write_behind_pending = Gauge(
+    "write_behind_pending_rows",
+    "Rows buffered until the next write-behind flush",
+    ["tool"],
+    multiprocess_mode="livesum"
+)
+
+# Startup metrics
+startup_phase_duration = Gauge(
+    "startup_phase_duration_seconds",
+    "Time spent in each startup phase of this process (database, claim_index, result_cache, llm_connection, ready)",
+    ["tool", "phase"],
+    multiprocess_mode="livemax"
+)
+
+app_ready = Gauge(
+    "app_ready",
+    "1 once startup warmup has finished",
+    ["tool"],
+    multiprocess_mode="livemin"
+)
+
+# Callbacks run right before each scrape, for gauges sampled from live objects
+_scrape_hooks: List[Callable[[], None]] = []
+
+
+def register_scrape_hook(hook: Callable[[], None]) -> None:
+    _scrape_hooks.append(hook)
+
+
+def run_scrape_hooks() -> None:
+    for hook in _scrape_hooks:
+        hook()
+
+
+async def sample_periodically(interval: float) -> None:
+    """Run the scrape hooks every `interval` seconds.
+
+    In multiprocess mode a scrape is served by one worker only, so every
+    worker refreshes its own sampled gauges in the background instead.
+    """
+    while True:
+        run_scrape_hooks()
+        await asyncio.sleep(interval)
+
+
+def mark_process_dead() -> None:
+    """Drop this worker's live gauges from the multiprocess samples; call on shutdown."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
 metrics_router = APIRouter()
 
 
 @metrics_router.get("/metrics")
 async def metrics():
+    run_scrape_hooks()
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
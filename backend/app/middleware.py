@@ -0,0 +1,53 @@
+import time
+from typing import Dict, Tuple
+from app.metrics import TOOL_NAME, http_duration, http_requests
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording `http_requests_total` and `http_request_duration_seconds`.
+
+    Requests are labelled with the matched route template (e.g. `/api/v1/jobs/{job_id}`),
+    never the raw path, so path parameters cannot blow up label cardinality.
+    Paths that match no route share the `unmatched` label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # Bound metric children by label tuple; skips the registry lookup on every request
+        self._durations: Dict[Tuple[str, str], object] = {}
+        self._counters: Dict[Tuple[str, str, int], object] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+
+            duration = self._durations.get((endpoint, method))
+            if duration is None:
+                duration = self._durations[(endpoint, method)] = http_duration.labels(
+                    tool=TOOL_NAME, endpoint=endpoint, method=method
+                )
+            counter = self._counters.get((endpoint, method, status))
+            if counter is None:
+                counter = self._counters[(endpoint, method, status)] = http_requests.labels(
+                    tool=TOOL_NAME, endpoint=endpoint, method=method, status=str(status)
+                )
+            duration.observe(elapsed)
+            counter.inc()
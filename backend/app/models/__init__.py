@@ -0,0 +1 @@
+from app.models import cache, fingerprint, job, ledger, token, webhook  # noqa: F401 - one module per group of tables
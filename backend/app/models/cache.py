@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, Text, DateTime, func
+from app.database import Base
+
+
+class CachedResult(Base):
+    __tablename__ = "result_cache"
+    
+    cache_key = Column(String(64), primary_key=True)
+    language = Column(String(10), nullable=False)
+    result = Column(Text, nullable=False)  # JSON-encoded FactCheckResult
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, server_default=func.now())
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, BigInteger, DateTime, func
+from app.database import Base
+
+
+class ClaimFingerprint(Base):
+    __tablename__ = "claim_fingerprints"
+    
+    cache_key = Column(String(64), primary_key=True)  # result_cache key of the analyzed claim
+    language = Column(String(10), nullable=False)
+    fingerprint = Column(BigInteger, nullable=False)  # 64-bit SimHash, stored signed
+    created_at = Column(DateTime, server_default=func.now(), index=True)
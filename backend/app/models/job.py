@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, func
+from app.database import Base
+
+
+class FactCheckJob(Base):
+    __tablename__ = "fact_check_jobs"
+    
+    id = Column(String(36), primary_key=True)
+    device_id = Column(String(255), nullable=False, index=True)
+    claim = Column(Text, nullable=False)
+    language = Column(String(10), nullable=False)
+    token_kind = Column(String(20), nullable=False)  # "paid_token" or "free_trial", for refunds
+    status = Column(String(20), nullable=False, index=True)  # "queued", "running", "succeeded", "failed"
+    result = Column(Text)  # JSON-encoded FactCheckResult
+    error = Column(Text)
+    callback_url = Column(String(2048))
+    callback_status = Column(String(20))  # "delivered", "failed"
+    attempts = Column(Integer, default=0)
+    claimed_by = Column(String(36))  # claim token of the worker running the job
+    lease_expires_at = Column(DateTime)  # a running job past its lease is abandoned and may be claimed again
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    finished_at = Column(DateTime)
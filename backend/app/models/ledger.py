@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Float, Integer, String, DateTime
+from app.database import Base
+
+
+class RequestLedgerEntry(Base):
+    __tablename__ = "request_ledger"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    created_at = Column(DateTime, nullable=False, index=True)  # when the request started
+    endpoint = Column(String(20), nullable=False)  # "check", "stream", "batch", "job"
+    device_id = Column(String(255), nullable=False, index=True)
+    language = Column(String(10), nullable=False)
+    model = Column(String(255))  # models that answered, comma-separated
+    token_kind = Column(String(20))  # "paid_token" or "free_trial"; batches record "paid_token" if any was used
+    status = Column(String(20), nullable=False)  # "success", "error"
+    claims = Column(Integer, nullable=False)
+    cached_claims = Column(Integer, nullable=False)  # answered without calling the LLM
+    llm_calls = Column(Integer, nullable=False)
+    prompt_tokens = Column(Integer, nullable=False)
+    completion_tokens = Column(Integer, nullable=False)
+    cached_prompt_tokens = Column(Integer, nullable=False)
+    # Milliseconds; phases of several LLM calls are added up
+    queue_wait_ms = Column(Float, nullable=False)
+    token_check_ms = Column(Float, nullable=False)
+    llm_latency_ms = Column(Float, nullable=False)
+    parse_ms = Column(Float, nullable=False)
+    total_ms = Column(Float, nullable=False)
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, func
+from app.database import Base
+
+
+class WebhookEvent(Base):
+    __tablename__ = "webhook_events"
+    
+    id = Column(String(255), primary_key=True)  # Creem event id, or a hash of the body
+    source = Column(String(50), nullable=False)  # "creem"
+    event_type = Column(String(100), nullable=False)
+    payload = Column(Text, nullable=False)  # raw verified body
+    status = Column(String(20), nullable=False, index=True)  # "pending", "processed", "ignored", "failed"
+    attempts = Column(Integer, default=0)
+    error = Column(Text)
+    received_at = Column(DateTime, server_default=func.now(), index=True)
+    processed_at = Column(DateTime)
@@ -0,0 +1,28 @@
+import hashlib
+from typing import Any
+import orjson
+from fastapi import Request, Response
+
+
+class PrecomputedJSON:
+    """A JSON payload that never changes while the process runs, serialized once.
+
+    Responses carry a strong ETag derived from the body, so clients and
+    proxies revalidating with If-None-Match get an empty 304 instead of the
+    body. `cache_control` says how long they may skip revalidating.
+    """
+
+    def __init__(self, content: Any, cache_control: str = "no-cache"):
+        self.body = orjson.dumps(content)
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self.headers = {"ETag": self.etag, "Cache-Control": cache_control}
+
+    def _matches(self, if_none_match: str) -> bool:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or self.etag in tags
+
+    def response(self, request: Request) -> Response:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and self._matches(if_none_match):
+            return Response(status_code=304, headers=self.headers)
+        return Response(content=self.body, media_type="application/json", headers=self.headers)
@@ -0,0 +1,43 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+class ClaimRequest(BaseModel):
+    claim: str = Field(..., min_length=10, max_length=5000, description="The claim to fact-check")
+    language: str = Field(default="en", description="Response language code")
+
+
+class ClaimPoint(BaseModel):
+    point: str
+    assessment: str  # "likely_true", "uncertain", "likely_false"
+    explanation: str
+
+
+class SourceAnalysis(BaseModel):
+    likely_origin: str
+    spread_pattern: str
+    red_flags: List[str]
+
+
+class TokenUsage(BaseModel):
+    prompt_tokens: Optional[int] = None  # as reported by the LLM proxy
+    completion_tokens: Optional[int] = None
+    cached_prompt_tokens: Optional[int] = None  # prompt tokens served from the provider's prompt cache
+    estimated_prompt_tokens: int  # local estimate made before the call
+    max_tokens: int  # output budget requested
+
+
+class FactCheckResult(BaseModel):
+    credibility_score: float = Field(..., ge=0, le=100)
+    credibility_level: str  # "high", "medium", "low"
+    summary: str
+    key_points: List[ClaimPoint]
+    contradictions: List[str]
+    source_analysis: SourceAnalysis
+    disclaimer: str
+    cached: bool = False  # served from the result cache
+    stale: bool = False  # expired cached result served while the LLM was unavailable
+    model: Optional[str] = None  # LLM model that produced the analysis
+    llm_latency_ms: Optional[float] = None  # duration of that model's call
+    usage: Optional[TokenUsage] = None
+    sub_claims: Optional[int] = None  # long claims: number of sub-claims checked separately and merged
@@ -0,0 +1,195 @@
+import contextvars
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Set
+from sqlalchemy import case, func, select
+from app.config import get_settings
+from app.database import get_db_session
+from app.models.ledger import RequestLedgerEntry
+from app.services.model_router import MODEL_SEPARATOR
+from app.services.write_behind import write_behind
+
+# Phases timed per request, as RequestCost attributes in milliseconds
+PHASES = ("queue_wait", "token_check", "llm_latency", "parse")
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@dataclass
+class RequestCost:
+    """What one request cost: time per phase, LLM calls and tokens.
+
+    The entry lives in a context variable for the duration of the request, so
+    the code that waits for a slot, calls the model or parses its output adds
+    to it without being passed anything. Tasks started by the request (batch
+    items, sub-claims, the leader of a coalesced call) inherit the same entry.
+    """
+    endpoint: str
+    device_id: str
+    language: str
+    claims: int = 1
+    token_kind: Optional[str] = None
+    status: str = "success"
+    cached_claims: int = 0
+    models: Set[str] = field(default_factory=set)
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_prompt_tokens: int = 0
+    queue_wait_ms: float = 0.0
+    token_check_ms: float = 0.0
+    llm_latency_ms: float = 0.0
+    parse_ms: float = 0.0
+    created_at: datetime = field(default_factory=_utcnow)
+    started: float = field(default_factory=time.perf_counter)
+
+    def add_time(self, phase: str, seconds: float) -> None:
+        attribute = f"{phase}_ms"
+        setattr(self, attribute, getattr(self, attribute) + seconds * 1000)
+
+    def add_result(self, result: dict) -> None:
+        """Count a claim's result: whether it was cached, and the model behind it if no call was made here."""
+        if result.get("cached"):
+            self.cached_claims += 1
+        if not self.models and result.get("model"):
+            self.models.update(model.strip() for model in result["model"].split(MODEL_SEPARATOR))
+
+    def row(self) -> dict:
+        """The `request_ledger` row for this entry, timing the request up to now."""
+        row = {f.name: getattr(self, f.name) for f in fields(self) if f.name not in ("models", "started")}
+        row["model"] = MODEL_SEPARATOR.join(sorted(self.models)) or None
+        for phase in PHASES:
+            row[f"{phase}_ms"] = round(row[f"{phase}_ms"], 2)
+        row["total_ms"] = round((time.perf_counter() - self.started) * 1000, 2)
+        return row
+
+
+_current: contextvars.ContextVar[Optional[RequestCost]] = contextvars.ContextVar("request_cost", default=None)
+
+
+def begin(endpoint: str, device_id: str, language: str, claims: int = 1) -> RequestCost:
+    """Start accounting for the current request (or job) and return its entry."""
+    entry = RequestCost(endpoint, device_id, language, claims)
+    _current.set(entry)
+    return entry
+
+
+def resume(entry: RequestCost) -> None:
+    """Make `entry` current again, e.g. in a streamed response body iterated after the endpoint returned."""
+    _current.set(entry)
+
+
+def current() -> Optional[RequestCost]:
+    return _current.get()
+
+
+def add_time(phase: str, seconds: float) -> None:
+    """Add `seconds` to `phase` of the current request, if one is being accounted."""
+    entry = _current.get()
+    if entry is not None:
+        entry.add_time(phase, seconds)
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(phase, time.perf_counter() - started)
+
+
+def record_llm_call(
+    model: str, latency: float, prompt_tokens: Optional[int], completion_tokens: Optional[int],
+    cached_prompt_tokens: Optional[int]
+) -> None:
+    """Add one LLM call and the token counts the proxy reported for it to the current request."""
+    entry = _current.get()
+    if entry is None:
+        return
+    entry.llm_calls += 1
+    entry.models.add(model)
+    entry.add_time("llm_latency", latency)
+    entry.prompt_tokens += prompt_tokens or 0
+    entry.completion_tokens += completion_tokens or 0
+    entry.cached_prompt_tokens += cached_prompt_tokens or 0
+
+
+# Columns the summary can be grouped by
+GROUPS = {
+    "device": RequestLedgerEntry.device_id,
+    "day": func.date(RequestLedgerEntry.created_at),
+    "language": RequestLedgerEntry.language,
+    "model": RequestLedgerEntry.model,
+    "endpoint": RequestLedgerEntry.endpoint,
+}
+
+
+class Ledger:
+    """Per-request cost records in the `request_ledger` table.
+
+    `submit` hands the finished entry to `write_behind`, so on the request
+    path it costs an append to a buffer; entries reach the table in bulk
+    inserts shared with the other non-critical writes.
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+
+    async def submit(self, entry: RequestCost) -> None:
+        if self.enabled:
+            await write_behind.insert(RequestLedgerEntry, entry.row())
+
+    async def summary(
+        self,
+        group_by: Sequence[str] = ("day",),
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        device_id: Optional[str] = None
+    ) -> List[Dict]:
+        """Requests, tokens and mean phase times per group, most expensive groups first."""
+        unknown = set(group_by) - set(GROUPS)
+        if unknown:
+            raise ValueError(f"Cannot group by {', '.join(sorted(unknown))}; choose from {', '.join(GROUPS)}")
+        keys = [GROUPS[name].label(name) for name in group_by]
+        entry = RequestLedgerEntry
+        tokens = func.sum(entry.prompt_tokens + entry.completion_tokens)
+        query = select(
+            *keys,
+            func.count().label("requests"),
+            func.sum(case((entry.status != "success", 1), else_=0)).label("errors"),
+            func.sum(entry.claims).label("claims"),
+            func.sum(entry.cached_claims).label("cached_claims"),
+            func.sum(entry.llm_calls).label("llm_calls"),
+            func.sum(entry.prompt_tokens).label("prompt_tokens"),
+            func.sum(entry.completion_tokens).label("completion_tokens"),
+            func.sum(entry.cached_prompt_tokens).label("cached_prompt_tokens"),
+            *(func.avg(getattr(entry, f"{phase}_ms")).label(f"avg_{phase}_ms") for phase in PHASES),
+            func.avg(entry.total_ms).label("avg_total_ms"),
+            func.max(entry.total_ms).label("max_total_ms")
+        ).group_by(*keys).order_by(tokens.desc(), *keys)
+        if since is not None:
+            query = query.where(entry.created_at >= since)
+        if until is not None:
+            query = query.where(entry.created_at < until)
+        if device_id is not None:
+            query = query.where(entry.device_id == device_id)
+        async with get_db_session() as session:
+            result = await session.execute(query)
+        rows = []
+        for row in result.mappings():
+            row = dict(row)
+            for name, value in row.items():
+                if name.startswith(("avg_", "max_")) and value is not None:
+                    row[name] = round(value, 1)
+            if "day" in row:
+                row["day"] = str(row["day"])
+            rows.append(row)
+        return rows
+
+
+ledger = Ledger(enabled=get_settings().LEDGER_ENABLED)
@@ -0,0 +1,84 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from app.config import get_settings
+from app.metrics import MULTIPROCESS, TOOL_NAME, balance_cache_requests
+
+
+class BalanceCache:
+    """Per-device `(paid_tokens, free_trial_remaining)` kept in process memory.
+
+    Writers update cached entries in place (write-through) with the change they
+    just committed; entries also expire after `ttl` seconds so changes made by
+    other processes show up eventually.
+
+    A read that loads from the database can race with a write that commits
+    while the query runs. `sequence` is taken before the query and passed to
+    `fill`, which refuses to store the loaded value if the device was written
+    to in the meantime.
+
+    Writes are only seen by the process that made them, so with several
+    workers a webhook handled by one would leave the others serving the old
+    balance until it expires. The cache is therefore disabled (every read
+    goes to the database) when running multiprocess.
+    """
+
+    def __init__(self, ttl: int, max_entries: int, enabled: bool = True):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.sequence = 0
+        self._entries: "OrderedDict[str, Tuple[float, int, int]]" = OrderedDict()
+        self._last_write: "OrderedDict[str, int]" = OrderedDict()
+
+    def _touch(self, device_id: str) -> None:
+        self.sequence += 1
+        self._last_write[device_id] = self.sequence
+        self._last_write.move_to_end(device_id)
+        if len(self._last_write) > self.max_entries:
+            self._last_write.popitem(last=False)
+
+    def get(self, device_id: str) -> Optional[Tuple[int, int]]:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(device_id)
+        if entry is None or entry[0] <= time.monotonic():
+            balance_cache_requests.labels(tool=TOOL_NAME, outcome="miss").inc()
+            return None
+        self._entries.move_to_end(device_id)
+        balance_cache_requests.labels(tool=TOOL_NAME, outcome="hit").inc()
+        return entry[1], entry[2]
+
+    def fill(self, device_id: str, paid: int, trial: int, sequence: int) -> None:
+        """Store a balance loaded from the database when `sequence` was current."""
+        if not self.enabled or self._last_write.get(device_id, -1) > sequence:
+            return
+        self._entries[device_id] = (time.monotonic() + self.ttl, paid, trial)
+        self._entries.move_to_end(device_id)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def adjust(self, device_id: str, paid: int = 0, trial: int = 0) -> None:
+        """Apply a committed change to the cached balance, if there is one."""
+        self._touch(device_id)
+        entry = self._entries.get(device_id)
+        if entry is not None:
+            expires_at, cached_paid, cached_trial = entry
+            self._entries[device_id] = (expires_at, max(0, cached_paid + paid), max(0, cached_trial + trial))
+
+    def invalidate(self, device_id: str) -> None:
+        self._touch(device_id)
+        self._entries.pop(device_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._last_write.clear()
+
+
+_settings = get_settings()
+
+balance_cache = BalanceCache(
+    ttl=_settings.BALANCE_CACHE_TTL,
+    max_entries=_settings.BALANCE_CACHE_MAX_ENTRIES,
+    enabled=_settings.BALANCE_CACHE_ENABLED and not MULTIPROCESS
+)
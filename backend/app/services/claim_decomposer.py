@@ -0,0 +1,110 @@
+import re
+from typing import List, Optional
+from app.services.llm_service import credibility_level, get_disclaimer
+from app.services.model_router import MODEL_SEPARATOR
+from app.services.result_cache import normalize_claim
+
+# Sentence ends: western punctuation followed by whitespace, CJK punctuation anywhere, line breaks
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?;])\s+|(?<=[。！？；])|\n+")
+
+
+def _sentences(claim: str) -> List[str]:
+    return [sentence.strip() for sentence in _SENTENCE_BREAK.split(claim) if sentence and sentence.strip()]
+
+
+def split_claim(claim: str, min_chars: int, max_parts: int, min_part_chars: int) -> List[str]:
+    """Split a long claim into sub-claims that can be checked independently.
+
+    Claims shorter than `min_chars` are returned whole. Otherwise every
+    sentence becomes a sub-claim, with sentences under `min_part_chars`
+    joined to the next one, so a sentence quoted in different posts maps to
+    the same sub-claim and its cached result is reused. Only when that gives
+    more than `max_parts` are neighbouring sentences grouped into parts of
+    similar length. Sub-claims repeated within the claim are checked once.
+    """
+    if len(claim) < min_chars:
+        return [claim]
+
+    parts: List[str] = []
+    pending = ""
+    for sentence in _sentences(claim):
+        pending = f"{pending} {sentence}".strip()
+        if len(pending) >= min_part_chars:
+            parts.append(pending)
+            pending = ""
+    if pending:
+        if parts:
+            parts[-1] = f"{parts[-1]} {pending}"
+        else:
+            parts.append(pending)
+
+    if len(parts) > max_parts:
+        target = sum(len(part) for part in parts) / max_parts
+        # Every group but the last reaches `target`, so there are at most `max_parts`
+        grouped = [parts[0]]
+        for part in parts[1:]:
+            if len(grouped[-1]) < target:
+                grouped[-1] = f"{grouped[-1]} {part}"
+            else:
+                grouped.append(part)
+        parts = grouped
+
+    unique = {}
+    for part in parts:
+        unique.setdefault(normalize_claim(part), part)
+    return list(unique.values()) if len(unique) > 1 else [claim]
+
+
+def _sum(values: List[Optional[int]]) -> Optional[int]:
+    return None if any(value is None for value in values) else sum(values)
+
+
+def merge_results(parts: List[str], results: List[dict], language: str) -> dict:
+    """Combine the analyses of a claim's sub-claims into one analysis of the whole claim.
+
+    The score is the average of the sub-claim scores weighted by their
+    length, pulled halfway toward the lowest one: a claim is only as credible
+    as its weakest part. Key points, contradictions and red flags are
+    concatenated without duplicates; the likely origin and spread pattern are
+    those of the least credible part.
+    """
+    scores = [float(result["credibility_score"]) for result in results]
+    weights = [len(part) for part in parts]
+    average = sum(score * weight for score, weight in zip(scores, weights)) / sum(weights)
+    score = round((average + min(scores)) / 2, 1)
+    weakest = results[scores.index(min(scores))]
+
+    def unique(items):
+        return list(dict.fromkeys(items))
+
+    points = {}
+    for result in results:
+        for point in result.get("key_points", []):
+            points.setdefault(normalize_claim(point["point"]), point)
+
+    merged = {
+        "credibility_score": score,
+        "credibility_level": credibility_level(score),
+        "summary": " ".join(result["summary"] for result in results),
+        "key_points": list(points.values()),
+        "contradictions": unique(item for result in results for item in result.get("contradictions", [])),
+        "source_analysis": {
+            "likely_origin": weakest["source_analysis"]["likely_origin"],
+            "spread_pattern": weakest["source_analysis"]["spread_pattern"],
+            "red_flags": unique(flag for result in results for flag in result["source_analysis"].get("red_flags", [])),
+        },
+        "disclaimer": get_disclaimer(language),
+        "sub_claims": len(parts),
+    }
+    if all(result.get("model") for result in results):
+        merged["model"] = MODEL_SEPARATOR.join(unique(result["model"] for result in results))
+    latencies = [result.get("llm_latency_ms") for result in results if result.get("llm_latency_ms") is not None]
+    if latencies:
+        merged["llm_latency_ms"] = max(latencies)  # sub-claims run concurrently
+    usages = [result.get("usage") for result in results]
+    if all(usages):
+        merged["usage"] = {
+            field: _sum([usage.get(field) for usage in usages])
+            for field in ("prompt_tokens", "completion_tokens", "cached_prompt_tokens", "estimated_prompt_tokens", "max_tokens")
+        }
+    return merged
@@ -0,0 +1,217 @@
+import hashlib
+import re
+from array import array
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import delete, select
+from app.config import get_settings
+from app.database import get_db_session
+from app.metrics import TOOL_NAME, claim_index_size, register_scrape_hook
+from app.models.fingerprint import ClaimFingerprint
+from app.services.result_cache import normalize_claim
+from app.services.write_behind import write_behind
+
+FINGERPRINT_BITS = 64
+SHINGLE_SIZE = 4  # characters per shingle; works for scripts without word spacing too
+
+# Attention-grabbing lead-ins that viral copies add to the same claim
+_LEAD_INS = re.compile(
+    r"^(?:(?:breaking news|breaking|just in|urgent|update|viral|must read|read this|share this|fact check)\s+)+"
+)
+
+
+def dedup_text(claim: str) -> str:
+    """Claim text reduced to what matters for near-duplicate matching.
+
+    On top of `normalize_claim`, punctuation, emoji and other symbols are
+    dropped and lead-ins such as "BREAKING:" are removed.
+    """
+    text = normalize_claim(claim)
+    text = " ".join("".join(ch if ch.isalnum() else " " for ch in text).split())
+    return _LEAD_INS.sub("", text) or text
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over the character shingles of `text`."""
+    shingles = {text[i:i + SHINGLE_SIZE] for i in range(max(1, len(text) - SHINGLE_SIZE + 1))}
+    hashes = [
+        format(int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big"), "064b")
+        for s in shingles
+    ]
+    # Transposing the bit strings counts each bit position across all shingles in C
+    half = len(hashes) / 2
+    return int("".join("1" if column.count("1") > half else "0" for column in zip(*hashes)), 2)
+
+
+def claim_fingerprint(claim: str) -> int:
+    return simhash(dedup_text(claim))
+
+
+def _to_signed(value: int) -> int:
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class _LanguageShard:
+    """Fingerprints of one language, kept in flat arrays.
+
+    Row `i` is `fingerprints[i]` plus the 32-byte cache key at `keys[32*i:32*i+32]`.
+    Each LSH band is a sorted `array('Q')` of `(band value << 32) | row`, so a
+    bucket is the contiguous run found by two binary searches.
+    """
+
+    def __init__(self, bands: int):
+        self.fingerprints = array("Q")
+        self.keys = bytearray()
+        self.bands = [array("Q") for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    def key(self, row: int) -> str:
+        return self.keys[row * 32:(row + 1) * 32].hex()
+
+
+class ClaimIndex:
+    """In-memory index of previously analyzed claims for near-duplicate lookup.
+
+    Claims are fingerprinted with SimHash, and two claims are near-duplicates
+    when their fingerprints differ in few enough bits for `threshold`
+    similarity. Fingerprints are split into LSH bands with one more band than
+    the allowed bit difference, so every match shares at least one whole band
+    with the query and is found by looking only at those buckets.
+
+    The index maps fingerprints to result cache keys; results themselves stay
+    in the result cache. When `persistent` is set, fingerprints are also kept in
+    the `claim_fingerprints` table and `load` rebuilds the index from it.
+    """
+
+    def __init__(self, threshold: float, max_age: int, persistent: bool = True):
+        self.threshold = threshold
+        self.max_age = max_age
+        self.persistent = persistent
+        self.max_distance = int((1 - threshold) * FINGERPRINT_BITS)
+        band_count = min(max(self.max_distance + 1, 2), 8)
+        self._width = FINGERPRINT_BITS // band_count
+        self._band_shifts = [band * self._width for band in range(band_count)]
+        self._mask = (1 << self._width) - 1
+        self._shards: Dict[str, _LanguageShard] = {}
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards.values())
+
+    def _band_entries(self, fingerprint: int, row: int) -> List[int]:
+        return [((fingerprint >> shift) & self._mask) << 32 | row for shift in self._band_shifts]
+
+    def _closest(self, shard: _LanguageShard, fingerprint: int) -> Optional[Tuple[int, int]]:
+        best: Optional[Tuple[int, int]] = None
+        for shift, entries in zip(self._band_shifts, shard.bands):
+            value = (fingerprint >> shift) & self._mask
+            lo = bisect_left(entries, value << 32)
+            hi = bisect_left(entries, (value + 1) << 32, lo)
+            for i in range(lo, hi):
+                row = entries[i] & 0xFFFFFFFF
+                distance = (fingerprint ^ shard.fingerprints[row]).bit_count()
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (row, distance)
+                    if distance == 0:
+                        return best
+        return best
+
+    def find(self, claim: str, language: str) -> Optional[Tuple[str, float]]:
+        """Cache key and similarity of the closest indexed near-duplicate, if any."""
+        shard = self._shards.get(language)
+        if not shard:
+            return None
+        match = self._closest(shard, claim_fingerprint(claim))
+        if match is None:
+            return None
+        row, distance = match
+        return shard.key(row), 1 - distance / FINGERPRINT_BITS
+
+    def insert(self, language: str, fingerprint: int, cache_key: str) -> bool:
+        """Add a fingerprint to the in-memory index; False if the key is already indexed."""
+        shard = self._shards.get(language)
+        if shard is None:
+            shard = self._shards[language] = _LanguageShard(len(self._band_shifts))
+        match = self._closest(shard, fingerprint)
+        if match is not None and match[1] == 0 and shard.key(match[0]) == cache_key:
+            return False
+        row = len(shard)
+        shard.fingerprints.append(fingerprint)
+        shard.keys += bytes.fromhex(cache_key)
+        for entries, entry in zip(shard.bands, self._band_entries(fingerprint, row)):
+            insort(entries, entry)
+        return True
+
+    async def add(self, claim: str, language: str, cache_key: str) -> None:
+        """Index an analyzed claim under the cache key its result is stored at."""
+        fingerprint = claim_fingerprint(claim)
+        if not self.insert(language, fingerprint, cache_key) or not self.persistent:
+            return
+        await write_behind.upsert(
+            ClaimFingerprint,
+            {"cache_key": cache_key, "language": language, "fingerprint": _to_signed(fingerprint)},
+            key=("cache_key",),
+            update=("language", "fingerprint")
+        )
+
+    async def load(self) -> int:
+        """Rebuild the index from the `claim_fingerprints` table.
+
+        Rows older than `max_age` (their results have expired) are deleted first.
+        Arrays are filled in one pass and each band is sorted once, which is
+        much cheaper than inserting rows one at a time.
+        """
+        if not self.persistent:
+            return 0
+        fingerprints: Dict[str, array] = {}
+        keys: Dict[str, bytearray] = {}
+        async with get_db_session() as session:
+            await session.execute(
+                delete(ClaimFingerprint).where(ClaimFingerprint.created_at < _utcnow() - timedelta(seconds=self.max_age))
+            )
+            await session.commit()
+            rows = await session.stream(
+                select(ClaimFingerprint.language, ClaimFingerprint.fingerprint, ClaimFingerprint.cache_key)
+                .execution_options(yield_per=10000)
+            )
+            async for language, fingerprint, cache_key in rows:
+                fingerprints.setdefault(language, array("Q")).append(_to_unsigned(fingerprint))
+                keys.setdefault(language, bytearray()).extend(bytes.fromhex(cache_key))
+        self.rebuild(fingerprints, keys)
+        return len(self)
+
+    def rebuild(self, fingerprints: Dict[str, array], keys: Dict[str, bytearray]) -> None:
+        """Replace the index with per-language fingerprint arrays and packed 32-byte keys."""
+        self._shards = {}
+        for language, values in fingerprints.items():
+            shard = self._shards[language] = _LanguageShard(len(self._band_shifts))
+            shard.fingerprints = values
+            shard.keys = keys[language]
+            for band, shift in enumerate(self._band_shifts):
+                shard.bands[band] = array("Q", sorted(
+                    ((fingerprint >> shift) & self._mask) << 32 | row for row, fingerprint in enumerate(values)
+                ))
+
+    def clear(self) -> None:
+        self._shards = {}
+
+
+_settings = get_settings()
+
+claim_index = ClaimIndex(
+    threshold=_settings.CLAIM_DEDUP_THRESHOLD,
+    max_age=_settings.RESULT_CACHE_TTL,
+    persistent=_settings.RESULT_CACHE_PERSISTENT
+)
+
+register_scrape_hook(lambda: claim_index_size.labels(tool=TOOL_NAME).set(len(claim_index)))
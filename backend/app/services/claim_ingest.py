@@ -0,0 +1,208 @@
+import asyncio
+import csv
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from pydantic import ValidationError
+from app.schemas.fact_check import ClaimRequest
+from app.services.fact_check_service import run_fact_check
+from app.services.resilience import CircuitOpenError, LLMBusyError
+
+logger = logging.getLogger(__name__)
+
+# (record number, claim request or None if the record is unusable)
+Record = Tuple[int, Optional[ClaimRequest]]
+
+
+def detect_format(path: str) -> str:
+    return "csv" if path.lower().endswith((".csv", ".tsv")) else "jsonl"
+
+
+def _rows(path: str, fmt: str) -> Iterator[Tuple[int, Optional[dict]]]:
+    """Yield `(record number, fields)` one record at a time; fields is None for unparseable lines."""
+    if fmt == "csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            dialect = "excel-tab" if path.lower().endswith(".tsv") else "excel"
+            for number, row in enumerate(csv.DictReader(f, dialect=dialect), 1):
+                yield number, row
+        return
+    with open(path, "rb") as f:
+        number = 0
+        for line in f:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield number, row if isinstance(row, dict) else None
+
+
+def read_claims(
+    path: str, fmt: Optional[str] = None, claim_field: str = "claim", language_field: str = "language",
+    default_language: str = "en"
+) -> Iterator[Record]:
+    """Stream the claims of a JSONL or CSV file without loading it into memory.
+
+    Records are numbered from 1, skipping blank JSONL lines, so numbers are
+    stable across runs and can be used to resume. Records that are not valid
+    JSON objects, lack `claim_field` or would be rejected by the API come
+    back as `(number, None)`.
+    """
+    for number, row in _rows(path, fmt or detect_format(path)):
+        if row is None:
+            yield number, None
+            continue
+        try:
+            yield number, ClaimRequest(
+                claim=str(row.get(claim_field) or "").strip(),
+                language=str(row.get(language_field) or default_language)
+            )
+        except ValidationError:
+            yield number, None
+
+
+def count_records(path: str, fmt: Optional[str] = None) -> int:
+    """Number of records `read_claims` will yield, for progress reporting."""
+    return sum(1 for _ in _rows(path, fmt or detect_format(path)))
+
+
+def load_checkpoint(path: str) -> int:
+    """Records already ingested according to the checkpoint file, 0 if there is none."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return int(json.load(f)["done"])
+    except FileNotFoundError:
+        return 0
+
+
+def save_checkpoint(path: str, done: int, counts: Dict[str, int]) -> None:
+    # Write then rename, so a crash never leaves a truncated checkpoint
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump({"done": done, "counts": counts}, f)
+    os.replace(temporary, path)
+
+
+class IngestProgress:
+    """Counts by outcome, with throughput and ETA over the records processed this run."""
+
+    def __init__(self, total: Optional[int], skipped: int = 0):
+        self.total = total
+        self.skipped = skipped
+        self.counts: Dict[str, int] = {"analyzed": 0, "cached": 0, "invalid": 0, "failed": 0}
+        self.started = time.monotonic()
+
+    @property
+    def processed(self) -> int:
+        return sum(self.counts.values())
+
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def eta(self) -> Optional[float]:
+        rate = self.rate()
+        if self.total is None or not rate:
+            return None
+        return max(0, self.total - self.skipped - self.processed) / rate
+
+    def format(self) -> str:
+        done = self.skipped + self.processed
+        position = f"{done}/{self.total} ({100 * done / self.total:.1f}%)" if self.total else str(done)
+        eta = self.eta()
+        eta_text = time.strftime("%H:%M:%S", time.gmtime(eta)) if eta is not None else "?"
+        outcomes = " ".join(f"{name}={count}" for name, count in self.counts.items())
+        return f"{position} {self.rate():.1f} claims/s ETA {eta_text} {outcomes}"
+
+
+async def _check(number: int, request: ClaimRequest, waits: int) -> str:
+    # Unlike a user, a bulk run can afford to wait out an open circuit or a full LLM queue
+    for attempt in range(waits + 1):
+        try:
+            result = await run_fact_check(request.claim, request.language)
+        except (CircuitOpenError, LLMBusyError) as e:
+            if attempt == waits:
+                logger.warning("Record %d failed: %r", number, e)
+                return "failed"
+            await asyncio.sleep(max(1.0, e.retry_in))
+        except Exception as e:
+            logger.warning("Record %d failed: %r", number, e)
+            return "failed"
+        else:
+            return "cached" if result.get("cached") else "analyzed"
+    return "failed"
+
+
+async def ingest_claims(
+    records: Iterator[Record],
+    progress: IngestProgress,
+    concurrency: int,
+    checkpoint: Optional[str] = None,
+    checkpoint_every: int = 100,
+    report: Optional[Callable[[IngestProgress], None]] = None,
+    report_interval: float = 5.0,
+    waits: int = 3
+) -> Dict[str, int]:
+    """Fact-check streamed records with at most `concurrency` in flight, caching every result.
+
+    Records numbered up to `progress.skipped` are skipped. Results go through
+    `run_fact_check`, so claims already cached are not analyzed again and new
+    results land in the result cache and claim index. The checkpoint records
+    the highest number below which every record has finished (records can
+    finish out of order), so an interrupted run resumed from it repeats at
+    most `concurrency` checks. While the LLM circuit is open or its queue is
+    full a record waits and tries again, up to `waits` times; other failures
+    are not retried. Running the file again from the start retries failed
+    records while the rest are cache hits.
+    """
+    pending: Dict[asyncio.Task, int] = {}
+    next_report = time.monotonic() + report_interval
+    since_checkpoint = 0
+    last_number = progress.skipped
+
+    def low_water() -> int:
+        return min(pending.values()) - 1 if pending else last_number
+
+    async def drain(block: bool) -> None:
+        nonlocal since_checkpoint, next_report
+        if not pending:
+            return
+        finished, _ = await asyncio.wait(
+            pending, timeout=None if block else 0, return_when=asyncio.FIRST_COMPLETED
+        )
+        for task in finished:
+            del pending[task]
+            progress.counts[task.result()] += 1
+            since_checkpoint += 1
+        if checkpoint and since_checkpoint >= checkpoint_every:
+            save_checkpoint(checkpoint, low_water(), progress.counts)
+            since_checkpoint = 0
+        if report is not None and time.monotonic() >= next_report:
+            report(progress)
+            next_report = time.monotonic() + report_interval
+
+    try:
+        for number, request in records:
+            if number <= progress.skipped:
+                continue
+            last_number = number
+            if request is None:
+                logger.warning("Record %d skipped: no valid claim", number)
+                progress.counts["invalid"] += 1
+                continue
+            while len(pending) >= concurrency:
+                await drain(block=True)
+            pending[asyncio.ensure_future(_check(number, request, waits))] = number
+            await drain(block=False)
+        while pending:
+            await drain(block=True)
+    finally:
+        for task in pending:
+            task.cancel()
+        if checkpoint:
+            save_checkpoint(checkpoint, low_water(), progress.counts)
+    return progress.counts
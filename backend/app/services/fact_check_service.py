@@ -0,0 +1,200 @@
+import asyncio
+from typing import Any, AsyncIterator, List, Optional, Tuple
+from app.config import get_settings
+from app.metrics import TOOL_NAME, claim_dedup_lookups, stale_results_served
+from app.services.claim_decomposer import merge_results, split_claim
+from app.services.claim_index import claim_index
+from app.services.json_stream import IncrementalObjectParser
+from app.services.llm_service import analyze_claim, complete_analysis, stream_claim_analysis
+from app.services.resilience import is_unavailable
+from app.services.result_cache import make_cache_key, result_cache
+from app.services.single_flight import SingleFlight
+
+# Concurrent checks of the same claim share one upstream LLM call
+claim_flight = SingleFlight("fact_check")
+
+# Top-level result fields emitted by the streaming endpoint as soon as they are complete;
+# key_points are emitted one "key_point" at a time instead
+STREAMED_FIELDS = ("credibility_score", "credibility_level", "summary", "contradictions", "source_analysis")
+
+
+async def _cached_result(key: str, claim: str, language: str) -> Optional[dict]:
+    """Cached result for the claim itself or, failing that, for an indexed near-duplicate."""
+    result = await result_cache.get(key)
+    if result is not None or not get_settings().CLAIM_DEDUP_ENABLED:
+        return result
+
+    match = claim_index.find(claim, language)
+    if match is None:
+        claim_dedup_lookups.labels(tool=TOOL_NAME, outcome="no_match").inc()
+        return None
+    result = await result_cache.get(match[0])
+    if result is None:
+        claim_dedup_lookups.labels(tool=TOOL_NAME, outcome="result_expired").inc()
+        return None
+    claim_dedup_lookups.labels(tool=TOOL_NAME, outcome="near_duplicate").inc()
+    # Seed the exact key so repeats of this wording are plain cache hits
+    await result_cache.set(key, result, language)
+    return result
+
+
+async def _store_result(key: str, claim: str, language: str, result: dict) -> None:
+    await result_cache.set(key, result, language)
+    if get_settings().CLAIM_DEDUP_ENABLED:
+        await claim_index.add(claim, language, key)
+
+
+async def _stale_result(key: str, error: Exception) -> Optional[dict]:
+    """Expired cached result to answer with when the LLM proxy is unavailable."""
+    if not get_settings().RESULT_CACHE_ENABLED or not is_unavailable(error):
+        return None
+    result = await result_cache.get_stale(key)
+    if result is None:
+        return None
+    stale_results_served.labels(tool=TOOL_NAME).inc()
+    return {**result, "cached": True, "stale": True}
+
+
+async def _replay(result: dict) -> AsyncIterator[Tuple[str, Any]]:
+    """Events of `stream_fact_check` for a result that is already complete."""
+    for field in STREAMED_FIELDS[:3]:
+        yield field, result.get(field)
+    for point in result.get("key_points", []):
+        yield "key_point", point
+    for field in STREAMED_FIELDS[3:]:
+        yield field, result.get(field)
+    yield "result", result
+
+
+async def _analyze_and_cache(key: str, claim: str, language: str) -> dict:
+    result = await analyze_claim(claim, language)
+    if get_settings().RESULT_CACHE_ENABLED:
+        await _store_result(key, claim, language, result)
+    return result
+
+
+def _sub_claims(claim: str) -> List[str]:
+    settings = get_settings()
+    if not settings.DECOMPOSE_ENABLED:
+        return [claim]
+    return split_claim(
+        claim, settings.DECOMPOSE_MIN_CHARS, settings.DECOMPOSE_MAX_PARTS, settings.DECOMPOSE_MIN_PART_CHARS
+    )
+
+
+async def _check_decomposed(key: str, claim: str, language: str, parts: List[str]) -> dict:
+    """Check sub-claims concurrently, each through the result cache, and merge their results."""
+    # Parts are checked whole: a part still longer than DECOMPOSE_MIN_CHARS must not fan out again
+    results = await asyncio.gather(*(run_fact_check(part, language, decompose=False) for part in parts))
+    result = merge_results(parts, results, language)
+    stale = any(part.get("stale") for part in results)
+    if get_settings().RESULT_CACHE_ENABLED and not stale:
+        await _store_result(key, claim, language, result)
+    return {**result, "cached": all(part["cached"] for part in results), "stale": stale}
+
+
+async def _fresh_result(key: str, claim: str, language: str, decompose: bool = True) -> dict:
+    """Analysis of a claim that missed the cache, or an expired one if the LLM proxy is unavailable."""
+    parts = _sub_claims(claim) if decompose else [claim]
+    try:
+        if len(parts) > 1:
+            return await _check_decomposed(key, claim, language, parts)
+        result, _ = await claim_flight.do(key, lambda: _analyze_and_cache(key, claim, language))
+    except Exception as e:
+        stale = await _stale_result(key, e)
+        if stale is None:
+            raise
+        return stale
+    return {**result, "cached": False}
+
+
+async def run_fact_check(claim: str, language: str = "en", decompose: bool = True) -> dict:
+    """Fact-check a claim, serving repeated claims and near-duplicates of them from the result cache.
+
+    Callers checking the same claim at the same time are coalesced onto one
+    LLM call and all receive its result or its error. Returns the analysis
+    plus a `cached` flag telling whether the LLM was called for this request.
+    When the LLM proxy is down, an expired result for the claim is returned
+    with `stale` set instead of the error, if one is still kept. With
+    DECOMPOSE_ENABLED, long claims are checked as sentence-level sub-claims
+    in parallel and the results merged (see `claim_decomposer`);
+    `decompose=False` checks the claim whole regardless.
+    """
+    key = make_cache_key(claim, language)
+    if get_settings().RESULT_CACHE_ENABLED:
+        result = await _cached_result(key, claim, language)
+        if result is not None:
+            return {**result, "cached": True}
+    return await _fresh_result(key, claim, language, decompose)
+
+
+async def stream_fact_check(claim: str, language: str = "en") -> AsyncIterator[Tuple[str, Any]]:
+    """Fact-check a claim, yielding `(event, value)` pairs as the analysis is generated.
+
+    Partial events are the top-level fields in STREAMED_FIELDS plus one
+    `key_point` per claim point. The last event is `("result", analysis)` with
+    the complete analysis, including the `cached` flag.
+    """
+    key = make_cache_key(claim, language)
+    if get_settings().RESULT_CACHE_ENABLED:
+        result = await _cached_result(key, claim, language)
+        if result is not None:
+            async for event in _replay({**result, "cached": True}):
+                yield event
+            return
+    if len(_sub_claims(claim)) > 1:
+        # The merged result only exists once every sub-claim is done, so there is nothing to stream early
+        async for event in _replay(await _fresh_result(key, claim, language)):
+            yield event
+        return
+
+    parser = IncrementalObjectParser()
+    route: dict = {}
+    streamed = False
+    try:
+        async for delta in stream_claim_analysis(claim, language, route):
+            streamed = True
+            for kind, field, value in parser.feed(delta):
+                if kind == "item" and field == "key_points":
+                    yield "key_point", value
+                elif kind == "field" and field in STREAMED_FIELDS:
+                    yield field, value
+    except Exception as e:
+        # Only fall back to a stale result if nothing of the fresh one was sent yet
+        stale = None if streamed else await _stale_result(key, e)
+        if stale is None:
+            raise
+        async for event in _replay(stale):
+            yield event
+        return
+
+    result = {**await complete_analysis(claim, language, parser.object_text or parser.text), **route}
+    if get_settings().RESULT_CACHE_ENABLED:
+        await _store_result(key, claim, language, result)
+    yield "result", {**result, "cached": False}
+
+
+async def iter_batch(
+    claims: List[Tuple[str, str]], concurrency: int
+) -> AsyncIterator[Tuple[int, Optional[dict], Optional[Exception]]]:
+    """Fact-check `(claim, language)` pairs with at most `concurrency` in flight.
+    
+    Yields `(index, result, error)` in completion order. Work still pending when
+    the consumer stops iterating is cancelled.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def run(index: int, claim: str, language: str):
+        async with semaphore:
+            try:
+                return index, await run_fact_check(claim, language), None
+            except Exception as e:
+                return index, None, e
+    
+    tasks = [asyncio.ensure_future(run(i, claim, language)) for i, (claim, language) in enumerate(claims)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
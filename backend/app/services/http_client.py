@@ -0,0 +1,130 @@
+import time
+from typing import Dict, Tuple
+import httpx
+from app.config import get_settings
+from app.metrics import TOOL_NAME, http_client_connections, http_client_pool_wait, register_scrape_hook
+
+
+class InstrumentedTransport(httpx.AsyncHTTPTransport):
+    """HTTP transport that reports how long requests wait for a pooled connection."""
+
+    def __init__(self, upstream: str, **kwargs):
+        super().__init__(**kwargs)
+        self.upstream = upstream
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        acquired = False
+        parent_trace = request.extensions.get("trace")
+
+        async def trace(event: str, info: dict):
+            nonlocal acquired
+            # The first trace event fires once the pool has handed us a connection
+            # (either "connection.connect_tcp.started" or "http11/http2.send_request_headers.started").
+            if not acquired:
+                acquired = True
+                http_client_pool_wait.labels(tool=TOOL_NAME, upstream=self.upstream).observe(
+                    time.perf_counter() - started
+                )
+            if parent_trace is not None:
+                await parent_trace(event, info)
+
+        request.extensions = {**request.extensions, "trace": trace}
+        return await super().handle_async_request(request)
+
+    def pool_stats(self) -> Dict[str, int]:
+        connections = self._pool.connections
+        idle = sum(1 for connection in connections if connection.is_idle())
+        # httpcore keeps waiting requests on a private list; there is no public accessor.
+        queued = sum(1 for pool_request in getattr(self._pool, "_requests", []) if pool_request.is_queued())
+        return {"in_use": len(connections) - idle, "idle": idle, "queued": queued}
+
+
+def _upstreams() -> Dict[str, Tuple[str, float]]:
+    """Base URL and read timeout for each named upstream."""
+    settings = get_settings()
+    return {
+        "llm": (settings.LLM_PROXY_URL, settings.LLM_TIMEOUT),
+        "creem": (settings.CREEM_API_URL, settings.CREEM_TIMEOUT),
+        "callback": ("", settings.JOB_CALLBACK_TIMEOUT),  # job completion callbacks to client URLs
+    }
+
+
+class HTTPClientRegistry:
+    """Long-lived, pooled `httpx.AsyncClient` per upstream.
+
+    Clients are opened by the app lifespan and closed on shutdown. They are also
+    created lazily on first use so code paths outside the lifespan (tests, CLI
+    tools) keep working.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._transports: Dict[str, InstrumentedTransport] = {}
+
+    def _build(self, upstream: str) -> httpx.AsyncClient:
+        settings = get_settings()
+        base_url, read_timeout = _upstreams().get(upstream, ("", settings.LLM_TIMEOUT))
+        transport = InstrumentedTransport(
+            upstream,
+            http2=settings.HTTP2_ENABLED,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+        self._transports[upstream] = transport
+        return httpx.AsyncClient(
+            base_url=base_url,
+            transport=transport,
+            timeout=httpx.Timeout(
+                read_timeout,
+                connect=settings.HTTP_CONNECT_TIMEOUT,
+                pool=settings.HTTP_POOL_TIMEOUT,
+            ),
+        )
+
+    def get(self, upstream: str) -> httpx.AsyncClient:
+        client = self._clients.get(upstream)
+        if client is None or client.is_closed:
+            client = self._clients[upstream] = self._build(upstream)
+        return client
+
+    async def start(self) -> None:
+        for upstream in _upstreams():
+            self.get(upstream)
+
+    async def warm(self, upstream: str, timeout: float) -> bool:
+        """Connect to the upstream ahead of its first real request; True if it answered at all."""
+        try:
+            await self.get(upstream).head("/", timeout=timeout)
+            return True
+        except httpx.HTTPError:
+            return False
+
+    async def aclose(self) -> None:
+        clients, self._clients = self._clients, {}
+        self._transports = {}
+        for client in clients.values():
+            await client.aclose()
+
+    def pool_stats(self) -> Dict[str, Dict[str, int]]:
+        return {upstream: transport.pool_stats() for upstream, transport in self._transports.items()}
+
+
+http_clients = HTTPClientRegistry()
+
+
+def get_http_client(upstream: str) -> httpx.AsyncClient:
+    """Borrow the shared client for an upstream ("llm", "creem", ...)."""
+    return http_clients.get(upstream)
+
+
+def _refresh_pool_metrics() -> None:
+    for upstream, stats in http_clients.pool_stats().items():
+        for state, value in stats.items():
+            http_client_connections.labels(tool=TOOL_NAME, upstream=upstream, state=state).set(value)
+
+
+register_scrape_hook(_refresh_pool_metrics)
@@ -0,0 +1,252 @@
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+import orjson
+from sqlalchemy import and_, func, or_, select, update
+from app.config import get_settings
+from app.database import get_db_session
+from app.metrics import (
+    TOOL_NAME, fact_check_jobs, fact_check_job_queue_depth, fact_check_job_wait, job_callbacks,
+    register_scrape_hook
+)
+from app.models.job import FactCheckJob
+from app.schemas.fact_check import FactCheckResult
+from app.services import accounting
+from app.services.accounting import ledger
+from app.services.fact_check_service import run_fact_check
+from app.services.http_client import get_http_client
+from app.services.rate_limit import set_llm_priority
+from app.services.token_service import refund_token
+
+logger = logging.getLogger(__name__)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _claimable(now: datetime):
+    """Jobs a worker may take: queued ones, and running ones whose lease has run out."""
+    return or_(
+        FactCheckJob.status == "queued",
+        and_(
+            FactCheckJob.status == "running",
+            or_(FactCheckJob.lease_expires_at.is_(None), FactCheckJob.lease_expires_at < now)
+        )
+    )
+
+
+async def _resolve(host: str, port: int) -> List[str]:
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    return [info[4][0] for info in infos]
+
+
+async def callback_allowed(url: str) -> bool:
+    """Whether `url` is https and its host resolves only to public addresses.
+
+    Keeps job callbacks from reaching the internal network (loopback,
+    private ranges, link-local cloud metadata endpoints).
+    """
+    parts = urlsplit(url)
+    if parts.scheme != "https" or not parts.hostname:
+        return False
+    try:
+        addresses = await _resolve(parts.hostname, parts.port or 443)
+    except (OSError, ValueError):
+        return False
+    return bool(addresses) and all(
+        ipaddress.ip_address(address.split("%")[0]).is_global for address in addresses
+    )
+
+
+class JobQueue:
+    """Background fact checks persisted in the `fact_check_jobs` table.
+
+    Submitted jobs are stored before their id is queued in memory, so nothing
+    is lost on restart: `start` re-queues every job that had not finished,
+    including running ones whose lease has expired. A worker claims a job
+    with a conditional UPDATE before running it, so with several processes
+    each job runs once; results are only recorded by the claim that still
+    holds the job, so a failed job is refunded once.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._enqueued_at: Dict[str, float] = {}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self, workers: Optional[int] = None) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        async with get_db_session() as session:
+            result = await session.execute(
+                select(FactCheckJob.id)
+                .where(_claimable(_utcnow()))
+                .order_by(FactCheckJob.created_at.asc())
+            )
+            for job_id in result.scalars():
+                self._put(job_id)
+        count = workers or get_settings().JOB_WORKERS
+        self._workers = [asyncio.create_task(self._work()) for _ in range(count)]
+
+    async def stop(self) -> None:
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    def _put(self, job_id: str) -> None:
+        self._enqueued_at[job_id] = time.monotonic()
+        self._queue.put_nowait(job_id)
+
+    async def submit(
+        self, device_id: str, claim: str, language: str, token_kind: str, callback_url: Optional[str] = None
+    ) -> FactCheckJob:
+        job = FactCheckJob(
+            id=str(uuid.uuid4()),
+            device_id=device_id,
+            claim=claim,
+            language=language,
+            token_kind=token_kind,
+            status="queued",
+            callback_url=callback_url,
+            attempts=0
+        )
+        async with get_db_session() as session:
+            session.add(job)
+            await session.commit()
+        if self._queue is not None:
+            self._put(job.id)
+        return job
+
+    async def get(self, job_id: str) -> Optional[FactCheckJob]:
+        async with get_db_session() as session:
+            return await session.get(FactCheckJob, job_id)
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self.run_job(job_id)
+            except Exception:
+                logger.exception("Fact check job %s crashed", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _update(self, job_id: str, **values) -> None:
+        async with get_db_session() as session:
+            await session.execute(update(FactCheckJob).where(FactCheckJob.id == job_id).values(**values))
+            await session.commit()
+
+    async def _claim(self, job_id: str) -> Optional[str]:
+        """Mark the job running under a new claim token, unless another worker holds it or it has finished."""
+        claim = str(uuid.uuid4())
+        now = _utcnow()
+        async with get_db_session() as session:
+            result = await session.execute(
+                update(FactCheckJob)
+                .where(FactCheckJob.id == job_id, _claimable(now))
+                .values(
+                    status="running",
+                    attempts=func.coalesce(FactCheckJob.attempts, 0) + 1,
+                    claimed_by=claim,
+                    lease_expires_at=now + timedelta(seconds=get_settings().JOB_LEASE_SECONDS)
+                )
+            )
+            await session.commit()
+        return claim if result.rowcount == 1 else None
+
+    async def _finish(self, job_id: str, claim: str, **values) -> bool:
+        """Record the outcome if this claim still holds the job; False if it was taken over meanwhile."""
+        async with get_db_session() as session:
+            result = await session.execute(
+                update(FactCheckJob)
+                .where(FactCheckJob.id == job_id, FactCheckJob.status == "running", FactCheckJob.claimed_by == claim)
+                .values(finished_at=_utcnow(), lease_expires_at=None, **values)
+            )
+            await session.commit()
+        return result.rowcount == 1
+
+    async def run_job(self, job_id: str) -> None:
+        enqueued_at = self._enqueued_at.pop(job_id, None)
+        if enqueued_at is not None:
+            fact_check_job_wait.labels(tool=TOOL_NAME).observe(time.monotonic() - enqueued_at)
+
+        claim = await self._claim(job_id)
+        if claim is None:
+            return
+        job = await self.get(job_id)
+        set_llm_priority(job.token_kind, job.device_id)
+        entry = accounting.begin("job", job.device_id, job.language)
+        entry.token_kind = job.token_kind
+
+        try:
+            checked = await run_fact_check(job.claim, job.language)
+            entry.add_result(checked)
+            result = FactCheckResult(**checked).model_dump()
+            payload = {"job_id": job_id, "status": "succeeded", "result": result}
+            finished = await self._finish(job_id, claim, status="succeeded",
+                                          result=json.dumps(result, ensure_ascii=False))
+        except Exception as e:
+            entry.status = "error"
+            error = f"Analysis failed: {str(e)}"
+            payload = {"job_id": job_id, "status": "failed", "error": error}
+            finished = await self._finish(job_id, claim, status="failed", error=error)
+            if finished:
+                await refund_token(job.device_id, job.token_kind)
+        await ledger.submit(entry)
+        if not finished:
+            logger.warning("Job %s was taken over by another worker; dropping this run's outcome", job_id)
+            return
+        fact_check_jobs.labels(tool=TOOL_NAME, status=payload["status"]).inc()
+
+        if job.callback_url:
+            delivered = await self._deliver_callback(job.callback_url, payload)
+            await self._update(job_id, callback_status="delivered" if delivered else "failed")
+
+    async def _deliver_callback(self, url: str, payload: dict) -> bool:
+        if not await callback_allowed(url):
+            logger.warning("Refusing callback to %s: not https or not a public address", url)
+            job_callbacks.labels(tool=TOOL_NAME, outcome="rejected").inc()
+            return False
+        settings = get_settings()
+        body = orjson.dumps(payload)
+        headers = {"Content-Type": "application/json"}
+        if settings.JOB_CALLBACK_SECRET:
+            headers["X-Signature"] = hmac.new(settings.JOB_CALLBACK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+        attempts = settings.JOB_CALLBACK_ATTEMPTS
+        client = get_http_client("callback")
+        for attempt in range(attempts):
+            try:
+                response = await client.post(url, content=body, headers=headers)
+                if response.status_code < 300:
+                    job_callbacks.labels(tool=TOOL_NAME, outcome="delivered").inc()
+                    return True
+            except Exception as e:
+                logger.warning("Callback to %s failed: %s", url, e)
+            if attempt + 1 < attempts:
+                await asyncio.sleep(2 ** attempt)
+        job_callbacks.labels(tool=TOOL_NAME, outcome="failed").inc()
+        return False
+
+
+job_queue = JobQueue()
+
+register_scrape_hook(lambda: fact_check_job_queue_depth.labels(tool=TOOL_NAME).set(job_queue.depth()))
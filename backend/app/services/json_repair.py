@@ -0,0 +1,178 @@
+import json
+import re
+from typing import Any, List, Optional, Set, Tuple
+
+_WHITESPACE = " \t\r\n"
+_LITERAL = re.compile(r"-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null|True|False|None")
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_STRING_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+def extract_object(text: str) -> Optional[str]:
+    """Text of the outermost JSON object in `text`, ignoring prose and markdown around it.
+
+    Returns everything from the first ``{`` to its matching ``}``, or to the end
+    of the text if the object was cut off.
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+    depth = 0
+    in_string = escape = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+
+def repair_json(text: str) -> Tuple[str, Set[str]]:
+    """Fix the defects LLMs commonly put in JSON.
+
+    Handles comments, trailing commas, Python literals (True/False/None),
+    single-quoted strings, raw control characters inside strings and output
+    truncated mid-value (cut back to the last complete member and closed).
+    Returns the repaired text and the kinds of repairs applied.
+    """
+    out: List[str] = []
+    repairs: Set[str] = set()
+    stack: List[str] = []  # open containers, "{" or "["
+    expect_key: List[bool] = []  # per open container: an object key comes next
+    # Position in `out` after the last complete value, and the containers open there
+    safe: Tuple[int, List[str]] = (0, [])
+    quote: Optional[str] = None  # quote character of the open string
+    string_is_key = False
+    i, n = 0, len(text)
+
+    def value_done() -> None:
+        nonlocal safe
+        safe = (len(out), list(stack))
+
+    while i < n:
+        char = text[i]
+
+        if quote is not None:
+            if char == "\\" and i + 1 < n:
+                out.append(text[i:i + 2])
+                i += 2
+                continue
+            if char == quote:
+                out.append('"')
+                quote = None
+                if not string_is_key:
+                    value_done()
+            elif char == '"':
+                out.append('\\"')  # double quote inside a single-quoted string
+            elif char in _STRING_ESCAPES:
+                out.append(_STRING_ESCAPES[char])
+                repairs.add("control_character")
+            else:
+                out.append(char)
+            i += 1
+            continue
+
+        if char in _WHITESPACE:
+            out.append(char)
+            i += 1
+            continue
+        if text.startswith("//", i):
+            end = text.find("\n", i)
+            i = n if end < 0 else end
+            repairs.add("comment")
+            continue
+        if text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            repairs.add("comment")
+            continue
+
+        if char in "\"'":
+            if char == "'":
+                repairs.add("single_quotes")
+            quote = char
+            string_is_key = bool(stack) and stack[-1] == "{" and expect_key[-1]
+            out.append('"')
+        elif char in "{[":
+            stack.append(char)
+            expect_key.append(char == "{")
+            out.append(char)
+            value_done()  # an empty container is a valid place to stop
+        elif char in "}]":
+            if not stack:
+                break  # stray closer after the object
+            opened = stack.pop()
+            expect_key.pop()
+            if char != ("}" if opened == "{" else "]"):
+                repairs.add("mismatched_bracket")
+            out.append("}" if opened == "{" else "]")
+            value_done()
+            if not stack:
+                break
+        elif char == ",":
+            following = text[i + 1:].lstrip(_WHITESPACE)
+            if following[:1] in ("}", "]"):
+                repairs.add("trailing_comma")
+            else:
+                out.append(char)
+                if stack and stack[-1] == "{":
+                    expect_key[-1] = True
+        elif char == ":":
+            out.append(char)
+            if stack and stack[-1] == "{":
+                expect_key[-1] = False
+        else:
+            match = _LITERAL.match(text, i)
+            if match is None:
+                # Unquoted junk (e.g. an ellipsis); skip it
+                repairs.add("junk")
+                i += 1
+                continue
+            literal = match.group()
+            if literal in _PYTHON_LITERALS:
+                literal = _PYTHON_LITERALS[literal]
+                repairs.add("python_literal")
+            out.append(literal)
+            i = match.end()
+            if i < n:
+                value_done()
+            continue
+        i += 1
+
+    if quote is not None or stack:
+        # Truncated: drop the unfinished tail and close what was open at the last complete value
+        repairs.add("truncated")
+        end, open_containers = safe
+        del out[end:]
+        text = "".join(out).rstrip(_WHITESPACE).rstrip(",")
+        return text + "".join("}" if c == "{" else "]" for c in reversed(open_containers)), repairs
+    return "".join(out), repairs
+
+
+def loads_tolerant(text: str) -> Tuple[Any, Set[str]]:
+    """Parse the outermost JSON object in `text`, repairing it if needed.
+
+    Returns the parsed value and the repairs that were needed (empty when the
+    object parsed as it was). Raises ValueError when nothing usable is found.
+    """
+    fragment = extract_object(text)
+    if fragment is None:
+        raise ValueError("No JSON object in text")
+    try:
+        return json.loads(fragment), set()
+    except json.JSONDecodeError:
+        pass
+    repaired, repairs = repair_json(fragment)
+    return json.loads(repaired), repairs
@@ -0,0 +1,152 @@
+import json
+from typing import Any, List, Optional, Tuple
+from app.services.json_repair import repair_json
+
+_WHITESPACE = " \t\r\n"
+
+
+class IncrementalObjectParser:
+    """Incrementally parse a JSON object as its text streams in.
+
+    Feed text chunks as they arrive. `feed` returns the events completed by the
+    chunk, in order:
+
+    - ``("field", key, value)`` when a top-level member has been fully received
+    - ``("item", key, value)`` when an element of a top-level array member has
+      been fully received, before the array itself is complete
+
+    Anything before the first ``{`` (prose, markdown fences) and after the
+    matching ``}`` is ignored.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.done = False
+        self._pos = 0
+        self._stack: List[str] = []  # open containers, "{" or "["
+        self._in_string = False
+        self._escape = False
+        self._key: Optional[str] = None
+        self._key_start: Optional[int] = None
+        self._expect_key = True
+        self._value_start: Optional[int] = None
+        self._item_start: Optional[int] = None
+        self._object_start: Optional[int] = None
+
+    def _decode(self, start: int, end: int) -> Any:
+        return json.loads(self.text[start:end])
+
+    def _decode_value(self, start: int, end: int) -> Tuple[bool, Any]:
+        # Values with defects (e.g. trailing commas) are repaired; ones beyond repair emit no event
+        try:
+            return True, self._decode(start, end)
+        except ValueError:
+            pass
+        try:
+            return True, json.loads(repair_json(self.text[start:end].strip())[0])
+        except ValueError:
+            return False, None
+
+    def _end_value(self, end: int, events: List[Tuple[str, str, Any]]) -> None:
+        if self._value_start is not None and self._key is not None:
+            ok, value = self._decode_value(self._value_start, end)
+            if ok:
+                events.append(("field", self._key, value))
+        self._value_start = None
+        self._key = None
+
+    def _end_item(self, end: int, events: List[Tuple[str, str, Any]]) -> None:
+        if self._item_start is not None and self._key is not None:
+            ok, value = self._decode_value(self._item_start, end)
+            if ok:
+                events.append(("item", self._key, value))
+        self._item_start = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, str, Any]]:
+        events: List[Tuple[str, str, Any]] = []
+        if self.done:
+            return events
+        self.text += chunk
+        text = self.text
+        i = self._pos
+        while i < len(text) and not self.done:
+            char = text[i]
+            depth = len(self._stack)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if depth == 1 and self._key_start is not None:
+                        self._key = self._decode(self._key_start, i + 1)
+                        self._key_start = None
+                i += 1
+                continue
+
+            if depth == 0:
+                if char == "{":
+                    self._stack.append("{")
+                    self._object_start = i
+                i += 1
+                continue
+
+            if char in _WHITESPACE:
+                i += 1
+                continue
+
+            if depth == 1:
+                if char == '"' and self._expect_key:
+                    self._key_start = i
+                    self._in_string = True
+                elif char == ":":
+                    self._expect_key = False
+                elif char == ",":
+                    self._end_value(i, events)
+                    self._expect_key = True
+                elif char == "}":
+                    self._end_value(i, events)
+                    self._stack.pop()
+                    self.done = True
+                else:
+                    if self._value_start is None:
+                        self._value_start = i
+                    if char in "{[":
+                        self._stack.append(char)
+                    elif char == '"':
+                        self._in_string = True
+                i += 1
+                continue
+
+            # Nested inside a top-level member
+            in_top_array = depth == 2 and self._stack[1] == "["
+            if in_top_array and self._item_start is None and char not in ",]":
+                self._item_start = i
+            if char in "{[":
+                self._stack.append(char)
+            elif char in "}]":
+                self._stack.pop()
+                if len(self._stack) == 2 and self._stack[1] == "[":
+                    # A composite array element just closed
+                    self._end_item(i + 1, events)
+                elif len(self._stack) == 1:
+                    if in_top_array:
+                        self._end_item(i, events)
+                    self._end_value(i + 1, events)
+            elif char == '"':
+                self._in_string = True
+            elif char == "," and in_top_array:
+                self._end_item(i, events)
+            i += 1
+
+        self._pos = i
+        return events
+
+    @property
+    def object_text(self) -> Optional[str]:
+        """Text of the complete top-level object, once it has been received."""
+        if not self.done or self._object_start is None:
+            return None
+        return self.text[self._object_start:self._pos]
@@ -1,111 +1,320 @@
-import httpx
+import asyncio
 import json
+import logging
+import time
+from typing import AsyncIterator, Optional, Set, Tuple
+import httpx
+from pydantic import ValidationError
 from app.config import get_settings
+from app.metrics import (
+    TOOL_NAME, llm_output_parses, llm_output_repairs, llm_request_duration, llm_tokens, llm_tokens_per_request
+)
+from app.schemas.fact_check import FactCheckResult
+from app.services import accounting
+from app.services.json_repair import loads_tolerant
+from app.services.locales import locales
+from app.services.http_client import get_http_client
+from app.services.model_router import model_router
+from app.services.prompt_builder import PromptPlan, build_prompt
+from app.services.rate_limit import llm_governor
+from app.services.resilience import UpstreamError, parse_retry_after
 
-SYSTEM_PROMPT = """You are an AI fact-checker and misinformation analyst. Your job is to analyze claims and provide credibility assessments.
+logger = logging.getLogger(__name__)
 
-For each claim, you must:
-1. Assess overall credibility (0-100 score)
-2. Break down key points and evaluate each
-3. Identify contradictions with known facts
-4. Analyze likely sources and spread patterns
+# Primary model from LLM_MODELS
+MODEL = model_router.primary
 
-Be objective and evidence-based. Acknowledge uncertainty when appropriate.
 
-IMPORTANT: Your analysis is advisory only. Always include the disclaimer that AI analysis should not be taken as definitive fact verification.
+def get_disclaimer(language: str) -> str:
+    return locales.get(language, "disclaimer")
 
-Respond in JSON format with this structure:
-{
-  "credibility_score": <0-100>,
-  "credibility_level": "high" | "medium" | "low",
-  "summary": "<brief assessment>",
-  "key_points": [
-    {
-      "point": "<extracted claim point>",
-      "assessment": "likely_true" | "uncertain" | "likely_false",
-      "explanation": "<why>"
+
+def _headers() -> dict:
+    return {
+        "Authorization": f"Bearer {get_settings().LLM_PROXY_KEY}",
+        "Content-Type": "application/json"
     }
-  ],
-  "contradictions": ["<contradiction with known facts>"],
-  "source_analysis": {
-    "likely_origin": "<type of source: news, social media, satire, etc>",
-    "spread_pattern": "<how this type of claim typically spreads>",
-    "red_flags": ["<warning signs if any>"]
-  }
-}"""
-
-LANGUAGE_INSTRUCTIONS = {
-    "en": "Respond in English.",
-    "zh": "用中文回复。",
-    "ja": "日本語で回答してください。",
-    "de": "Antworten Sie auf Deutsch.",
-    "fr": "Répondez en français.",
-    "ko": "한국어로 답변해 주세요.",
-    "es": "Responda en español."
-}
 
 
-async def analyze_claim(claim: str, language: str = "en") -> dict:
-    """Analyze a claim using LLM proxy."""
-    settings = get_settings()
+class AnalysisParseError(Exception):
+    """The model output could not be turned into a valid fact check result."""
+
+
+# Credibility level implied by the score, for when the model leaves it out
+_LEVELS = ((70, "high"), (40, "medium"), (0, "low"))
+
+
+def credibility_level(score: float) -> str:
+    return next(level for floor, level in _LEVELS if score >= floor)
+
+
+REPAIR_PROMPT = """Your previous answer could not be used ({error}).
+Reply with only the complete JSON object in the required structure: no prose, no markdown."""
+
+
+def _fill_defaults(data: dict) -> Set[str]:
+    """Supply missing optional fields and coerce common type slips in place."""
+    filled: Set[str] = set()
+    score = data.get("credibility_score")
+    if isinstance(score, str):
+        try:
+            data["credibility_score"] = score = float(score.strip().rstrip("%"))
+            filled.add("coerced")
+        except ValueError:
+            pass
+    # Out-of-range scores get no level; validation rejects them and the model is asked again
+    if not data.get("credibility_level") and isinstance(score, (int, float)) and 0 <= score <= 100:
+        data["credibility_level"] = credibility_level(score)
+        filled.add("defaults")
+    
+    points = data.get("key_points")
+    if not isinstance(points, list):
+        points = []
+    cleaned = [
+        {"assessment": "uncertain", "explanation": "", **point}
+        for point in points if isinstance(point, dict) and point.get("point")
+    ]
+    if cleaned != points or "key_points" not in data:
+        filled.add("defaults")
+    data["key_points"] = cleaned
     
-    lang_instruction = LANGUAGE_INSTRUCTIONS.get(language, LANGUAGE_INSTRUCTIONS["en"])
+    for key, container in (("contradictions", data), ("red_flags", data.get("source_analysis"))):
+        if isinstance(container, dict) and isinstance(container.get(key), str):
+            container[key] = [container[key]]
+            filled.add("coerced")
+    if not isinstance(data.get("contradictions"), list):
+        data["contradictions"] = []
+        filled.add("defaults")
     
-    user_prompt = f"""Analyze this claim for factual accuracy:
-
-"{claim}"
-
-{lang_instruction}
-
-Provide your analysis in the JSON format specified."""
-
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        response = await client.post(
-            f"{settings.LLM_PROXY_URL}/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {settings.LLM_PROXY_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "claude-sonnet-4-20250514",
-                "messages": [
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": user_prompt}
-                ],
-                "max_tokens": 2000,
-                "temperature": 0.3
-            }
-        )
+    source = data.get("source_analysis")
+    if not isinstance(source, dict):
+        source = {}
+    defaults = {"likely_origin": "unknown", "spread_pattern": "unknown", "red_flags": []}
+    if any(key not in source for key in defaults):
+        filled.add("defaults")
+    data["source_analysis"] = {**defaults, **source}
+    return filled
+
+
+def _parse(content: str, language: str) -> Tuple[dict, Set[str]]:
+    """Recover, complete and validate the analysis in `content`; returns it with the repairs applied."""
+    try:
+        data, repairs = loads_tolerant(content)
+    except ValueError as e:
+        raise AnalysisParseError("Failed to parse LLM response as JSON") from e
+    if not isinstance(data, dict):
+        raise AnalysisParseError("LLM response is not a JSON object")
+    
+    repairs |= _fill_defaults(data)
+    data["disclaimer"] = get_disclaimer(language)
+    try:
+        result = FactCheckResult(**data)
+    except ValidationError as e:
+        fields = ", ".join(".".join(str(part) for part in error["loc"]) for error in e.errors())
+        raise AnalysisParseError(f"LLM response is missing or has invalid fields: {fields}") from e
+    return result.model_dump(exclude_unset=True), repairs
+
+
+def parse_analysis(content: str, language: str) -> dict:
+    """Extract the JSON analysis from the model output and attach the disclaimer.
+    
+    Prose and markdown around the object are ignored, common JSON defects and
+    truncation are repaired and missing optional fields get defaults.
+    Raises AnalysisParseError if no valid result can be recovered.
+    """
+    return _parse(content, language)[0]
+
+
+def _cached_tokens(usage: dict) -> Optional[int]:
+    # OpenAI-style prompt_tokens_details, or Anthropic-style usage passed through by the proxy
+    details = usage.get("prompt_tokens_details") or {}
+    return details.get("cached_tokens", usage.get("cache_read_input_tokens"))
+
+
+def _record_usage(model: str, usage: Optional[dict]) -> None:
+    """Export the proxy's `usage` block (prompt/completion/cached token counts)."""
+    if not usage:
+        return
+    counts = {"prompt": usage.get("prompt_tokens"), "completion": usage.get("completion_tokens"),
+              "cached": _cached_tokens(usage)}
+    for kind, count in counts.items():
+        if count is not None:
+            llm_tokens.labels(tool=TOOL_NAME, model=model, kind=kind).inc(count)
+            llm_tokens_per_request.labels(tool=TOOL_NAME, model=model, kind=kind).observe(count)
+
+
+def _account(model: str, latency: float, usage: Optional[dict]) -> None:
+    """Add the call to the current request's ledger entry."""
+    usage = usage or {}
+    accounting.record_llm_call(
+        model, latency, usage.get("prompt_tokens"), usage.get("completion_tokens"), _cached_tokens(usage)
+    )
+
+
+def _usage_report(plan: PromptPlan, usage: Optional[dict]) -> dict:
+    """Token figures returned with a result: what was budgeted and what the proxy reported."""
+    usage = usage or {}
+    return {
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": usage.get("completion_tokens"),
+        "cached_prompt_tokens": _cached_tokens(usage),
+        "estimated_prompt_tokens": plan.estimated_prompt_tokens,
+        "max_tokens": plan.max_tokens
+    }
+
+
+def _upstream_error(status_code: int, body: str, headers: httpx.Headers) -> UpstreamError:
+    return UpstreamError(
+        f"LLM API error: {status_code} - {body}",
+        status_code,
+        retry_after=parse_retry_after(headers.get("retry-after"))
+    )
+
+
+async def _complete(payload: dict) -> dict:
+    """One chat completion call; retries, hedging and failover are applied by `model_router`."""
+    model = payload["model"]
+    client = get_http_client("llm")
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        response = await client.post("/v1/chat/completions", headers=_headers(), json=payload)
         
         if response.status_code != 200:
-            raise Exception(f"LLM API error: {response.status_code} - {response.text}")
+            raise _upstream_error(response.status_code, response.text, response.headers)
         
         data = response.json()
-        content = data["choices"][0]["message"]["content"]
-        
-        # Parse JSON from response
-        try:
-            # Handle potential markdown code blocks
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0]
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0]
-            
-            result = json.loads(content.strip())
-        except json.JSONDecodeError:
-            raise Exception("Failed to parse LLM response as JSON")
-        
-        # Add disclaimer based on language
-        disclaimers = {
-            "en": "This AI analysis is for reference only and does not constitute definitive fact verification. Please verify important claims through authoritative sources.",
-            "zh": "此 AI 分析仅供参考，不构成权威事实认定。重要信息请通过权威来源核实。",
-            "ja": "このAI分析は参考用であり、決定的な事実確認ではありません。重要な主張は信頼できる情報源で確認してください。",
-            "de": "Diese KI-Analyse dient nur als Referenz und stellt keine endgültige Faktenüberprüfung dar. Bitte überprüfen Sie wichtige Behauptungen anhand zuverlässiger Quellen.",
-            "fr": "Cette analyse IA est fournie à titre indicatif et ne constitue pas une vérification factuelle définitive. Veuillez vérifier les affirmations importantes auprès de sources fiables.",
-            "ko": "이 AI 분석은 참고용이며 확정적인 사실 확인이 아닙니다. 중요한 주장은 신뢰할 수 있는 출처를 통해 확인하세요.",
-            "es": "Este análisis de IA es solo de referencia y no constituye una verificación de hechos definitiva. Por favor, verifique las afirmaciones importantes a través de fuentes confiables."
-        }
+        outcome = "success"
+    except asyncio.CancelledError:
+        outcome = "cancelled"  # the losing call of a hedged pair
+        raise
+    finally:
+        llm_request_duration.labels(tool=TOOL_NAME, model=model, outcome=outcome).observe(time.perf_counter() - started)
+    return data
+
+
+async def analyze_claim(claim: str, language: str = "en") -> dict:
+    """Analyze a claim using LLM proxy.
+    
+    The call waits for a slot from `llm_governor`. The result includes the
+    `model` that produced it, its `llm_latency_ms` and the token `usage` of
+    the call.
+    """
+    plans = {}
+    
+    def attempt(model: str):
+        plan = plans[model] = build_prompt(claim, language, model)
+        return _complete(plan.payload)
+    
+    queued = time.perf_counter()
+    async with llm_governor.slot():
+        accounting.add_time("queue_wait", time.perf_counter() - queued)
+        data, model, latency = await model_router.call(claim, language, attempt)
+    
+    _record_usage(model, data.get("usage"))
+    _account(model, latency, data.get("usage"))
+    content = data["choices"][0]["message"]["content"]
+    result = await complete_analysis(claim, language, content)
+    result["model"] = model
+    result["llm_latency_ms"] = round(latency * 1000, 1)
+    result["usage"] = _usage_report(plans[model], data.get("usage"))
+    return result
+
+
+async def complete_analysis(claim: str, language: str, content: str) -> dict:
+    """Parse model output into a result, re-asking the model once if it cannot be repaired.
+    
+    The re-ask continues the original conversation with the broken answer and
+    the reason it was rejected, so the model only has to restate its analysis.
+    """
+    try:
+        with accounting.timed("parse"):
+            result, repairs = _parse(content, language)
+    except AnalysisParseError as e:
+        logger.warning("Unusable LLM output, re-asking: %s", e)
+        follow_up = [
+            {"role": "assistant", "content": content},
+            {"role": "user", "content": REPAIR_PROMPT.format(error=e)}
+        ]
         
-        result["disclaimer"] = disclaimers.get(language, disclaimers["en"])
+        def reask(model: str):
+            payload = build_prompt(claim, language, model, extra_messages=follow_up).payload
+            return _complete({**payload, "temperature": 0})
         
+        try:
+            queued = time.perf_counter()
+            async with llm_governor.slot():
+                accounting.add_time("queue_wait", time.perf_counter() - queued)
+                data, model, latency = await model_router.call(claim, language, reask)
+            _record_usage(model, data.get("usage"))
+            _account(model, latency, data.get("usage"))
+            with accounting.timed("parse"):
+                result, _ = _parse(data["choices"][0]["message"]["content"], language)
+        except AnalysisParseError:
+            llm_output_parses.labels(tool=TOOL_NAME, outcome="failed").inc()
+            raise
+        llm_output_parses.labels(tool=TOOL_NAME, outcome="reasked").inc()
         return result
+    
+    for kind in repairs:
+        llm_output_repairs.labels(tool=TOOL_NAME, kind=kind).inc()
+    llm_output_parses.labels(tool=TOOL_NAME, outcome="repaired" if repairs else "clean").inc()
+    return result
+
+
+async def _stream_once(payload: dict, usage: dict) -> AsyncIterator[str]:
+    """One streamed completion; the proxy's final usage block is copied into `usage`."""
+    model = payload["model"]
+    client = get_http_client("llm")
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        async with client.stream("POST", "/v1/chat/completions", headers=_headers(), json=payload) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                raise _upstream_error(response.status_code, body.decode(errors="replace"), response.headers)
+            
+            # OpenAI-compatible server-sent events: "data: {...}" lines, ending with "data: [DONE]"
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                # With include_usage the last chunk has no choices, only the usage block
+                if chunk.get("usage"):
+                    _record_usage(model, chunk["usage"])
+                    usage.update(chunk["usage"])
+                if not chunk.get("choices"):
+                    continue
+                delta = chunk["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+        outcome = "success"
+    finally:
+        llm_request_duration.labels(tool=TOOL_NAME, model=model, outcome=outcome).observe(time.perf_counter() - started)
+
+
+async def stream_claim_analysis(claim: str, language: str = "en", info: Optional[dict] = None) -> AsyncIterator[str]:
+    """Analyze a claim with `stream: true`, yielding model output text as it is generated.
+    
+    `info`, if given, receives the `model` used, `llm_latency_ms` and the token
+    `usage` when the stream ends.
+    """
+    plans = {}
+    usage = {}
+    
+    def open_stream(model: str) -> AsyncIterator[str]:
+        plan = plans[model] = build_prompt(claim, language, model)
+        return _stream_once({**plan.payload, "stream": True, "stream_options": {"include_usage": True}}, usage)
+    
+    route = {}
+    queued = time.perf_counter()
+    async with llm_governor.slot():
+        accounting.add_time("queue_wait", time.perf_counter() - queued)
+        async for delta in model_router.stream(claim, language, open_stream, route):
+            yield delta
+    _account(route["model"], route["llm_latency_ms"] / 1000, usage)
+    if info is not None:
+        info.update(route, usage=_usage_report(plans[route["model"]], usage))
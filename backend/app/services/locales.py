@@ -0,0 +1,42 @@
+import json
+import os
+from typing import Any, Dict, List
+from app.config import get_settings
+
+DEFAULT_LANGUAGE = "en"
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "locales")
+
+
+class LocaleTable:
+    """Per-language texts, read once from one `<language>.json` file per language.
+
+    Each file holds the language's `disclaimer` and `language_instruction`,
+    and `dense_script: true` for scripts that need more output tokens. A
+    language is added by dropping in its file; languages without one, and
+    keys a file leaves out, fall back to English. Language instructions are
+    part of the prompt: bump PROMPT_VERSION when changing one.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        for name in sorted(os.listdir(directory)):
+            language, extension = os.path.splitext(name)
+            if extension == ".json":
+                with open(os.path.join(directory, name), encoding="utf-8") as f:
+                    self._entries[language] = json.load(f)
+        if DEFAULT_LANGUAGE not in self._entries:
+            raise RuntimeError(f"No {DEFAULT_LANGUAGE}.json in locale directory {directory}")
+
+    @property
+    def languages(self) -> List[str]:
+        return list(self._entries)
+
+    def get(self, language: str, key: str) -> Any:
+        entry = self._entries.get(language)
+        if entry is not None and key in entry:
+            return entry[key]
+        return self._entries[DEFAULT_LANGUAGE].get(key)
+
+
+locales = LocaleTable(get_settings().LOCALES_DIR or LOCALES_DIR)
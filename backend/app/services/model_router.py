@@ -0,0 +1,163 @@
+import hashlib
+import json
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple, TypeVar
+from pydantic import BaseModel, Field
+from app.config import get_settings
+from app.metrics import TOOL_NAME, llm_model_error_rate, llm_model_latency, llm_model_selections, register_scrape_hook
+from app.services.resilience import CircuitBreaker, ResilientCaller, build_llm_caller, is_unavailable
+
+T = TypeVar("T")
+
+# Joins the names of several models that produced one result (e.g. merged sub-claims)
+MODEL_SEPARATOR = ","
+
+
+class ModelSpec(BaseModel):
+    name: str
+    cost: float = Field(default=1.0, ge=0)  # relative cost per request
+    expected_latency: float = Field(default=10.0, gt=0)  # seconds, until latencies are observed
+    max_claim_chars: Optional[int] = None  # only used for claims up to this length
+    languages: Optional[List[str]] = None  # only used for these languages
+
+
+class ModelRoute:
+    """One model with its own retry/circuit state and rolling outcome window."""
+
+    def __init__(self, spec: ModelSpec, caller: ResilientCaller, window: int = 50):
+        self.spec = spec
+        self.caller = caller
+        self._outcomes = deque(maxlen=window)
+
+    @property
+    def name(self) -> str:
+        return self.spec.name
+
+    def accepts(self, claim: str, language: str) -> bool:
+        if self.spec.max_claim_chars is not None and len(claim) > self.spec.max_claim_chars:
+            return False
+        return self.spec.languages is None or language in self.spec.languages
+
+    def latency(self) -> float:
+        if not len(self.caller.latencies):
+            return self.spec.expected_latency
+        return self.caller.latencies.quantile(0.5)
+
+    def error_rate(self) -> float:
+        return (len(self._outcomes) - sum(self._outcomes)) / len(self._outcomes) if self._outcomes else 0.0
+
+    def record(self, success: bool) -> None:
+        self._outcomes.append(success)
+
+
+class ModelRouter:
+    """Choose the LLM model for each claim and fail over between models.
+
+    Models that accept the claim (by length and language) are tried in order
+    of `cost + latency_weight * rolling median latency`. Models whose circuit
+    is open or whose recent error rate is above `max_error_rate` go last. A
+    call moves on to the next model only when the current one is unavailable
+    (429/5xx, timeouts, open circuit); other errors are returned as they are.
+    """
+
+    def __init__(self, routes: List[ModelRoute], latency_weight: float = 0.1, max_error_rate: float = 0.5):
+        if not routes:
+            raise ValueError("At least one model must be configured")
+        self.routes = routes
+        self.latency_weight = latency_weight
+        self.max_error_rate = max_error_rate
+
+    @property
+    def primary(self) -> str:
+        return self.routes[0].name
+
+    @property
+    def fingerprint(self) -> str:
+        """Short hash of the configured models and their routing rules; changes whenever LLM_MODELS does."""
+        specs = [route.spec.model_dump() for route in self.routes]
+        return hashlib.sha256(json.dumps(specs, sort_keys=True).encode()).hexdigest()[:16]
+
+    def plan(self, claim: str, language: str) -> List[ModelRoute]:
+        """Models to try for a claim, best first."""
+        eligible = [route for route in self.routes if route.accepts(claim, language)] or self.routes
+
+        def rank(route: ModelRoute) -> Tuple[bool, float]:
+            unhealthy = route.caller.breaker.state == CircuitBreaker.OPEN or route.error_rate() > self.max_error_rate
+            return unhealthy, route.spec.cost + self.latency_weight * route.latency()
+
+        return sorted(eligible, key=rank)
+
+    def _chosen(self, route: ModelRoute, rank: int) -> None:
+        route.record(True)
+        llm_model_selections.labels(tool=TOOL_NAME, model=route.name, choice="first" if rank == 0 else "fallback").inc()
+
+    async def call(self, claim: str, language: str, fn: Callable[[str], Awaitable[T]]) -> Tuple[T, str, float]:
+        """Run `fn(model)` on the best available model.
+
+        Returns the result, the model that produced it and its latency in seconds.
+        """
+        error: Optional[Exception] = None
+        for rank, route in enumerate(self.plan(claim, language)):
+            started = time.monotonic()
+            try:
+                result = await route.caller.call(lambda: fn(route.name))
+            except Exception as e:
+                if not is_unavailable(e):
+                    raise
+                route.record(False)
+                error = e
+                continue
+            self._chosen(route, rank)
+            return result, route.name, time.monotonic() - started
+        raise error
+
+    async def stream(
+        self, claim: str, language: str, fn: Callable[[str], AsyncIterator[T]], info: Optional[dict] = None
+    ) -> AsyncIterator[T]:
+        """Stream `fn(model)` from the best available model.
+
+        Falls over to the next model only before anything was yielded. `info`, if
+        given, receives the `model` used and `llm_latency_ms` once the stream ends.
+        """
+        error: Optional[Exception] = None
+        for rank, route in enumerate(self.plan(claim, language)):
+            started = time.monotonic()
+            streamed = False
+            try:
+                async for item in route.caller.stream(lambda: fn(route.name)):
+                    streamed = True
+                    yield item
+            except Exception as e:
+                if streamed or not is_unavailable(e):
+                    raise
+                route.record(False)
+                error = e
+                continue
+            self._chosen(route, rank)
+            if info is not None:
+                info.update(model=route.name, llm_latency_ms=round((time.monotonic() - started) * 1000, 1))
+            return
+        raise error
+
+
+def load_model_specs(raw: str) -> List[ModelSpec]:
+    return [ModelSpec(**entry) for entry in json.loads(raw)]
+
+
+def _build_router() -> ModelRouter:
+    settings = get_settings()
+    routes = [ModelRoute(spec, build_llm_caller(f"llm:{spec.name}")) for spec in load_model_specs(settings.LLM_MODELS)]
+    return ModelRouter(routes, settings.LLM_ROUTER_LATENCY_WEIGHT, settings.LLM_ROUTER_MAX_ERROR_RATE)
+
+
+model_router = _build_router()
+
+
+def _refresh_model_metrics() -> None:
+    for route in model_router.routes:
+        llm_model_latency.labels(tool=TOOL_NAME, model=route.name).set(route.latency())
+        llm_model_error_rate.labels(tool=TOOL_NAME, model=route.name).set(route.error_rate())
+
+
+register_scrape_hook(_refresh_model_metrics)
@@ -0,0 +1,176 @@
+import re
+from typing import List, Optional
+from app.config import get_settings
+from app.metrics import TOOL_NAME, claim_compaction_saved_chars, llm_max_tokens, llm_prompt_tokens_estimated
+from app.services.locales import locales
+
+# Bump whenever SYSTEM_PROMPT or the user prompt template changes so cached results are not reused
+PROMPT_VERSION = "2"
+
+SYSTEM_PROMPT = """You are an AI fact-checker and misinformation analyst. Your job is to analyze claims and provide credibility assessments.
+
+For each claim, you must:
+1. Assess overall credibility (0-100 score)
+2. Break down key points and evaluate each
+3. Identify contradictions with known facts
+4. Analyze likely sources and spread patterns
+
+Be objective and evidence-based. Acknowledge uncertainty when appropriate.
+
+IMPORTANT: Your analysis is advisory only. Always include the disclaimer that AI analysis should not be taken as definitive fact verification.
+
+Respond in JSON format with this structure:
+{
+  "credibility_score": <0-100>,
+  "credibility_level": "high" | "medium" | "low",
+  "summary": "<brief assessment>",
+  "key_points": [
+    {
+      "point": "<extracted claim point>",
+      "assessment": "likely_true" | "uncertain" | "likely_false",
+      "explanation": "<why>"
+    }
+  ],
+  "contradictions": ["<contradiction with known facts>"],
+  "source_analysis": {
+    "likely_origin": "<type of source: news, social media, satire, etc>",
+    "spread_pattern": "<how this type of claim typically spreads>",
+    "red_flags": ["<warning signs if any>"]
+  }
+}"""
+
+USER_PROMPT = """{language_instruction}
+
+Analyze this claim for factual accuracy:
+
+"{claim}"
+
+Provide your analysis in the JSON format specified."""
+
+_SENTENCE_END = re.compile(r"[.!?;。！？；]+(?:\s|$)")
+_URL = re.compile(r"https?://([^\s/?#]+)([^\s?#]*)\S*")
+_REPEATED_PUNCTUATION = re.compile(r"([!?.。！？])\1+")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+_SPACES = re.compile(r"[ \t\u00a0]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count without a tokenizer.
+
+    About four characters per token for alphabetic scripts; CJK and other wide
+    characters count one token each.
+    """
+    wide = sum(1 for ch in text if ord(ch) >= 0x2E80)
+    return wide + (len(text) - wide + 3) // 4
+
+
+def compact_claim(claim: str, max_chars: int) -> str:
+    """Shorten a long claim without changing what it asserts.
+
+    URLs lose their scheme, query string and fragment, repeated punctuation and
+    blank lines collapse, and verbatim repeated sentences are dropped. A claim
+    still longer than `max_chars` keeps its first two thirds and last third.
+    """
+    text = _URL.sub(lambda m: m.group(1) + m.group(2), claim)
+    text = _REPEATED_PUNCTUATION.sub(r"\1", text)
+    text = _SPACES.sub(" ", _BLANK_LINES.sub("\n", text)).strip()
+
+    seen = set()
+    sentences = []
+    for sentence in re.split(r"(?<=[.!?。！？])\s+|\n", text):
+        key = " ".join(sentence.casefold().split())
+        if key and key in seen:
+            continue
+        seen.add(key)
+        sentences.append(sentence)
+    text = " ".join(sentences)
+
+    if len(text) > max_chars:
+        head = max_chars * 2 // 3
+        text = f"{text[:head].rstrip()} […] {text[-(max_chars - head):].lstrip()}"
+    return text
+
+
+def output_budget(claim: str, language: str) -> int:
+    """`max_tokens` for a claim: more sentences mean more key points to assess."""
+    settings = get_settings()
+    sentences = max(1, len(_SENTENCE_END.findall(claim)))
+    budget = settings.LLM_MIN_OUTPUT_TOKENS + 120 * min(sentences, 8)
+    if locales.get(language, "dense_script"):  # answers take noticeably more tokens for the same content
+        budget = int(budget * 1.3)
+    return max(settings.LLM_MIN_OUTPUT_TOKENS, min(settings.LLM_MAX_OUTPUT_TOKENS, budget))
+
+
+def _system_message(cache_hint: bool) -> dict:
+    if not cache_hint:
+        return {"role": "system", "content": SYSTEM_PROMPT}
+    # Content-block form carries the cache_control hint; proxies forward it to providers with prompt caching
+    return {
+        "role": "system",
+        "content": [{"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}]
+    }
+
+
+# Built once so the static prefix of every request is byte-identical
+_SYSTEM_MESSAGES = {hint: _system_message(hint) for hint in (False, True)}
+_SYSTEM_TOKENS = estimate_tokens(SYSTEM_PROMPT)
+
+
+def prefix_cacheable() -> bool:
+    """Whether the system prompt is marked for prompt caching.
+
+    Providers only cache prefixes of a minimum length (1024 tokens for most
+    models); a hint on a shorter one is ignored, so none is sent.
+    """
+    settings = get_settings()
+    return settings.LLM_PROMPT_CACHE_HINTS and _SYSTEM_TOKENS >= settings.LLM_PROMPT_CACHE_MIN_TOKENS
+
+
+class PromptPlan:
+    """A chat completion payload together with the numbers that sized it."""
+
+    def __init__(self, payload: dict, estimated_prompt_tokens: int, compacted_chars: int):
+        self.payload = payload
+        self.estimated_prompt_tokens = estimated_prompt_tokens
+        self.compacted_chars = compacted_chars
+
+    @property
+    def max_tokens(self) -> int:
+        return self.payload["max_tokens"]
+
+
+def build_prompt(claim: str, language: str, model: str, extra_messages: Optional[List[dict]] = None) -> PromptPlan:
+    """Chat completion payload for analyzing a claim.
+
+    The system message comes first and never varies, so upstream prompt
+    caching can reuse it once it is long enough; everything claim- or
+    language-specific follows it.
+    """
+    settings = get_settings()
+    sent_claim = claim
+    if len(claim) > settings.LLM_CLAIM_COMPACT_CHARS:
+        sent_claim = compact_claim(claim, settings.LLM_CLAIM_MAX_CHARS)
+    user_prompt = USER_PROMPT.format(
+        language_instruction=locales.get(language, "language_instruction"),
+        claim=sent_claim
+    )
+    messages = [_SYSTEM_MESSAGES[prefix_cacheable()], {"role": "user", "content": user_prompt}]
+    messages += extra_messages or []
+
+    plan = PromptPlan(
+        {
+            "model": model,
+            "messages": messages,
+            "max_tokens": output_budget(sent_claim, language),
+            "temperature": 0.3
+        },
+        estimated_prompt_tokens=_SYSTEM_TOKENS + sum(
+            estimate_tokens(message["content"]) for message in messages[1:]
+        ),
+        compacted_chars=len(claim) - len(sent_claim)
+    )
+    llm_prompt_tokens_estimated.labels(tool=TOOL_NAME).observe(plan.estimated_prompt_tokens)
+    llm_max_tokens.labels(tool=TOOL_NAME).observe(plan.max_tokens)
+    if plan.compacted_chars > 0:
+        claim_compaction_saved_chars.labels(tool=TOOL_NAME).inc(plan.compacted_chars)
+    return plan
@@ -0,0 +1,277 @@
+import asyncio
+import contextvars
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional, Tuple
+from app.config import get_settings
+from app.metrics import (
+    TOOL_NAME, llm_governor_in_flight, llm_governor_queue_depth, llm_governor_rejections, llm_governor_wait,
+    rate_limit_rejections
+)
+from app.services.resilience import LLMBusyError
+from app.services.shared_state import SharedState, SharedStateError, shared_state
+
+logger = logging.getLogger(__name__)
+
+# Scheduling class of the current request's LLM calls: "paid" or "free"
+llm_priority: contextvars.ContextVar[str] = contextvars.ContextVar("llm_priority", default="free")
+# Device the current request's LLM calls are queued under, for round-robin within a class
+llm_queue_key: contextvars.ContextVar[str] = contextvars.ContextVar("llm_queue_key", default="anonymous")
+
+
+def priority_for(token_kind: str) -> str:
+    """Scheduling class for requests paid with `token_kind` ("paid_token" or "free_trial")."""
+    return "paid" if token_kind == "paid_token" else "free"
+
+
+def set_llm_priority(token_kind: str, device_id: str) -> None:
+    """Queue this request's LLM calls by how it was paid for."""
+    llm_priority.set(priority_for(token_kind))
+    llm_queue_key.set(device_id)
+
+
+class RateLimitExceeded(Exception):
+    """A caller used up its request budget."""
+
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__(f"Rate limit exceeded ({scope}), retry in {retry_after:.0f}s")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """Per-key request budgets: `burst` requests at once, regaining `rate` per second.
+
+    With process-local state these are exact token buckets, kept for the
+    `max_keys` most recently seen keys; a key that has not been seen for a
+    while starts again with a full bucket, so evicting the least recently
+    used keys never tightens a limit. With a shared backend every worker
+    counts into the same fixed windows of `burst / rate` seconds instead:
+    `wait` reads the window's counter, `hit` increments it. If the backend is unreachable
+    requests are let through.
+    """
+
+    def __init__(self, scope: str, rate: float, burst: float, max_keys: int, state: Optional[SharedState] = None):
+        self.scope = scope
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.state = state
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()  # key -> [tokens, updated_at]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _slot(self, key: str) -> Tuple[str, float, float]:
+        """Counter of the key's current window, the window length and the seconds left in it."""
+        window = self.burst / self.rate
+        now = time.time()
+        slot = int(now // window)
+        return f"ratelimit:{self.scope}:{key}:{slot}", window, (slot + 1) * window - now
+
+    async def wait(self, key: str) -> float:
+        """Like `hit`, but only looks: nothing is taken from the budget."""
+        if self.state is None or self.state.local:
+            return self._take(key, spend=False)
+        counter, _, left = self._slot(key)
+        try:
+            count = int(await self.state.get(counter) or 0)
+        except SharedStateError as e:
+            logger.warning("Rate limit check skipped: %s", e)
+            return 0.0
+        return 0.0 if count < self.burst else left
+
+    async def hit(self, key: str) -> float:
+        """Spend one request from the key's budget; returns 0 if allowed, else seconds until it would be."""
+        if self.state is None or self.state.local:
+            return self._take(key)
+        counter, window, left = self._slot(key)
+        try:
+            count = await self.state.incr(counter, ttl=window * 2)
+        except SharedStateError as e:
+            logger.warning("Rate limit check skipped: %s", e)
+            return 0.0
+        return 0.0 if count <= self.burst else left
+
+    def _take(self, key: str, spend: bool = True) -> float:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if not spend:
+                return 0.0
+            bucket = self._buckets[key] = [self.burst, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            if spend:
+                bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / self.rate
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+class ConcurrencyGovernor:
+    """Bound concurrent upstream calls and schedule the ones that have to wait.
+
+    Up to `max_concurrency` callers hold a slot at once. Callers beyond that
+    queue in their priority class; when a slot frees up the classes are
+    served in proportion to their `weights` (weighted fair queuing), and
+    within a class the devices waiting take turns, so one device's burst
+    cannot starve the others. A caller is turned away with LLMBusyError when
+    the queue is full or it waited longer than `queue_timeout`.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float, weights: Dict[str, float]):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.weights = weights
+        self.in_flight = 0
+        self._waiting = 0
+        # priority -> device -> waiters in arrival order; devices rotate on every grant
+        self._queues: Dict[str, "OrderedDict[str, Deque[asyncio.Future]]"] = {p: OrderedDict() for p in weights}
+        self._depth: Dict[str, int] = {p: 0 for p in weights}
+        self._served: Dict[str, float] = {p: 0.0 for p in weights}
+
+    def depth(self, priority: Optional[str] = None) -> int:
+        return self._waiting if priority is None else self._depth[priority]
+
+    def _set_gauges(self, priority: str) -> None:
+        llm_governor_queue_depth.labels(tool=TOOL_NAME, priority=priority).set(self._depth[priority])
+        llm_governor_in_flight.labels(tool=TOOL_NAME).set(self.in_flight)
+
+    def _enqueue(self, priority: str, key: str) -> asyncio.Future:
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[priority].setdefault(key, deque()).append(waiter)
+        self._depth[priority] += 1
+        self._waiting += 1
+        self._set_gauges(priority)
+        return waiter
+
+    def _dequeue(self, priority: str, key: str, waiter: asyncio.Future) -> None:
+        waiters = self._queues[priority].get(key)
+        if waiters is None or waiter not in waiters:
+            return
+        waiters.remove(waiter)
+        if not waiters:
+            del self._queues[priority][key]
+        self._depth[priority] -= 1
+        self._waiting -= 1
+        self._set_gauges(priority)
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        """Pop the waiter to serve next: least-served class by weight, then the next device in turn."""
+        candidates = [p for p in self._queues if self._depth[p]]
+        if not candidates:
+            # Nobody waiting: start the next busy period with a clean slate
+            self._served = dict.fromkeys(self._served, 0.0)
+            return None
+        priority = min(candidates, key=lambda p: ((self._served[p] + 1) / self.weights[p], -self.weights[p]))
+        devices = self._queues[priority]
+        key, waiters = next(iter(devices.items()))
+        waiter = waiters.popleft()
+        if waiters:
+            devices.move_to_end(key)
+        else:
+            del devices[key]
+        self._depth[priority] -= 1
+        self._waiting -= 1
+        self._served[priority] += 1
+        self._set_gauges(priority)
+        return waiter
+
+    async def acquire(self, priority: str = "free", key: str = "anonymous") -> None:
+        if self.in_flight < self.max_concurrency and not self._waiting:
+            self.in_flight += 1
+            self._set_gauges(priority)
+            llm_governor_wait.labels(tool=TOOL_NAME, priority=priority).observe(0)
+            return
+        if self._waiting >= self.max_queue:
+            llm_governor_rejections.labels(tool=TOOL_NAME, priority=priority, reason="queue_full").inc()
+            raise LLMBusyError(self.queue_timeout)
+
+        started = time.monotonic()
+        waiter = self._enqueue(priority, key)
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._dequeue(priority, key, waiter)
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # granted a slot just as the caller went away
+            waiter.cancel()
+            raise
+        if not waiter.done():
+            self._dequeue(priority, key, waiter)
+            waiter.cancel()
+            llm_governor_rejections.labels(tool=TOOL_NAME, priority=priority, reason="timeout").inc()
+            raise LLMBusyError(self.queue_timeout)
+        llm_governor_wait.labels(tool=TOOL_NAME, priority=priority).observe(time.monotonic() - started)
+
+    def release(self) -> None:
+        # The slot passes straight to the next waiter, so in_flight only drops when nobody waits
+        while True:
+            waiter = self._next_waiter()
+            if waiter is None:
+                self.in_flight -= 1
+                llm_governor_in_flight.labels(tool=TOOL_NAME).set(self.in_flight)
+                return
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[str] = None, key: Optional[str] = None):
+        """Hold a slot for the duration of the block; priority and key default to the request's."""
+        await self.acquire(priority or llm_priority.get(), key or llm_queue_key.get())
+        try:
+            yield
+        finally:
+            self.release()
+
+
+_settings = get_settings()
+
+device_limiter = RateLimiter(
+    "device", _settings.RATE_LIMIT_DEVICE_RATE, _settings.RATE_LIMIT_DEVICE_BURST, _settings.RATE_LIMIT_MAX_KEYS,
+    shared_state
+)
+ip_limiter = RateLimiter(
+    "ip", _settings.RATE_LIMIT_IP_RATE, _settings.RATE_LIMIT_IP_BURST, _settings.RATE_LIMIT_MAX_KEYS, shared_state
+)
+
+# The governor bounds this process's own upstream calls: LLM_MAX_CONCURRENCY is per worker
+llm_governor = ConcurrencyGovernor(
+    max_concurrency=_settings.LLM_MAX_CONCURRENCY,
+    max_queue=_settings.LLM_QUEUE_MAX,
+    queue_timeout=_settings.LLM_QUEUE_TIMEOUT,
+    weights={"paid": _settings.LLM_PAID_WEIGHT, "free": 1.0}
+)
+
+
+async def check_rate_limit(device_id: Optional[str], client_ip: Optional[str]) -> None:
+    """Charge a request to its device's and client IP's buckets, or raise RateLimitExceeded.
+
+    Callers without an X-Device-Id are limited by IP only; they all share the
+    "anonymous" device, which must not become one bucket for everybody.
+
+    Every bucket is checked before any is charged, so a request refused by
+    one bucket does not use up the other's budget.
+    """
+    if not get_settings().RATE_LIMIT_ENABLED:
+        return
+    buckets = [(limiter, key) for limiter, key in ((device_limiter, device_id), (ip_limiter, client_ip)) if key]
+    # Look first, then charge; a concurrent request can still take the last slot in between
+    for check in (RateLimiter.wait, RateLimiter.hit):
+        for limiter, key in buckets:
+            retry_after = await check(limiter, key)
+            if retry_after:
+                rate_limit_rejections.labels(tool=TOOL_NAME, scope=limiter.scope).inc()
+                raise RateLimitExceeded(limiter.scope, retry_after)
@@ -0,0 +1,296 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+import httpx
+from app.config import get_settings
+from app.metrics import (
+    TOOL_NAME, circuit_rejections, circuit_state, circuit_transitions, upstream_hedge_delay, upstream_hedges,
+    upstream_retries
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class UpstreamError(Exception):
+    """Non-success HTTP response from an upstream API."""
+
+    def __init__(self, message: str, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the upstream while its circuit breaker is open."""
+
+    def __init__(self, upstream: str, retry_in: float):
+        super().__init__(f"{upstream} upstream unavailable, retry in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class LLMBusyError(Exception):
+    """Raised when no LLM call slot freed up in time (see `rate_limit.ConcurrencyGovernor`)."""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"LLM capacity exhausted, retry in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_reason(error: Exception) -> Optional[str]:
+    """Metric label for a retryable error, or None if retrying would not help."""
+    if isinstance(error, UpstreamError):
+        return str(error.status_code) if error.status_code in RETRYABLE_STATUS else None
+    if isinstance(error, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(error, httpx.TransportError):
+        return "transport"
+    return None
+
+
+def is_unavailable(error: Exception) -> bool:
+    """True when the upstream itself failed (as opposed to e.g. an unparseable answer)."""
+    return isinstance(error, (CircuitOpenError, LLMBusyError)) or retry_reason(error) is not None
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After `failure_threshold` failures in a row the circuit opens and calls fail
+    fast. Once `reset_timeout` has passed a single trial call is let through
+    (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    _GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, upstream: str, failure_threshold: int, reset_timeout: float):
+        self.upstream = upstream
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_started: Optional[float] = None
+        circuit_state.labels(tool=TOOL_NAME, upstream=upstream).set(0)
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            logger.warning("Circuit for %s upstream is now %s", self.upstream, state)
+            self.state = state
+            circuit_transitions.labels(tool=TOOL_NAME, upstream=self.upstream, state=state).inc()
+            circuit_state.labels(tool=TOOL_NAME, upstream=self.upstream).set(self._GAUGE[state])
+
+    def retry_in(self) -> float:
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def check(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now."""
+        if self.state == self.OPEN and self.retry_in() == 0:
+            self._set_state(self.HALF_OPEN)
+        if self.state == self.CLOSED:
+            return
+        # One trial call at a time; a trial that never reported back (cancelled) expires
+        now = time.monotonic()
+        if self.state == self.HALF_OPEN and (
+            self._trial_started is None or now - self._trial_started > self.reset_timeout
+        ):
+            self._trial_started = now
+            return
+        circuit_rejections.labels(tool=TOOL_NAME, upstream=self.upstream).inc()
+        raise CircuitOpenError(self.upstream, self.retry_in() or self.reset_timeout)
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._trial_started = None
+        self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_started = None
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+
+class LatencyWindow:
+    """Latencies of the most recent successful calls."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> float:
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ResilientCaller:
+    """Retries, hedging and a circuit breaker around calls to one upstream.
+
+    `call(fn)` runs the coroutine factory `fn`, retrying 429/5xx responses and
+    transport errors with full-jitter exponential backoff (never sooner than a
+    Retry-After the upstream sent, up to `max_delay`). With hedging enabled, a
+    second identical call is sent once the first has taken longer than the
+    `hedge_quantile` of recent latencies, and the first success wins.
+    """
+
+    def __init__(
+        self,
+        upstream: str,
+        breaker: CircuitBreaker,
+        attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_delay: float = 2.0,
+        hedge_min_samples: int = 20
+    ):
+        self.upstream = upstream
+        self.breaker = breaker
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.latencies = LatencyWindow()
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self.latencies) < self.hedge_min_samples:
+            return None
+        delay = max(self.hedge_min_delay, self.latencies.quantile(self.hedge_quantile))
+        upstream_hedge_delay.labels(tool=TOOL_NAME, upstream=self.upstream).set(delay)
+        return delay
+
+    async def _timed(self, fn: Callable[[], Awaitable[T]]) -> T:
+        started = time.monotonic()
+        result = await fn()
+        self.latencies.add(time.monotonic() - started)
+        return result
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]]) -> T:
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._timed(fn)
+
+        primary = asyncio.ensure_future(self._timed(fn))
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        if done:
+            return primary.result()
+
+        upstream_hedges.labels(tool=TOOL_NAME, upstream=self.upstream, outcome="fired").inc()
+        hedge = asyncio.ensure_future(self._timed(fn))
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        outcome = "primary_won" if task is primary else "hedge_won"
+                        upstream_hedges.labels(tool=TOOL_NAME, upstream=self.upstream, outcome=outcome).inc()
+                        return task.result()
+                    error = error or task.exception()
+            upstream_hedges.labels(tool=TOOL_NAME, upstream=self.upstream, outcome="both_failed").inc()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        for attempt in range(self.attempts):
+            self.breaker.check()
+            try:
+                result = await self._hedged(fn)
+            except Exception as e:
+                reason = retry_reason(e)
+                if reason is None:
+                    # The upstream answered; the request itself was bad
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt + 1 == self.attempts:
+                    raise
+                upstream_retries.labels(tool=TOOL_NAME, upstream=self.upstream, reason=reason).inc()
+                await asyncio.sleep(self.backoff(attempt, getattr(e, "retry_after", None)))
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def stream(self, fn: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """Like `call` for a streamed response: retried only until the first item arrives, never hedged."""
+        for attempt in range(self.attempts):
+            self.breaker.check()
+            started = False
+            try:
+                async for item in fn():
+                    started = True
+                    yield item
+            except Exception as e:
+                reason = retry_reason(e)
+                if reason is None:
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if started or attempt + 1 == self.attempts:
+                    raise
+                upstream_retries.labels(tool=TOOL_NAME, upstream=self.upstream, reason=reason).inc()
+                await asyncio.sleep(self.backoff(attempt, getattr(e, "retry_after", None)))
+                continue
+            self.breaker.record_success()
+            return
+
+
+def build_llm_caller(upstream: str = "llm") -> ResilientCaller:
+    """ResilientCaller configured from the LLM_* settings."""
+    settings = get_settings()
+    return ResilientCaller(
+        upstream,
+        CircuitBreaker(upstream, settings.LLM_CIRCUIT_FAILURE_THRESHOLD, settings.LLM_CIRCUIT_RESET_TIMEOUT),
+        attempts=settings.LLM_RETRY_ATTEMPTS,
+        base_delay=settings.LLM_RETRY_BASE_DELAY,
+        max_delay=settings.LLM_RETRY_MAX_DELAY,
+        hedge=settings.LLM_HEDGE_ENABLED,
+        hedge_quantile=settings.LLM_HEDGE_QUANTILE,
+        hedge_min_delay=settings.LLM_HEDGE_MIN_DELAY,
+        hedge_min_samples=settings.LLM_HEDGE_MIN_SAMPLES
+    )
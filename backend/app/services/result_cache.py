@@ -0,0 +1,190 @@
+import hashlib
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+import orjson
+from sqlalchemy import delete, select
+from app.config import get_settings
+from app.database import get_db_session
+from app.metrics import (
+    TOOL_NAME, result_cache_hits, result_cache_misses, result_cache_evictions,
+    result_cache_size, register_scrape_hook
+)
+from app.models.cache import CachedResult
+from app.services.model_router import model_router
+from app.services.prompt_builder import PROMPT_VERSION
+from app.services.write_behind import write_behind
+
+
+def normalize_claim(claim: str) -> str:
+    """Canonical form of a claim used for cache keys (unicode, case and whitespace folded)."""
+    return " ".join(unicodedata.normalize("NFKC", claim).casefold().split())
+
+
+def make_cache_key(
+    claim: str, language: str, models: str = model_router.fingerprint, prompt_version: str = PROMPT_VERSION
+) -> str:
+    """Content address of a fact check: normalized claim + language + model configuration + prompt version.
+
+    Any configured model may serve a claim, so the key covers the whole
+    LLM_MODELS configuration rather than the primary model alone.
+    """
+    material = "\x1f".join([normalize_claim(claim), language, models, prompt_version])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ResultCache:
+    """Two-tier cache of fact check results.
+
+    The first tier is an in-process LRU bounded by entry count and by the size of
+    the serialized results. The optional second tier is the `result_cache` table,
+    which survives restarts and is shared by every process using the database.
+    Rows are written through `write_behind`, so other processes see a new
+    result up to WRITE_BEHIND_MAX_DELAY later.
+
+    Expired entries are kept for another `stale_ttl` seconds. `get` ignores
+    them, but `get_stale` still returns them for use when the LLM is down.
+    """
+
+    def __init__(self, ttl: int, max_entries: int, max_bytes: int, persistent: bool = True, stale_ttl: int = 0):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.persistent = persistent
+        # key -> (expires_at epoch seconds, JSON payload, payload size in bytes)
+        self._entries: "OrderedDict[str, Tuple[float, str, int]]" = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str, reason: Optional[str] = None) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+        if reason:
+            result_cache_evictions.labels(tool=TOOL_NAME, reason=reason).inc()
+
+    def _store(self, key: str, payload: str, expires_at: float) -> None:
+        if key in self._entries:
+            self._remove(key)
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (expires_at, payload, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)), reason="lru")
+
+    def _get_memory(self, key: str, stale: bool = False) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, payload, _ = entry
+        now = time.time()
+        if expires_at + self.stale_ttl <= now:
+            self._remove(key, reason="expired")
+            return None
+        if expires_at <= now and not stale:
+            return None
+        self._entries.move_to_end(key)
+        return orjson.loads(payload)
+
+    async def _get_persistent(self, key: str, stale: bool = False) -> Optional[dict]:
+        async with get_db_session() as session:
+            row = await session.get(CachedResult, key)
+            if row is None:
+                return None
+            now = _utcnow()
+            if row.expires_at + timedelta(seconds=self.stale_ttl) <= now:
+                await session.delete(row)
+                await session.commit()
+                result_cache_evictions.labels(tool=TOOL_NAME, reason="expired").inc()
+                return None
+            if row.expires_at <= now and not stale:
+                return None
+            expires_at = row.expires_at.replace(tzinfo=timezone.utc).timestamp()
+            self._store(key, row.result, expires_at)
+            return orjson.loads(row.result)
+
+    async def get(self, key: str) -> Optional[dict]:
+        result = self._get_memory(key)
+        if result is not None:
+            result_cache_hits.labels(tool=TOOL_NAME, tier="memory").inc()
+            return result
+        if self.persistent:
+            result = await self._get_persistent(key)
+            if result is not None:
+                result_cache_hits.labels(tool=TOOL_NAME, tier="persistent").inc()
+                return result
+        result_cache_misses.labels(tool=TOOL_NAME).inc()
+        return None
+
+    async def get_stale(self, key: str) -> Optional[dict]:
+        """Cached result even if it has expired, as long as it is within `stale_ttl`."""
+        result = self._get_memory(key, stale=True)
+        if result is None and self.persistent:
+            result = await self._get_persistent(key, stale=True)
+        return result
+
+    async def set(self, key: str, result: dict, language: str) -> None:
+        payload = orjson.dumps(result).decode()
+        expires_at = time.time() + self.ttl
+        self._store(key, payload, expires_at)
+        if self.persistent:
+            await write_behind.upsert(
+                CachedResult,
+                {"cache_key": key, "language": language, "result": payload,
+                 "expires_at": _utcnow() + timedelta(seconds=self.ttl)},
+                key=("cache_key",),
+                update=("language", "result", "expires_at")
+            )
+
+    async def warm(self, limit: int) -> int:
+        """Load up to `limit` of the most recently stored live results into memory, e.g. at startup."""
+        if not self.persistent or limit <= 0:
+            return 0
+        async with get_db_session() as session:
+            rows = (await session.execute(
+                select(CachedResult.cache_key, CachedResult.result, CachedResult.expires_at)
+                .where(CachedResult.expires_at > _utcnow())
+                .order_by(CachedResult.expires_at.desc())
+                .limit(min(limit, self.max_entries))
+            )).all()
+        # Oldest first, so the newest results end up most recently used
+        for key, payload, expires_at in reversed(rows):
+            self._store(key, payload, expires_at.replace(tzinfo=timezone.utc).timestamp())
+        return len(rows)
+
+    async def purge_expired(self) -> int:
+        """Drop rows past their stale window from the persistent tier."""
+        if not self.persistent:
+            return 0
+        cutoff = _utcnow() - timedelta(seconds=self.stale_ttl)
+        async with get_db_session() as session:
+            result = await session.execute(delete(CachedResult).where(CachedResult.expires_at <= cutoff))
+            await session.commit()
+            return result.rowcount
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+
+_settings = get_settings()
+
+result_cache = ResultCache(
+    ttl=_settings.RESULT_CACHE_TTL,
+    max_entries=_settings.RESULT_CACHE_MAX_ENTRIES,
+    max_bytes=_settings.RESULT_CACHE_MAX_BYTES,
+    persistent=_settings.RESULT_CACHE_PERSISTENT,
+    stale_ttl=_settings.RESULT_CACHE_STALE_TTL
+)
+
+register_scrape_hook(lambda: result_cache_size.labels(tool=TOOL_NAME).set(len(result_cache)))
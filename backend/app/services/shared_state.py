@@ -0,0 +1,291 @@
+import asyncio
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+from app.config import get_settings
+from app.metrics import TOOL_NAME, shared_state_errors
+
+
+# Deletes KEYS[1] only while it still holds ARGV[1], in one step on the server
+COMPARE_AND_DELETE = (
+    'if redis.call("GET", KEYS[1]) == ARGV[1] then return redis.call("DEL", KEYS[1]) else return 0 end'
+)
+
+
+class SharedStateError(Exception):
+    """The shared state backend could not be reached or rejected a command."""
+
+
+class SharedState(ABC):
+    """Counters, cached values and locks shared by every worker using the same backend.
+
+    Values are strings. `ttl` is in seconds; keys without one never expire.
+    `local` is True when the state only lives in this process, so callers can
+    fall back to exact in-process algorithms.
+    """
+
+    local = False
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: Optional[float] = None, only_if_absent: bool = False) -> bool:
+        """Store `value`; with `only_if_absent`, only when the key does not exist. Returns whether it was stored."""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def delete_if_equals(self, key: str, value: str) -> bool:
+        """Delete the key only if it holds `value`, atomically. Returns whether it was deleted."""
+
+    @abstractmethod
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Add `amount` to a counter and return the new value; `ttl` applies when the counter is created."""
+
+    async def close(self) -> None:
+        pass
+
+    @asynccontextmanager
+    async def lock(self, name: str, ttl: float, wait: float = 0.0) -> AsyncIterator[bool]:
+        """Hold the named lock for the block; yields False if it could not be taken within `wait` seconds.
+
+        The lock expires after `ttl` seconds in case its holder dies, so `ttl`
+        must cover the work done while holding it. Release only deletes the
+        lock if it still carries this holder's token, so a holder that outlived
+        its lock never frees one taken by someone else since.
+        """
+        key = f"lock:{name}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + wait
+        while not await self.set(key, token, ttl=ttl, only_if_absent=True):
+            if time.monotonic() >= deadline:
+                yield False
+                return
+            await asyncio.sleep(min(0.05, wait))
+        try:
+            yield True
+        finally:
+            await self.delete_if_equals(key, token)
+
+
+class MemoryState(SharedState):
+    """Shared state for a single process."""
+
+    local = True
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[str, Optional[float]]] = {}  # key -> (value, expires_at)
+
+    def _live(self, key: str) -> Optional[Tuple[str, Optional[float]]]:
+        entry = self._values.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._values[key]
+            return None
+        return entry
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._live(key)
+        return entry[0] if entry is not None else None
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None, only_if_absent: bool = False) -> bool:
+        if only_if_absent and self._live(key) is not None:
+            return False
+        self._values[key] = (value, time.monotonic() + ttl if ttl is not None else None)
+        return True
+
+    async def delete(self, key: str) -> None:
+        self._values.pop(key, None)
+
+    async def delete_if_equals(self, key: str, value: str) -> bool:
+        entry = self._live(key)
+        if entry is None or entry[0] != value:
+            return False
+        del self._values[key]
+        return True
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        entry = self._live(key)
+        if entry is None:
+            entry = ("0", time.monotonic() + ttl if ttl is not None else None)
+        value = int(entry[0]) + amount
+        self._values[key] = (str(value), entry[1])
+        return value
+
+    def clear(self) -> None:
+        self._values.clear()
+
+
+class _RespConnection:
+    """One connection speaking RESP2, the Redis serialization protocol."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @staticmethod
+    def _encode(command: Tuple) -> bytes:
+        parts = [b"*%d\r\n" % len(command)]
+        for arg in command:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    async def _read(self):
+        line = await self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by shared state backend")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            return SharedStateError(body.decode())
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = await self.reader.readexactly(length + 2)
+            return data[:-2].decode()
+        if kind == b"*":
+            length = int(body)
+            return None if length < 0 else [await self._read() for _ in range(length)]
+        raise ConnectionError(f"Unexpected reply from shared state backend: {line!r}")
+
+    async def execute(self, *commands: Tuple) -> List:
+        """Send the commands in one write (pipelined) and return their replies in order.
+
+        Every reply is read, even after an error reply, so the connection stays
+        in sync; the first error reply is raised afterwards.
+        """
+        self.writer.write(b"".join(self._encode(command) for command in commands))
+        await self.writer.drain()
+        replies = [await self._read() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, SharedStateError):
+                raise reply
+        return replies
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class RespState(SharedState):
+    """Shared state on a Redis-protocol key-value server (Redis, Valkey, KeyDB, ...).
+
+    URL format: ``redis://[[user]:password@]host[:port][/db]``. Up to
+    `pool_size` connections are kept open per event loop; every command
+    round trip is bounded by `timeout` seconds.
+    """
+
+    def __init__(self, url: str, pool_size: int = 10, timeout: float = 0.5):
+        parsed = urlparse(url)
+        if parsed.scheme != "redis":
+            raise ValueError(f"Unsupported shared state URL: {url}")
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._idle: List[_RespConnection] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def _open(self) -> _RespConnection:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        connection = _RespConnection(reader, writer)
+        setup = []
+        if self.password is not None:
+            setup.append(("AUTH", self.username, self.password) if self.username else ("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            try:
+                await connection.execute(*setup)
+            except BaseException:
+                connection.close()
+                raise
+        return connection
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Connections belong to the loop that opened them (tests run one loop per test)
+            self._loop = loop
+            self._idle = []
+            self._slots = asyncio.Semaphore(self.pool_size)
+
+    async def execute(self, *commands: Tuple) -> List:
+        self._bind_loop()
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else None
+            try:
+                if connection is None:
+                    connection = await asyncio.wait_for(self._open(), self.timeout)
+                replies = await asyncio.wait_for(connection.execute(*commands), self.timeout)
+            except SharedStateError:
+                # An error reply; the connection itself is fine
+                shared_state_errors.labels(tool=TOOL_NAME, kind="reply").inc()
+                self._idle.append(connection)
+                raise
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                shared_state_errors.labels(tool=TOOL_NAME, kind="connection").inc()
+                if connection is not None:
+                    connection.close()
+                raise SharedStateError(f"Shared state backend unavailable: {e!r}") from e
+            except BaseException:
+                # Cancelled mid-command: the connection may have unread replies
+                if connection is not None:
+                    connection.close()
+                raise
+            self._idle.append(connection)
+            return replies
+
+    async def get(self, key: str) -> Optional[str]:
+        return (await self.execute(("GET", key)))[0]
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None, only_if_absent: bool = False) -> bool:
+        command = ["SET", key, value]
+        if ttl is not None:
+            command += ["PX", max(1, int(ttl * 1000))]
+        if only_if_absent:
+            command.append("NX")
+        return (await self.execute(tuple(command)))[0] == "OK"
+
+    async def delete(self, key: str) -> None:
+        await self.execute(("DEL", key))
+
+    async def delete_if_equals(self, key: str, value: str) -> bool:
+        return (await self.execute(("EVAL", COMPARE_AND_DELETE, 1, key, value)))[0] == 1
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        if ttl is None:
+            return (await self.execute(("INCRBY", key, amount)))[0]
+        # Create the counter with its expiry first, so a counter never exists without one
+        replies = await self.execute(("SET", key, 0, "PX", max(1, int(ttl * 1000)), "NX"), ("INCRBY", key, amount))
+        return replies[1]
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+def create_shared_state(url: str) -> SharedState:
+    """Backend for SHARED_STATE_URL: ``memory://`` or ``redis://...``."""
+    if not url or url.startswith("memory:"):
+        return MemoryState()
+    settings = get_settings()
+    return RespState(url, pool_size=settings.SHARED_STATE_POOL_SIZE, timeout=settings.SHARED_STATE_TIMEOUT)
+
+
+shared_state = create_shared_state(get_settings().SHARED_STATE_URL)
@@ -0,0 +1,47 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from app.metrics import TOOL_NAME, single_flight_followers
+
+
+class _Call:
+    __slots__ = ("task", "followers")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.followers = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into a single execution.
+
+    The first caller for a key (the leader) starts the work in its own task;
+    callers arriving while it runs (followers) wait on that same task and get
+    its result or its exception. Cancelling any one caller never cancels the
+    shared work for the others.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def _finish(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        single_flight_followers.labels(tool=TOOL_NAME, flight=self.name).observe(call.followers)
+        if not call.task.cancelled():
+            call.task.exception()  # mark retrieved even if every caller went away
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run `fn` once per key at a time. Returns (result, shared)."""
+        call = self._calls.get(key)
+        if call is not None:
+            call.followers += 1
+            return await asyncio.shield(call.task), True
+
+        call = _Call(asyncio.ensure_future(fn()))
+        self._calls[key] = call
+        call.task.add_done_callback(lambda _: self._finish(key, call))
+        return await asyncio.shield(call.task), False
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Tuple
+from app.config import get_settings
+from app.database import init_db, ping_db, warm_pool
+from app.metrics import TOOL_NAME, app_ready, startup_phase_duration
+from app.services.claim_index import claim_index
+from app.services.http_client import http_clients
+from app.services.model_router import model_router
+from app.services.resilience import CircuitBreaker
+from app.services.result_cache import result_cache
+
+logger = logging.getLogger(__name__)
+
+
+class Startup:
+    """What this process has done since it started, and whether it should get traffic.
+
+    `prepare` runs inside the lifespan before the app accepts connections:
+    schema creation and opening the database pool, without which nothing
+    works. `warm_up` then runs in the background while /livez already
+    answers: it loads the claim index and the most recent results into
+    memory and opens a connection to the LLM proxy, so the first requests
+    after a deploy are not the ones paying for it. /readyz reports ready
+    once warmup is over and the database answers.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.phases: Dict[str, float] = {}  # phase -> seconds
+        self.warm = False
+        self.errors: Dict[str, str] = {}
+
+    def _record(self, phase: str, started: float) -> None:
+        self.phases[phase] = round(time.monotonic() - started, 3)
+        startup_phase_duration.labels(tool=TOOL_NAME, phase=phase).set(self.phases[phase])
+
+    async def prepare(self) -> None:
+        settings = get_settings()
+        started = time.monotonic()
+        if settings.DB_INIT_ON_STARTUP:
+            await init_db()
+        await warm_pool(settings.DB_WARM_CONNECTIONS)
+        self._record("database", started)
+
+    async def _phase(self, phase: str, coro) -> None:
+        started = time.monotonic()
+        try:
+            await coro
+        except Exception as e:
+            # Warmup only saves later requests some work; serve traffic without it
+            logger.exception("Startup phase %s failed", phase)
+            self.errors[phase] = repr(e)
+        self._record(phase, started)
+
+    async def warm_up(self) -> None:
+        settings = get_settings()
+
+        async def load_caches():
+            await self._phase("claim_index", claim_index.load())
+            await self._phase("result_cache", result_cache.warm(settings.RESULT_CACHE_WARM_ENTRIES))
+
+        await asyncio.gather(
+            load_caches(),
+            self._phase("llm_connection", http_clients.warm("llm", settings.HTTP_CONNECT_TIMEOUT))
+        )
+        self.warm = True
+        self.phases["ready"] = round(time.monotonic() - self.started, 3)
+        startup_phase_duration.labels(tool=TOOL_NAME, phase="ready").set(self.phases["ready"])
+        app_ready.labels(tool=TOOL_NAME).set(1)
+        logger.info("Ready %.2fs after start: %s", self.phases["ready"], self.phases)
+
+    async def readiness(self) -> Tuple[bool, dict]:
+        """Whether to route traffic here, with the state of each check.
+
+        The LLM proxy is reported but does not make the process unready:
+        cached and stale results are still served while it is down, and every
+        worker would be pulled from the load balancer at once.
+        """
+        checks: Dict[str, str] = {"warmup": "done" if self.warm else "running"}
+        try:
+            await ping_db(get_settings().READINESS_DB_TIMEOUT)
+            checks["database"] = "ok"
+        except Exception as e:
+            checks["database"] = f"unavailable: {e!r}"
+        open_circuits = sum(route.caller.breaker.state == CircuitBreaker.OPEN for route in model_router.routes)
+        checks["llm"] = "unavailable" if open_circuits == len(model_router.routes) else "ok"
+        ready = self.warm and checks["database"] == "ok"
+        body = {"status": "ready" if ready else "not_ready", "checks": checks, "startup": self.phases}
+        if self.errors:
+            body["warmup_errors"] = self.errors
+        return ready, body
+
+
+startup = Startup()
@@ -1,63 +1,227 @@
-from typing import Tuple
-from sqlalchemy import select
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+from sqlalchemy import case, exists, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_db_session
-from app.models.token import DeviceUsage, GenerationToken
+from app.database import dialect_insert, get_db_session, get_write_session
+from app.models.token import DeviceUsage, GenerationToken, PaymentTransaction
+from app.services.balance_cache import balance_cache
+from app.services.write_behind import write_behind
 
 FREE_TRIAL_LIMIT = 1
 
 
+async def get_balance(device_id: str) -> Tuple[int, int]:
+    """Paid tokens left and free trial checks left, served from the balance cache when possible.
+    
+    On a miss both numbers come from one aggregate query.
+    """
+    cached = balance_cache.get(device_id)
+    if cached is not None:
+        return cached
+    
+    sequence = balance_cache.sequence
+    paid = (
+        select(func.coalesce(func.sum(GenerationToken.remaining), 0))
+        .where(GenerationToken.device_id == device_id)
+        .where(GenerationToken.remaining > 0)
+        .scalar_subquery()
+    )
+    used = (
+        select(DeviceUsage.usage_count)
+        .where(DeviceUsage.device_id == device_id)
+        .scalar_subquery()
+    )
+    async with get_db_session() as session:
+        result = await session.execute(select(paid, func.coalesce(used, 0)))
+        paid_tokens, usage_count = result.one()
+    
+    trial_remaining = max(0, FREE_TRIAL_LIMIT - usage_count)
+    balance_cache.fill(device_id, paid_tokens, trial_remaining, sequence)
+    return paid_tokens, trial_remaining
+
+
 async def get_free_trial_status(device_id: str) -> Tuple[bool, int]:
     """Check if device has free trial available."""
-    async with get_db_session() as session:
-        result = await session.execute(
-            select(DeviceUsage).where(DeviceUsage.device_id == device_id)
-        )
-        usage = result.scalar_one_or_none()
-        
-        if usage is None:
-            return True, FREE_TRIAL_LIMIT
-        
-        remaining = max(0, FREE_TRIAL_LIMIT - usage.usage_count)
-        return remaining > 0, remaining
+    _, remaining = await get_balance(device_id)
+    return remaining > 0, remaining
 
 
-async def check_and_consume_token(device_id: str) -> Tuple[bool, str]:
-    """Check if user can make a request and consume a token if available."""
-    async with get_db_session() as session:
-        # Check for paid tokens first
-        result = await session.execute(
-            select(GenerationToken)
+async def _take_paid_token(session: AsyncSession, device_id: str) -> bool:
+    """Atomically take one token from the device's oldest purchase that has any left."""
+    oldest = (
+        select(GenerationToken.id)
+        .where(GenerationToken.device_id == device_id)
+        .where(GenerationToken.remaining > 0)
+        .order_by(GenerationToken.created_at.asc(), GenerationToken.id.asc())
+        .limit(1)
+        .with_for_update()
+        .scalar_subquery()
+    )
+    result = await session.execute(
+        update(GenerationToken)
+        .where(GenerationToken.id == oldest)
+        .where(GenerationToken.remaining > 0)
+        .values(remaining=GenerationToken.remaining - 1)
+        .returning(GenerationToken.id)
+        .execution_options(synchronize_session=False)
+    )
+    return result.first() is not None
+
+
+async def _take_free_trial(session: AsyncSession, device_id: str, count: int = 1) -> bool:
+    """Atomically count `count` free trial uses, only if that stays within the limit."""
+    if count > FREE_TRIAL_LIMIT:
+        return False
+    stmt = dialect_insert(session)(DeviceUsage).values(device_id=device_id, usage_count=count)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DeviceUsage.device_id],
+        set_={"usage_count": DeviceUsage.usage_count + count},
+        where=DeviceUsage.usage_count + count <= FREE_TRIAL_LIMIT
+    ).returning(DeviceUsage.usage_count)
+    result = await session.execute(stmt)
+    return result.first() is not None
+
+
+async def _has_paid_tokens(session: AsyncSession, device_id: str) -> bool:
+    result = await session.execute(
+        select(
+            exists()
             .where(GenerationToken.device_id == device_id)
             .where(GenerationToken.remaining > 0)
-            .order_by(GenerationToken.created_at.asc())
         )
-        token = result.scalar_one_or_none()
+    )
+    return bool(result.scalar())
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def _touch(device_id: str) -> None:
+    """Record the device's last token use as `DeviceUsage.updated_at`.
+    
+    Not needed for any balance, so it goes through the write-behind buffer
+    instead of lengthening the consuming transaction; a device without a
+    usage row gets one with no trial use counted.
+    """
+    await write_behind.upsert(
+        DeviceUsage,
+        {"device_id": device_id, "usage_count": 0, "updated_at": _utcnow()},
+        key=("device_id",),
+        update=("updated_at",)
+    )
+
+
+async def check_and_consume_token(device_id: str) -> Tuple[bool, str]:
+    """Check if user can make a request and consume a token if available.
+    
+    Each step is a single conditional statement, so concurrent requests can
+    never spend the same token twice: paid tokens are tried first, then the
+    free trial.
+    """
+    can_use, reason = await _consume(device_id)
+    if can_use:
+        await _touch(device_id)
+    return can_use, reason
+
+
+async def _consume(device_id: str) -> Tuple[bool, str]:
+    async with get_write_session() as session:
+        while True:
+            if await _take_paid_token(session, device_id):
+                await session.commit()
+                balance_cache.adjust(device_id, paid=-1)
+                return True, "paid_token"
+            # On databases with row locks a concurrent consumer can drain the row we
+            # picked. Retry while any purchase has tokens left, so the free trial is
+            # only used once paid tokens are gone; every miss means another consume
+            # committed, so this ends.
+            if not await _has_paid_tokens(session, device_id):
+                break
         
-        if token:
-            token.remaining -= 1
+        if await _take_free_trial(session, device_id):
             await session.commit()
-            return True, "paid_token"
+            balance_cache.adjust(device_id, trial=-1)
+            return True, "free_trial"
         
-        # Check free trial
-        result = await session.execute(
-            select(DeviceUsage).where(DeviceUsage.device_id == device_id)
-        )
-        usage = result.scalar_one_or_none()
+        await session.rollback()
+        return False, "No tokens remaining. Please purchase more."
+
+
+async def reserve_tokens(device_id: str, count: int) -> Optional[Dict[str, int]]:
+    """Consume `count` tokens at once, all or nothing, in a single transaction.
+    
+    Paid tokens are used first (oldest purchase first), then any remaining free
+    trial. Returns how many of each kind were taken, or None if the device
+    cannot cover the whole amount.
+    """
+    async with get_write_session() as session:
+        paid = 0
+        while paid < count and await _take_paid_token(session, device_id):
+            paid += 1
         
-        if usage is None:
-            # First time user - grant free trial
-            usage = DeviceUsage(device_id=device_id, usage_count=1)
-            session.add(usage)
-            await session.commit()
-            return True, "free_trial"
+        trial = count - paid
+        if trial and not await _take_free_trial(session, device_id, trial):
+            await session.rollback()
+            return None
         
-        if usage.usage_count < FREE_TRIAL_LIMIT:
-            usage.usage_count += 1
+        await session.commit()
+    balance_cache.adjust(device_id, paid=-paid, trial=-trial)
+    await _touch(device_id)
+    return {"paid_token": paid, "free_trial": trial}
+
+
+async def refund_token(device_id: str, kind: str, count: int = 1) -> None:
+    """Give back tokens consumed by `check_and_consume_token` or `reserve_tokens` when the analysis failed."""
+    if count <= 0:
+        return
+    async with get_write_session() as session:
+        if kind == "paid_token":
+            # Tokens are spent oldest-first, so the last ones taken sit on the newest touched rows
+            newest = (
+                select(GenerationToken.id)
+                .where(GenerationToken.device_id == device_id)
+                .where(GenerationToken.remaining < GenerationToken.total)
+                .order_by(GenerationToken.created_at.desc(), GenerationToken.id.desc())
+                .limit(1)
+                .with_for_update()
+                .scalar_subquery()
+            )
+            refunded = 0
+            for _ in range(count):
+                result = await session.execute(
+                    update(GenerationToken)
+                    .where(GenerationToken.id == newest)
+                    .where(GenerationToken.remaining < GenerationToken.total)
+                    .values(remaining=GenerationToken.remaining + 1)
+                    .returning(GenerationToken.id)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.first() is None:
+                    break
+                refunded += 1
             await session.commit()
-            return True, "free_trial"
-        
-        return False, "No tokens remaining. Please purchase more."
+            balance_cache.adjust(device_id, paid=refunded)
+        elif kind == "free_trial":
+            await session.execute(
+                update(DeviceUsage)
+                .where(DeviceUsage.device_id == device_id)
+                .values(usage_count=case(
+                    (DeviceUsage.usage_count > count, DeviceUsage.usage_count - count),
+                    else_=0
+                ))
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+            # The refund is capped at the uses recorded; let the next read recount
+            balance_cache.invalidate(device_id)
+
+
+async def refund_reservation(device_id: str, reserved: Dict[str, int], count: int) -> None:
+    """Give back `count` tokens of a `reserve_tokens` reservation, newest kind first."""
+    trial = min(count, reserved.get("free_trial", 0))
+    await refund_token(device_id, "free_trial", trial)
+    await refund_token(device_id, "paid_token", min(count - trial, reserved.get("paid_token", 0)))
 
 
 async def add_tokens(device_id: str, amount: int, product_sku: str, transaction_id: str) -> int:
@@ -72,16 +236,48 @@ async def add_tokens(device_id: str, amount: int, product_sku: str, transaction_
         )
         session.add(token)
         await session.commit()
-        return amount
+    balance_cache.adjust(device_id, paid=amount)
+    return amount
+
+
+async def grant_purchase(
+    session: AsyncSession, device_id: str, amount: int, product_sku: str, transaction_id: str, amount_cents: int
+) -> bool:
+    """Add a purchase's tokens and record its payment, in the caller's transaction.
+    
+    Both rows are keyed by `transaction_id` and inserted with ON CONFLICT DO
+    NOTHING, so granting the same purchase again is a no-op. Returns False
+    when the tokens had already been granted. The caller commits and then
+    invalidates the device's cached balance.
+    """
+    result = await session.execute(
+        dialect_insert(session)(GenerationToken)
+        .values(
+            device_id=device_id,
+            total=amount,
+            remaining=amount,
+            product_sku=product_sku,
+            transaction_id=transaction_id
+        )
+        .on_conflict_do_nothing(index_elements=[GenerationToken.transaction_id])
+        .returning(GenerationToken.id)
+    )
+    granted = result.first() is not None
+    await session.execute(
+        dialect_insert(session)(PaymentTransaction)
+        .values(
+            transaction_id=transaction_id,
+            device_id=device_id,
+            product_id=product_sku,
+            amount_cents=amount_cents,
+            status="completed"
+        )
+        .on_conflict_do_nothing(index_elements=[PaymentTransaction.transaction_id])
+    )
+    return granted
 
 
 async def get_token_balance(device_id: str) -> int:
     """Get total remaining tokens for a device."""
-    async with get_db_session() as session:
-        result = await session.execute(
-            select(GenerationToken)
-            .where(GenerationToken.device_id == device_id)
-            .where(GenerationToken.remaining > 0)
-        )
-        tokens = result.scalars().all()
-        return sum(t.remaining for t in tokens)
+    paid_tokens, _ = await get_balance(device_id)
+    return paid_tokens
@@ -0,0 +1,225 @@
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import get_settings
+from app.database import dialect_insert, get_db_session, get_write_session
+from app.metrics import (
+    TOOL_NAME, payment_revenue, payment_success, register_scrape_hook, webhook_events, webhook_processed,
+    webhook_processing_lag, webhook_queue_depth
+)
+from app.models.webhook import WebhookEvent
+from app.services.balance_cache import balance_cache
+from app.services.token_service import grant_purchase
+
+logger = logging.getLogger(__name__)
+
+# Product configurations
+PRODUCTS = {
+    "basic": {"tokens": 3, "price_cents": 799},
+    "standard": {"tokens": 10, "price_cents": 1999},
+}
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def event_id(data: dict, body: bytes) -> str:
+    """Creem's event id; deliveries without one are keyed by their body."""
+    return str(data.get("id") or "sha256:" + hashlib.sha256(body).hexdigest())
+
+
+class WebhookProcessor:
+    """Creem webhook events processed from the `webhook_events` table.
+
+    The endpoint only stores each verified event (ignoring redeliveries of one
+    already stored) and queues its id, so it can acknowledge straight away.
+    Workers then grant the purchase; a failed attempt is retried with backoff
+    up to WEBHOOK_MAX_ATTEMPTS, after which the event is marked failed and can
+    be replayed with `python -m app.cli replay-webhooks`. Pending events are
+    re-queued by `start`.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._retries: List[asyncio.TimerHandle] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self, workers: Optional[int] = None) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        async with get_db_session() as session:
+            result = await session.execute(
+                select(WebhookEvent.id)
+                .where(WebhookEvent.status == "pending")
+                .order_by(WebhookEvent.received_at.asc())
+            )
+            for pending_id in result.scalars():
+                self._queue.put_nowait(pending_id)
+        count = workers or get_settings().WEBHOOK_WORKERS
+        self._workers = [asyncio.create_task(self._work()) for _ in range(count)]
+
+    async def stop(self) -> None:
+        for handle in self._retries:
+            handle.cancel()
+        self._retries = []
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    async def join(self) -> None:
+        """Wait until every queued event has been processed."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def record(self, source: str, data: dict, body: bytes) -> bool:
+        """Store a verified event and queue it; returns False if it had been received before."""
+        key = event_id(data, body)
+        async with get_write_session() as session:
+            result = await session.execute(
+                dialect_insert(session)(WebhookEvent)
+                .values(
+                    id=key,
+                    source=source,
+                    event_type=str(data.get("type") or data.get("eventType") or "unknown"),
+                    payload=body.decode(),
+                    status="pending",
+                    attempts=0
+                )
+                .on_conflict_do_nothing(index_elements=[WebhookEvent.id])
+                .returning(WebhookEvent.id)
+            )
+            accepted = result.first() is not None
+            await session.commit()
+        webhook_events.labels(tool=TOOL_NAME, source=source, outcome="accepted" if accepted else "duplicate").inc()
+        if accepted and self._queue is not None:
+            self._queue.put_nowait(key)
+        return accepted
+
+    async def _work(self) -> None:
+        while True:
+            key = await self._queue.get()
+            try:
+                await self.process(key)
+            except Exception:
+                logger.exception("Webhook event %s crashed", key)
+            finally:
+                self._queue.task_done()
+
+    async def _update(self, key: str, **values) -> None:
+        async with get_db_session() as session:
+            await session.execute(update(WebhookEvent).where(WebhookEvent.id == key).values(**values))
+            await session.commit()
+
+    def _retry_later(self, key: str, delay: float) -> None:
+        if self._queue is None:
+            return
+        loop = asyncio.get_running_loop()
+        self._retries = [handle for handle in self._retries if not handle.cancelled()]
+        self._retries.append(loop.call_later(delay, self._queue.put_nowait, key))
+
+    async def process(self, key: str) -> str:
+        """Apply one stored event; returns its new status.
+
+        The purchase is granted and the event marked processed in a single
+        transaction, and processing an event again is harmless: the purchase
+        is only granted once.
+        """
+        try:
+            async with get_write_session() as session:
+                event = await session.get(WebhookEvent, key)
+                if event is None or event.status in ("processed", "ignored"):
+                    return event.status if event is not None else "missing"
+                attempts = (event.attempts or 0) + 1
+                outcome, device_id = await self._apply(session, json.loads(event.payload))
+                event.status = "ignored" if outcome == "ignored" else "processed"
+                event.attempts = attempts
+                event.error = None
+                event.processed_at = _utcnow()
+                await session.commit()
+        except Exception as e:
+            return await self._failed(key, e)
+
+        if device_id is not None:
+            # Drop the cached balance so the next poll reads the new tokens from the database
+            balance_cache.invalidate(device_id)
+        webhook_processed.labels(tool=TOOL_NAME, outcome=outcome).inc()
+        if event.received_at is not None:
+            webhook_processing_lag.labels(tool=TOOL_NAME).observe(
+                max(0.0, (event.processed_at - event.received_at).total_seconds())
+            )
+        return event.status
+
+    async def _failed(self, key: str, error: Exception) -> str:
+        """Count a failed attempt; the event is retried later or, after the last attempt, marked failed."""
+        settings = get_settings()
+        async with get_db_session() as session:
+            event = await session.get(WebhookEvent, key)
+            if event is None:
+                raise error
+            event.attempts = attempts = (event.attempts or 0) + 1
+            event.error = str(error)
+            if attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+                event.status = "failed"
+            await session.commit()
+        logger.warning("Webhook event %s failed (attempt %d): %s", key, attempts, error)
+        if event.status == "failed":
+            webhook_processed.labels(tool=TOOL_NAME, outcome="failed").inc()
+            return "failed"
+        webhook_processed.labels(tool=TOOL_NAME, outcome="retry").inc()
+        self._retry_later(key, settings.WEBHOOK_RETRY_DELAY * 2 ** (attempts - 1))
+        return "pending"
+
+    async def _apply(self, session: AsyncSession, data: dict) -> Tuple[str, Optional[str]]:
+        """Outcome of a parsed event, and the device whose balance it changed."""
+        if data.get("type") != "checkout.completed":
+            return "ignored", None
+        checkout = data.get("object", {})
+        metadata = checkout.get("metadata", {})
+        device_id = metadata.get("device_id")
+        product_sku = metadata.get("product_sku")
+        transaction_id = checkout.get("id")
+        amount_cents = checkout.get("amount", 0)
+        product = PRODUCTS.get(product_sku)
+        if not (device_id and transaction_id and product):
+            return "ignored", None
+
+        if not await grant_purchase(session, device_id, product["tokens"], product_sku, transaction_id, amount_cents):
+            return "already_granted", None
+        payment_success.labels(tool=TOOL_NAME, product_sku=product_sku).inc()
+        payment_revenue.labels(tool=TOOL_NAME).inc(amount_cents)
+        return "granted", device_id
+
+    async def replay(self, statuses: Iterable[str] = ("failed", "pending"), ids: Iterable[str] = ()) -> dict:
+        """Process stored events again, by status or id; returns how many ended in each status."""
+        ids = list(ids)
+        query = select(WebhookEvent.id).order_by(WebhookEvent.received_at.asc())
+        query = query.where(WebhookEvent.id.in_(ids)) if ids else query.where(WebhookEvent.status.in_(list(statuses)))
+        async with get_db_session() as session:
+            keys = list((await session.execute(query)).scalars())
+
+        counts: dict = {}
+        for key in keys:
+            await self._update(key, status="pending", attempts=0)
+            status = await self.process(key)
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+
+webhook_processor = WebhookProcessor()
+
+register_scrape_hook(lambda: webhook_queue_depth.labels(tool=TOOL_NAME).set(webhook_processor.depth()))
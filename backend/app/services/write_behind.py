@@ -0,0 +1,180 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import get_settings
+from app.database import dialect_insert, get_write_session
+from app.metrics import TOOL_NAME, register_scrape_hook, write_behind_pending, write_behind_rows
+
+logger = logging.getLogger(__name__)
+
+# (model, key columns, columns updated on conflict) of a buffered upsert
+_UpsertTarget = Tuple[Any, Tuple[str, ...], Tuple[str, ...]]
+
+
+class WriteBehind:
+    """Non-critical writes, applied in bulk off the request path.
+
+    Meant for rows whose loss in a crash costs a cache miss or a gap in
+    statistics, never money: persisted cache results, claim fingerprints,
+    ledger entries, device activity. Token balances, purchases and webhook
+    events are written in their own transactions and never come through here.
+
+    Writes are buffered per table and applied every `max_delay` seconds, or
+    as soon as `batch_size` rows are waiting, as one multi-row statement per
+    table in a single transaction: one commit instead of one per write.
+    Upserts keep only the latest row per key, so a device touched many times
+    between flushes is written once. At most `max_pending` rows are buffered;
+    past that, writes are dropped and counted. `stop` flushes what is left.
+    While not started (CLI commands, tests) every write is applied straight away.
+    """
+
+    def __init__(self, max_delay: float, batch_size: int, max_pending: int, enabled: bool = True):
+        self.max_delay = max_delay
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.enabled = enabled
+        self._inserts: Dict[Any, List[dict]] = {}
+        self._upserts: Dict[_UpsertTarget, Dict[tuple, dict]] = {}
+        self._pending = 0
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return self._pending
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def insert(self, model, row: dict) -> None:
+        """INSERT `row` into `model`'s table."""
+        if not self.running:
+            await self._apply({model: [row]}, {})
+        elif self._admit(model):
+            self._inserts.setdefault(model, []).append(row)
+            self._added()
+
+    async def upsert(self, model, row: dict, key: Sequence[str], update: Sequence[str] = ()) -> None:
+        """INSERT `row`, or on a conflict on the `key` columns update the `update` columns (or keep the row)."""
+        target = (model, tuple(key), tuple(update))
+        if not self.running:
+            await self._apply({}, {target: {(): row}})
+            return
+        rows = self._upserts.setdefault(target, {})
+        row_key = tuple(row[column] for column in key)
+        if row_key in rows:
+            rows[row_key] = row  # replaces a pending write, the buffer does not grow
+        elif self._admit(model):
+            rows[row_key] = row
+            self._added()
+
+    def _admit(self, model) -> bool:
+        if self._pending < self.max_pending:
+            return True
+        write_behind_rows.labels(tool=TOOL_NAME, table=model.__tablename__, outcome="dropped").inc()
+        return False
+
+    def _added(self) -> None:
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self._wake.set()
+
+    def clear(self) -> None:
+        self._inserts, self._upserts, self._pending = {}, {}, 0
+
+    async def start(self) -> None:
+        if self.running or not self.enabled:
+            return
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background flushes and write everything still buffered.
+
+        The loop is asked to stop rather than cancelled, so a flush in
+        progress finishes (or puts its rows back) before the final one.
+        """
+        task, self._task = self._task, None
+        if task is not None:
+            self._stopping = True
+            self._wake.set()
+            await task
+        await self.flush()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.max_delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Apply every buffered write in one transaction; returns how many rows were written."""
+        inserts, upserts, pending = self._inserts, self._upserts, self._pending
+        if not pending:
+            return 0
+        self.clear()
+        try:
+            await self._apply(inserts, upserts)
+        except Exception:
+            logger.exception("Write-behind flush of %d rows failed; keeping them for the next one", pending)
+            self._restore(inserts, upserts)
+            return 0
+        except BaseException:
+            # Cancelled mid-flush: keep the rows for whoever flushes next (upserts make a repeat harmless)
+            self._restore(inserts, upserts)
+            raise
+        return pending
+
+    def _restore(self, inserts: Dict[Any, List[dict]], upserts: Dict[_UpsertTarget, Dict[tuple, dict]]) -> None:
+        """Put back rows of a failed flush, behind anything written since and within the buffer bound."""
+        for model, rows in inserts.items():
+            for row in rows:
+                if self._admit(model):
+                    self._inserts.setdefault(model, []).insert(0, row)
+                    self._pending += 1
+        for target, rows in upserts.items():
+            newer = self._upserts.setdefault(target, {})
+            for row_key, row in rows.items():
+                if row_key not in newer and self._admit(target[0]):
+                    newer[row_key] = row
+                    self._pending += 1
+
+    async def _apply(self, inserts: Dict[Any, List[dict]], upserts: Dict[_UpsertTarget, Dict[tuple, dict]]) -> None:
+        async with get_write_session() as session:
+            for model, rows in inserts.items():
+                await session.execute(insert(model), rows)
+            for (model, key, update), rows in upserts.items():
+                await session.execute(self._upsert_statement(session, model, key, update), list(rows.values()))
+            await session.commit()
+        for model, rows in inserts.items():
+            write_behind_rows.labels(tool=TOOL_NAME, table=model.__tablename__, outcome="written").inc(len(rows))
+        for (model, _, _), rows in upserts.items():
+            write_behind_rows.labels(tool=TOOL_NAME, table=model.__tablename__, outcome="written").inc(len(rows))
+
+    @staticmethod
+    def _upsert_statement(session: AsyncSession, model, key: Tuple[str, ...], update: Tuple[str, ...]):
+        stmt = dialect_insert(session)(model)
+        if not update:
+            return stmt.on_conflict_do_nothing(index_elements=list(key))
+        return stmt.on_conflict_do_update(
+            index_elements=list(key), set_={column: stmt.excluded[column] for column in update}
+        )
+
+
+_settings = get_settings()
+
+write_behind = WriteBehind(
+    max_delay=_settings.WRITE_BEHIND_MAX_DELAY,
+    batch_size=_settings.WRITE_BEHIND_BATCH_SIZE,
+    max_pending=_settings.WRITE_BEHIND_MAX_PENDING,
+    enabled=_settings.WRITE_BEHIND_ENABLED
+)
+
+register_scrape_hook(lambda: write_behind_pending.labels(tool=TOOL_NAME).set(len(write_behind)))
@@ -0,0 +1,65 @@
+"""Near-duplicate claim index: rebuild time, memory and lookup latency.
+
+Fills the index with random fingerprints (as `load` would from the database),
+then times lookups of near-duplicates of indexed claims and of unseen claims.
+
+    python -m benchmarks.bench_claim_index [--entries 1000000]
+"""
+import argparse
+import json
+import os
+import random
+import time
+from array import array
+from app.services.claim_index import ClaimIndex, claim_fingerprint
+from app.services.result_cache import make_cache_key
+
+
+def main(entries: int, lookups: int, threshold: float) -> dict:
+    rng = random.Random(0)
+    claims = [f"Viral claim {i}: the city water supply was secretly replaced in {2000 + i % 25}" for i in range(lookups)]
+    fingerprints = array("Q", (rng.getrandbits(64) for _ in range(entries - lookups)))
+    fingerprints.extend(claim_fingerprint(claim) for claim in claims)
+    keys = bytearray(os.urandom(32 * (entries - lookups)))
+    for claim in claims:
+        keys += bytes.fromhex(make_cache_key(claim, "en"))
+    
+    index = ClaimIndex(threshold=threshold, max_age=3600, persistent=False)
+    started = time.perf_counter()
+    index.rebuild({"en": fingerprints}, {"en": keys})
+    rebuild_s = time.perf_counter() - started
+    
+    def timed(queries):
+        times, found = [], 0
+        for query in queries:
+            started = time.perf_counter()
+            found += index.find(query, "en") is not None
+            times.append(time.perf_counter() - started)
+        times.sort()
+        return {
+            "found": found,
+            "p50_us": round(times[len(times) // 2] * 1e6, 1),
+            "p99_us": round(times[int(len(times) * 0.99)] * 1e6, 1),
+        }
+    
+    shard = index._shards["en"]
+    index_bytes = (shard.fingerprints.itemsize * len(shard.fingerprints) + len(shard.keys)
+                   + sum(band.itemsize * len(band) for band in shard.bands))
+    return {
+        "entries": entries,
+        "bands": len(shard.bands),
+        "max_distance_bits": index.max_distance,
+        "rebuild_s": round(rebuild_s, 2),
+        "index_mb": round(index_bytes / 2 ** 20, 1),
+        "near_duplicate_lookup": timed(f"BREAKING!!! {claim.upper()} 😱" for claim in claims),
+        "unseen_lookup": timed(f"Unrelated statement {i} about a celebrity diet" for i in range(lookups)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=0.95)
+    args = parser.parse_args()
+    print(json.dumps(main(args.entries, args.lookups, args.threshold), indent=2))
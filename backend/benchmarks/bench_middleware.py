@@ -0,0 +1,72 @@
+"""Per-request overhead of MetricsMiddleware.
+
+Drives a one-route FastAPI app directly through ASGI (no sockets), with and
+without the middleware, and reports the difference per request.
+
+    python -m benchmarks.bench_middleware [--requests 20000]
+"""
+import argparse
+import asyncio
+import json
+import time
+from fastapi import FastAPI
+from app.middleware import MetricsMiddleware
+
+
+def build_app(with_middleware: bool) -> FastAPI:
+    app = FastAPI()
+    
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: str):
+        return {"item_id": item_id}
+    
+    if with_middleware:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def drive(app, requests: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    async def send(message):
+        pass
+    
+    started = time.perf_counter()
+    for i in range(requests):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": f"/items/{i}", "raw_path": f"/items/{i}".encode(),
+            "query_string": b"", "root_path": "", "headers": [], "server": ("bench", 80), "client": ("bench", 1)
+        }
+        await app(scope, receive, send)
+    return time.perf_counter() - started
+
+
+async def main(requests: int, rounds: int) -> dict:
+    bare, instrumented = build_app(False), build_app(True)
+    await drive(bare, 1000)  # warm up both stacks
+    await drive(instrumented, 1000)
+    
+    bare_times, instrumented_times = [], []
+    for _ in range(rounds):
+        bare_times.append(await drive(bare, requests))
+        instrumented_times.append(await drive(instrumented, requests))
+    
+    bare_us = min(bare_times) / requests * 1e6
+    instrumented_us = min(instrumented_times) / requests * 1e6
+    return {
+        "requests": requests,
+        "bare_us_per_request": round(bare_us, 2),
+        "instrumented_us_per_request": round(instrumented_us, 2),
+        "overhead_us_per_request": round(instrumented_us - bare_us, 2),
+        "overhead_pct": round((instrumented_us - bare_us) / bare_us * 100, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.requests, args.rounds)), indent=2))
@@ -0,0 +1,51 @@
+"""Prompt size and output budget per request, before and after prompt budgeting.
+
+The previous layout sent each claim verbatim with a fixed max_tokens of 2000.
+Prefix tokens are the static system prompt; a provider's prompt cache only
+reuses them across requests once the prefix reaches its minimum cacheable
+length (LLM_PROMPT_CACHE_MIN_TOKENS), so below that every token is uncached.
+
+    python -m benchmarks.bench_prompt
+"""
+import json
+from app.services.prompt_builder import SYSTEM_PROMPT, build_prompt, estimate_tokens, prefix_cacheable
+
+SAMPLES = {
+    "short_en": ("en", "Drinking eight glasses of water a day is medically required."),
+    "short_zh": ("zh", "每天喝八杯水是医学上必需的。"),
+    "multi_sentence_en": ("en", "The vaccine was rushed. It was never tested. It changes your DNA. Doctors are hiding it."),
+    "forwarded_message_en": ("en", (
+        "FORWARDED MANY TIMES!!!!! Read before it is deleted!!! "
+        "https://news.example.com/2024/03/story?utm_source=whatsapp&utm_medium=share&fbclid=abc123#comments\n\n\n"
+        + "The government admitted the water supply contains tracking chemicals. " * 6
+        + "Share with everyone you love??? " * 4
+        + "Full transcript: " + "officials said the results were within normal limits and no action was needed. " * 30
+    )),
+}
+
+
+def _legacy(claim: str) -> dict:
+    user_prompt = f'Analyze this claim for factual accuracy:\n\n"{claim}"\n\nRespond in English.\n\nProvide your analysis in the JSON format specified.'
+    return {"prompt_tokens": estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(user_prompt), "max_tokens": 2000}
+
+
+def main() -> dict:
+    prefix_tokens = estimate_tokens(SYSTEM_PROMPT)
+    cached_tokens = prefix_tokens if prefix_cacheable() else 0
+    results = {"static_prefix_tokens": prefix_tokens, "prefix_cacheable": prefix_cacheable(), "claims": {}}
+    for name, (language, claim) in SAMPLES.items():
+        plan = build_prompt(claim, language, "bench")
+        results["claims"][name] = {
+            "before": _legacy(claim),
+            "after": {
+                "prompt_tokens": plan.estimated_prompt_tokens,
+                "uncached_prompt_tokens": plan.estimated_prompt_tokens - cached_tokens,
+                "max_tokens": plan.max_tokens,
+                "compacted_chars": plan.compacted_chars,
+            },
+        }
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(), indent=2))
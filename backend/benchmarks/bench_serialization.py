@@ -0,0 +1,106 @@
+"""Cost of serializing responses: stdlib json vs orjson, and precomputed static payloads.
+
+Encodes a typical fact check result directly, then drives small FastAPI apps
+through ASGI (no sockets) to compare a `FactCheckResult` route under
+JSONResponse and ORJSONResponse, and the products catalog rebuilt per request
+vs precomputed, with and without a matching If-None-Match.
+
+    python -m benchmarks.bench_serialization [--requests 20000]
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import List, Tuple
+import orjson
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, ORJSONResponse
+from app.api.v1.payment import PRODUCT_CATALOG
+from app.responses import PrecomputedJSON
+from app.schemas.fact_check import FactCheckResult
+from benchmarks.fake_llm import ANALYSIS
+
+RESULT = {**ANALYSIS, "disclaimer": "This AI analysis is for reference only.", "cached": True, "model": "bench"}
+CATALOG = orjson.loads(PRODUCT_CATALOG.body)
+
+
+def time_encoder(encode, rounds: int, count: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(count):
+            encode(RESULT)
+        best = min(best, time.perf_counter() - started)
+    return best / count * 1e6
+
+
+def build_app(response_class) -> FastAPI:
+    app = FastAPI(default_response_class=response_class)
+    precomputed = PrecomputedJSON(CATALOG, cache_control="public, max-age=3600")
+
+    @app.get("/result", response_model=FactCheckResult)
+    async def result():
+        return RESULT
+
+    @app.get("/products/rebuilt")
+    async def rebuilt():
+        return {"products": [dict(product) for product in CATALOG["products"]]}
+
+    @app.get("/products/precomputed")
+    async def precomputed_route(request: Request):
+        return precomputed.response(request)
+
+    app.state.etag = precomputed.etag
+    return app
+
+
+async def drive(app, path: str, headers: List[Tuple[bytes, bytes]], requests: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": headers, "server": ("bench", 80), "client": ("bench", 1)
+    }
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return time.perf_counter() - started
+
+
+async def per_request_us(app, path: str, requests: int, rounds: int, headers=()) -> float:
+    await drive(app, path, list(headers), 500)
+    return round(min([await drive(app, path, list(headers), requests) for _ in range(rounds)]) / requests * 1e6, 2)
+
+
+async def main(requests: int, rounds: int) -> dict:
+    std_app, orjson_app = build_app(JSONResponse), build_app(ORJSONResponse)
+    revalidate = [(b"if-none-match", orjson_app.state.etag.encode())]
+    return {
+        "encode_us": {
+            "json.dumps": round(time_encoder(lambda data: json.dumps(data, ensure_ascii=False).encode(), rounds, requests), 2),
+            "orjson.dumps": round(time_encoder(orjson.dumps, rounds, requests), 2),
+        },
+        "result_route_us_per_request": {
+            "JSONResponse": await per_request_us(std_app, "/result", requests, rounds),
+            "ORJSONResponse": await per_request_us(orjson_app, "/result", requests, rounds),
+        },
+        "products_route_us_per_request": {
+            "rebuilt_JSONResponse": await per_request_us(std_app, "/products/rebuilt", requests, rounds),
+            "rebuilt_ORJSONResponse": await per_request_us(orjson_app, "/products/rebuilt", requests, rounds),
+            "precomputed_200": await per_request_us(orjson_app, "/products/precomputed", requests, rounds),
+            "precomputed_304": await per_request_us(orjson_app, "/products/precomputed", requests, rounds, revalidate),
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.requests, args.rounds)), indent=2))
@@ -0,0 +1,46 @@
+"""Local stand-in for the Creem payments API.
+
+Serves `POST /v1/checkouts` and builds signed `checkout.completed` webhook
+bodies the way Creem sends them to `/api/v1/webhook/creem`.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import uuid
+from typing import Tuple
+from fastapi import FastAPI, Request
+
+
+def create_fake_creem(latency: float = 0.05) -> FastAPI:
+    app = FastAPI()
+    app.state.checkouts = 0
+
+    @app.post("/v1/checkouts")
+    async def create_checkout(request: Request):
+        body = await request.json()
+        app.state.checkouts += 1
+        await asyncio.sleep(latency)
+        checkout_id = f"ch_{uuid.uuid4().hex[:16]}"
+        return {
+            "id": checkout_id,
+            "checkout_url": f"https://checkout.creem.test/{checkout_id}",
+            "product_id": body.get("product_id")
+        }
+
+    return app
+
+
+def signed_webhook(secret: str, device_id: str, product_sku: str = "standard",
+                   amount_cents: int = 1999, transaction_id: str = "") -> Tuple[bytes, dict]:
+    """Body and headers of a `checkout.completed` webhook."""
+    body = json.dumps({
+        "type": "checkout.completed",
+        "object": {
+            "id": transaction_id or f"txn_{uuid.uuid4().hex}",
+            "amount": amount_cents,
+            "metadata": {"device_id": device_id, "product_sku": product_sku}
+        }
+    }).encode()
+    signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return body, {"creem-signature": signature, "Content-Type": "application/json"}
@@ -0,0 +1,165 @@
+"""Local stand-in for a Redis-protocol key-value server.
+
+Implements the RESP2 commands `RespState` uses (GET, SET with EX/PX/NX/XX,
+DEL, INCR/INCRBY, EXPIRE/PEXPIRE, PTTL, AUTH, SELECT, PING, and EVAL of the
+compare-and-delete script) on one in-memory keyspace, so shared state can be
+tested and benchmarked without a server.
+
+    python -m benchmarks.fake_kv --port 6379
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+from app.services.shared_state import COMPARE_AND_DELETE
+
+
+class FakeKV:
+    def __init__(self, password: Optional[str] = None):
+        self.password = password
+        self.values: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.commands = 0
+
+    def _live(self, key: bytes) -> Optional[Tuple[bytes, Optional[float]]]:
+        entry = self.values.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self.values[key]
+            return None
+        return entry
+
+    def handle(self, args: List[bytes], state: dict) -> bytes:
+        self.commands += 1
+        name = args[0].upper().decode()
+        if self.password is not None and not state.get("authenticated") and name not in ("AUTH", "PING"):
+            return b"-NOAUTH Authentication required.\r\n"
+        handler = getattr(self, f"_cmd_{name.lower()}", None)
+        if handler is None:
+            return b"-ERR unknown command '%s'\r\n" % args[0]
+        try:
+            return handler(args[1:], state)
+        except (IndexError, ValueError):
+            return b"-ERR syntax error\r\n"
+
+    @staticmethod
+    def _bulk(value: Optional[bytes]) -> bytes:
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _cmd_ping(self, args, state):
+        return b"+PONG\r\n"
+
+    def _cmd_auth(self, args, state):
+        if args[-1].decode() != (self.password or ""):
+            return b"-WRONGPASS invalid username-password pair\r\n"
+        state["authenticated"] = True
+        return b"+OK\r\n"
+
+    def _cmd_select(self, args, state):
+        int(args[0])
+        return b"+OK\r\n"
+
+    def _cmd_get(self, args, state):
+        entry = self._live(args[0])
+        return self._bulk(entry[0] if entry else None)
+
+    def _cmd_set(self, args, state):
+        key, value, options = args[0], args[1], [arg.upper() for arg in args[2:]]
+        expires_at = None
+        if b"PX" in options:
+            expires_at = time.monotonic() + int(args[2 + options.index(b"PX") + 1]) / 1000
+        if b"EX" in options:
+            expires_at = time.monotonic() + int(args[2 + options.index(b"EX") + 1])
+        exists = self._live(key) is not None
+        if (b"NX" in options and exists) or (b"XX" in options and not exists):
+            return b"$-1\r\n"
+        self.values[key] = (value, expires_at)
+        return b"+OK\r\n"
+
+    def _cmd_del(self, args, state):
+        removed = sum(1 for key in args if self._live(key) is not None and self.values.pop(key))
+        return b":%d\r\n" % removed
+
+    def _cmd_eval(self, args, state):
+        # No Lua here: only the scripts RespState sends are understood
+        if args[0].decode() != COMPARE_AND_DELETE or int(args[1]) != 1:
+            return b"-ERR unsupported script\r\n"
+        key, value = args[2], args[3]
+        entry = self._live(key)
+        if entry is None or entry[0] != value:
+            return b":0\r\n"
+        del self.values[key]
+        return b":1\r\n"
+
+    def _cmd_incrby(self, args, state):
+        entry = self._live(args[0]) or (b"0", None)
+        try:
+            value = int(entry[0]) + int(args[1])
+        except ValueError:
+            return b"-ERR value is not an integer or out of range\r\n"
+        self.values[args[0]] = (str(value).encode(), entry[1])
+        return b":%d\r\n" % value
+
+    def _cmd_incr(self, args, state):
+        return self._cmd_incrby([args[0], b"1"], state)
+
+    def _cmd_pexpire(self, args, state):
+        entry = self._live(args[0])
+        if entry is None:
+            return b":0\r\n"
+        self.values[args[0]] = (entry[0], time.monotonic() + int(args[1]) / 1000)
+        return b":1\r\n"
+
+    def _cmd_expire(self, args, state):
+        return self._cmd_pexpire([args[0], str(int(args[1]) * 1000).encode()], state)
+
+    def _cmd_pttl(self, args, state):
+        entry = self._live(args[0])
+        if entry is None:
+            return b":-2\r\n"
+        return b":-1\r\n" if entry[1] is None else b":%d\r\n" % int((entry[1] - time.monotonic()) * 1000)
+
+    def _cmd_flushall(self, args, state):
+        self.values.clear()
+        return b"+OK\r\n"
+
+    async def serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        state: dict = {}
+        try:
+            while True:
+                header = await reader.readline()
+                if not header:
+                    break
+                if not header.startswith(b"*"):
+                    writer.write(b"-ERR Protocol error\r\n")
+                    break
+                args = []
+                for _ in range(int(header[1:])):
+                    length = int((await reader.readline())[1:])
+                    args.append((await reader.readexactly(length + 2))[:-2])
+                writer.write(self.handle(args, state))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def start_fake_kv(host: str = "127.0.0.1", port: int = 0, password: Optional[str] = None):
+    """Start serving; returns `(server, fake)`. The bound port is `server.sockets[0].getsockname()[1]`."""
+    fake = FakeKV(password)
+    server = await asyncio.start_server(fake.serve_client, host, port)
+    return server, fake
+
+
+async def _main(host: str, port: int, password: Optional[str]) -> None:
+    server, _ = await start_fake_kv(host, port, password)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--password")
+    args = parser.parse_args()
+    asyncio.run(_main(args.host, args.port, args.password))
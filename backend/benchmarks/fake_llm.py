@@ -0,0 +1,126 @@
+"""Local stand-in for the OpenAI-compatible LLM proxy.
+
+Serves `POST /v1/chat/completions` with a canned fact check analysis after a
+configurable delay. It can also fail, return malformed JSON or stream the
+answer as server-sent events, so the app's parsing and error paths get
+exercised too.
+
+    python -m benchmarks.fake_llm --port 9100 --latency 1.5 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import json
+import random
+from dataclasses import dataclass
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ANALYSIS = {
+    "credibility_score": 35,
+    "credibility_level": "low",
+    "summary": "The claim misrepresents the cited study and has no independent confirmation.",
+    "key_points": [
+        {
+            "point": "The study proves the effect",
+            "assessment": "likely_false",
+            "explanation": "The study reports a correlation in a small sample, not causation."
+        },
+        {
+            "point": "Officials confirmed the findings",
+            "assessment": "uncertain",
+            "explanation": "No official statement could be matched to the quoted one."
+        }
+    ],
+    "contradictions": ["The original paper explicitly cautions against this interpretation."],
+    "source_analysis": {
+        "likely_origin": "social media",
+        "spread_pattern": "Shared through screenshots without links to the source.",
+        "red_flags": ["No link to the original study", "Emotional framing"]
+    }
+}
+
+
+@dataclass
+class FakeLLMConfig:
+    latency: float = 1.0  # seconds for the whole completion
+    jitter: float = 0.2  # +/- fraction of latency
+    error_rate: float = 0.0  # share of requests answered with HTTP 500
+    rate_limit_rate: float = 0.0  # share of requests answered with HTTP 429
+    malformed_rate: float = 0.0  # share of completions that are not valid JSON
+    stream_chunks: int = 40  # SSE chunks per streamed completion
+    seed: int = 0
+
+
+def _completion_text(config: FakeLLMConfig, rng: random.Random) -> str:
+    text = "```json\n" + json.dumps(ANALYSIS, indent=2) + "\n```"
+    if rng.random() < config.malformed_rate:
+        # Truncated output, as when the model hits max_tokens
+        return text[: len(text) * 2 // 3]
+    return text
+
+
+def create_fake_llm(config: FakeLLMConfig) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(config.seed)
+    app.state.requests = 0
+
+    def delay() -> float:
+        return max(0.0, config.latency * (1 + rng.uniform(-config.jitter, config.jitter)))
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        roll = rng.random()
+        if roll < config.error_rate:
+            await asyncio.sleep(delay() / 10)
+            return JSONResponse({"error": {"message": "upstream overloaded"}}, status_code=500)
+        if roll < config.error_rate + config.rate_limit_rate:
+            return JSONResponse({"error": {"message": "rate limited"}}, status_code=429, headers={"Retry-After": "1"})
+
+        text = _completion_text(config, rng)
+        usage = {"prompt_tokens": 650, "completion_tokens": len(text) // 4, "total_tokens": 650 + len(text) // 4}
+        model = body.get("model", "fake-model")
+
+        if not body.get("stream"):
+            await asyncio.sleep(delay())
+            return {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage
+            }
+
+        async def events():
+            total = delay()
+            step = max(1, len(text) // config.stream_chunks)
+            for start in range(0, len(text), step):
+                await asyncio.sleep(total / config.stream_chunks)
+                chunk = {"choices": [{"index": 0, "delta": {"content": text[start:start + step]}}], "model": model}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = FakeLLMConfig(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, malformed_rate=args.malformed_rate
+    )
+    uvicorn.run(create_fake_llm(config), host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,415 @@
+"""End-to-end load test against a real uvicorn process.
+
+Starts the local LLM proxy and Creem stand-ins, boots the app in a
+subprocess pointed at them (with a throwaway SQLite database), funds a pool
+of devices through signed webhooks and then drives each scenario at a fixed
+concurrency. Results (p50/p95/p99 latency, throughput, status codes and the
+app's DB pool / query metrics and database commits per request) are
+written as JSON so runs can be compared.
+
+    python -m benchmarks.loadtest --concurrency 50 --requests 500
+    python -m benchmarks.loadtest --scenarios check,balance --llm-latency 0.5 \\
+        --output results/after.json --compare results/before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+import httpx
+import uvicorn
+from prometheus_client.parser import text_string_to_metric_families
+from benchmarks.fake_creem import create_fake_creem, signed_webhook
+from benchmarks.fake_llm import FakeLLMConfig, create_fake_llm
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+WEBHOOK_SECRET = "bench-webhook-secret"
+SCENARIOS = ("check", "check_stream", "balance", "webhook", "checkout")
+# Compared between runs; a regression is a worse value by more than the threshold
+REGRESSION_KEYS = {"p50_ms": "higher", "p95_ms": "higher", "p99_ms": "higher", "throughput_rps": "lower"}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], statuses: Dict[str, int], elapsed: float, errors: int) -> dict:
+    values = sorted(latencies)
+    total = sum(statuses.values()) + errors
+    return {
+        "requests": total,
+        "errors": errors + sum(count for status, count in statuses.items() if not status.startswith("2")),
+        "status_codes": dict(sorted(statuses.items())),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+class UpstreamServer:
+    """Run an ASGI app on a local port inside the current event loop."""
+
+    def __init__(self, app, port: int):
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning",
+                                                   lifespan="off"))
+        self._task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self):
+        self._task = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            await asyncio.sleep(0.01)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.should_exit = True
+        await self._task
+
+
+class AppProcess:
+    """The app under test, started with `uvicorn app.main:app` in a subprocess."""
+
+    def __init__(self, port: int, env: Dict[str, str]):
+        self.port = port
+        self.env = env
+        self.process: Optional[subprocess.Popen] = None
+        self.import_s = 0.0
+        self.listening_s = 0.0
+        self.ready_s = 0.0
+        self.startup_phases: Dict[str, float] = {}
+        self._launched = 0.0
+
+    def _measure_import(self, runs: int = 3) -> float:
+        script = "import time; started = time.perf_counter(); import app.main; print(time.perf_counter() - started)"
+        return min(
+            float(subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, env=self.env, check=True,
+                                 capture_output=True, text=True).stdout)
+            for _ in range(runs)
+        )
+
+    def __enter__(self):
+        self.import_s = self._measure_import()
+        self._launched = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(self.port),
+             "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=self.env
+        )
+        return self
+
+    async def wait_ready(self, timeout: float = 30.0) -> None:
+        """Poll /livez and /readyz without blocking the loop: warmup connects to the fake upstreams served on it."""
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{self.port}", timeout=1) as client:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    raise RuntimeError("App exited during startup")
+                try:
+                    # Listening once the lifespan has created the schema; ready once warmup is done
+                    if not self.listening_s and (await client.get("/livez")).status_code == 200:
+                        self.listening_s = time.perf_counter() - self._launched
+                    response = await client.get("/readyz")
+                    if response.status_code == 200:
+                        self.ready_s = time.perf_counter() - self._launched
+                        self.startup_phases = response.json()["startup"]
+                        return
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.02)
+        raise RuntimeError(f"App did not become ready within {timeout:.0f}s")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+async def run_scenario(
+    name: str, send: Callable[[int], Awaitable[httpx.Response]], requests: int, concurrency: int
+) -> dict:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                response = await send(i)
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = summarize(latencies, statuses, time.perf_counter() - started, errors)
+    print(f"  {name:<13} {result['throughput_rps']:>8.1f} req/s  p50 {result['p50_ms']:>8.1f}ms  "
+          f"p95 {result['p95_ms']:>8.1f}ms  p99 {result['p99_ms']:>8.1f}ms  errors {result['errors']}")
+    return result
+
+
+def scrape_db_metrics(text: str) -> dict:
+    """Pull DB pool and query figures out of the app's /metrics output."""
+    db = {"pool_checkout": {}, "pool_timeouts": 0.0, "queries": {}}
+    for family in text_string_to_metric_families(text):
+        for sample in family.samples:
+            if sample.name == "db_pool_checkout_seconds_sum":
+                db["pool_checkout"]["sum_s"] = round(sample.value, 4)
+            elif sample.name == "db_pool_checkout_seconds_count":
+                db["pool_checkout"]["count"] = int(sample.value)
+            elif sample.name == "db_pool_timeouts_total":
+                db["pool_timeouts"] += sample.value
+            elif sample.name == "db_query_duration_seconds_sum":
+                db["queries"].setdefault(sample.labels["statement"], {})["sum_s"] = round(sample.value, 4)
+            elif sample.name == "db_query_duration_seconds_count":
+                db["queries"].setdefault(sample.labels["statement"], {})["count"] = int(sample.value)
+    checkout = db["pool_checkout"]
+    if checkout.get("count"):
+        checkout["mean_ms"] = round(checkout["sum_s"] / checkout["count"] * 1000, 3)
+    for stats in db["queries"].values():
+        if stats.get("count"):
+            stats["mean_ms"] = round(stats["sum_s"] / stats["count"] * 1000, 3)
+    return db
+
+
+async def scrape_commits(client: httpx.AsyncClient) -> float:
+    text = (await client.get("/metrics")).text
+    return sum(
+        sample.value for family in text_string_to_metric_families(text) for sample in family.samples
+        if sample.name == "db_commits_total"
+    )
+
+
+async def fund_devices(client: httpx.AsyncClient, devices: List[str], credits_per_device: int) -> None:
+    # "standard" adds 10 checks per webhook
+    for device_id in devices:
+        for _ in range(max(1, -(-credits_per_device // 10))):
+            body, headers = signed_webhook(WEBHOOK_SECRET, device_id)
+            response = await client.post("/api/v1/webhook/creem", content=body, headers=headers)
+            response.raise_for_status()
+    # Webhooks are granted in the background; wait until the last device has its tokens
+    for _ in range(200):
+        response = await client.get("/api/v1/tokens/balance", headers={"X-Device-Id": devices[-1]})
+        if response.json()["paid_tokens"] >= credits_per_device:
+            return
+        await asyncio.sleep(0.05)
+    raise RuntimeError("Webhook token grants did not complete")
+
+
+async def run(args) -> dict:
+    llm_port, creem_port, app_port = free_port(), free_port(), free_port()
+    llm_config = FakeLLMConfig(
+        latency=args.llm_latency, jitter=args.llm_jitter, error_rate=args.llm_error_rate,
+        rate_limit_rate=args.llm_rate_limit_rate, malformed_rate=args.llm_malformed_rate, seed=args.seed
+    )
+    rng = random.Random(args.seed)
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    workdir = Path(tempfile.mkdtemp(prefix="factcheck-bench-"))
+    env = {
+        **os.environ,
+        "DATABASE_URL": args.database_url or f"sqlite+aiosqlite:///{workdir / 'bench.db'}",
+        "LLM_PROXY_URL": f"http://127.0.0.1:{llm_port}",
+        "LLM_PROXY_KEY": "bench",
+        "CREEM_API_URL": f"http://127.0.0.1:{creem_port}",
+        "CREEM_API_KEY": "bench",
+        "CREEM_WEBHOOK_SECRET": WEBHOOK_SECRET,
+        "CREEM_PRODUCT_IDS": json.dumps({"basic": "prod_basic", "standard": "prod_standard"}),
+        # Every simulated device comes from 127.0.0.1; per-IP limits would throttle the whole run
+        "RATE_LIMIT_ENABLED": "true" if args.rate_limit else "false",
+    }
+
+    devices = [f"bench-{uuid.uuid4().hex[:12]}" for _ in range(args.devices)]
+    # Distinct claims keep the result cache out of the picture unless --repeat-ratio says otherwise
+    repeated = [f"Benchmark claim number {i} about a miracle cure." for i in range(20)]
+
+    def claim(i: int) -> str:
+        if rng.random() < args.repeat_ratio:
+            return rng.choice(repeated)
+        return f"Benchmark claim {uuid.uuid4().hex} says coffee cures everything."
+
+    fake_llm = create_fake_llm(llm_config)
+    fake_creem = create_fake_creem(args.creem_latency)
+    results: Dict[str, dict] = {}
+    async with UpstreamServer(fake_llm, llm_port), UpstreamServer(fake_creem, creem_port):
+        with AppProcess(app_port, env) as app_process:
+            await app_process.wait_ready()
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", limits=limits,
+                                         timeout=args.timeout) as client:
+                check_requests = sum(args.requests for name in scenarios if name.startswith("check"))
+                await fund_devices(client, devices, check_requests // len(devices) + 1)
+                print(f"Import {app_process.import_s:.2f}s, ready {app_process.ready_s:.2f}s after launch, "
+                      f"{len(devices)} devices funded; "
+                      f"concurrency {args.concurrency}, {args.requests} requests per scenario")
+
+                senders = {
+                    "check": lambda i: client.post(
+                        "/api/v1/check", json={"claim": claim(i), "language": "en"},
+                        headers={"X-Device-Id": devices[i % len(devices)]}
+                    ),
+                    "check_stream": lambda i: _drain_stream(
+                        client, {"claim": claim(i), "language": "en"}, devices[i % len(devices)]
+                    ),
+                    "balance": lambda i: client.get(
+                        "/api/v1/tokens/balance", headers={"X-Device-Id": devices[i % len(devices)]}
+                    ),
+                    "webhook": lambda i: _post_webhook(client, devices[i % len(devices)]),
+                    "checkout": lambda i: client.post("/api/v1/checkout/create", json={
+                        "product_id": "basic", "device_id": devices[i % len(devices)],
+                        "success_url": "https://example.test/ok", "cancel_url": "https://example.test/cancel"
+                    }),
+                }
+                for name in scenarios:
+                    commits = await scrape_commits(client)
+                    results[name] = await run_scenario(name, senders[name], args.requests, args.concurrency)
+                    # Let buffered (write-behind) rows of this scenario be flushed before counting
+                    await asyncio.sleep(args.settle)
+                    per_request = (await scrape_commits(client) - commits) / args.requests
+                    results[name]["db_commits_per_request"] = round(per_request, 3)
+                    results[name]["db_commits_per_s"] = round(per_request * results[name]["throughput_rps"], 1)
+                    print(f"  {'':<13} {per_request:>8.2f} commits/request, "
+                          f"{results[name]['db_commits_per_s']:.1f} commits/s")
+
+                metrics = (await client.get("/metrics")).text
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "concurrency": args.concurrency,
+            "requests_per_scenario": args.requests,
+            "devices": args.devices,
+            "repeat_ratio": args.repeat_ratio,
+            "database": "custom" if args.database_url else "sqlite",
+            "fake_llm": vars(llm_config),
+            "creem_latency_s": args.creem_latency,
+            "app_import_s": round(app_process.import_s, 3),
+            "app_listening_s": round(app_process.listening_s, 3),
+            "app_ready_s": round(app_process.ready_s, 3),
+            "app_startup_phases": app_process.startup_phases,
+            "llm_requests_served": fake_llm.state.requests,
+        },
+        "scenarios": results,
+        "db": scrape_db_metrics(metrics),
+    }
+
+
+async def _drain_stream(client: httpx.AsyncClient, payload: dict, device_id: str) -> httpx.Response:
+    async with client.stream("POST", "/api/v1/check/stream", json=payload,
+                             headers={"X-Device-Id": device_id}) as response:
+        async for _ in response.aiter_bytes():
+            pass
+    return response
+
+
+async def _post_webhook(client: httpx.AsyncClient, device_id: str) -> httpx.Response:
+    body, headers = signed_webhook(WEBHOOK_SECRET, device_id, product_sku="basic", amount_cents=799)
+    return await client.post("/api/v1/webhook/creem", content=body, headers=headers)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """Scenario metrics that got worse than the baseline by more than `threshold` (a fraction)."""
+    regressions = []
+    print(f"\nCompared with {baseline['meta'].get('git_commit')} ({baseline['meta'].get('timestamp')}):")
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        for key, worse in REGRESSION_KEYS.items():
+            old, new = before.get(key), result.get(key)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = change > threshold if worse == "higher" else change < -threshold
+            flag = "  REGRESSION" if regressed else ""
+            print(f"  {name:<13} {key:<15} {old:>10.2f} -> {new:>10.2f} ({change:+.1%}){flag}")
+            if regressed:
+                regressions.append(f"{name}.{key}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="check,balance,webhook", help=f"any of {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--repeat-ratio", type=float, default=0.0, help="share of checks reusing a known claim")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-jitter", type=float, default=0.2)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--llm-malformed-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", action="store_true", help="keep per-device/IP rate limits enabled")
+    parser.add_argument("--creem-latency", type=float, default=0.05)
+    parser.add_argument("--database-url", default="", help="run against this database instead of temp SQLite")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--settle", type=float, default=1.5,
+                        help="seconds to wait after each scenario before counting its database commits")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results JSON here (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    output = Path(args.output) if args.output else (
+        Path(__file__).parent / "results" / f"loadtest-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2) + "\n")
+    print(f"\nDB pool checkout: {results['db']['pool_checkout']}, timeouts {results['db']['pool_timeouts']:.0f}")
+    print(f"Results written to {output}")
+
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,11 @@ import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
 from app.main import app
 from app.database import Base, engine
+from app.services.balance_cache import balance_cache
+from app.services.claim_index import claim_index
+from app.services.rate_limit import device_limiter, ip_limiter
+from app.services.result_cache import result_cache
+from app.services.write_behind import write_behind
 
 
 @pytest_asyncio.fixture
@@ -19,5 +24,11 @@ async def setup_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     yield
+    result_cache.clear()
+    balance_cache.clear()
+    claim_index.clear()
+    device_limiter.clear()
+    ip_limiter.clear()
+    write_behind.clear()
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
@@ -0,0 +1,97 @@
+import json
+import pytest
+from unittest.mock import patch
+from starlette.requests import Request
+from app.api.v1.fact_check import BatchCheckRequest, check_claims_batch
+from app.services.token_service import add_tokens, get_token_balance
+
+MOCK_RESULT = {
+    "credibility_score": 50,
+    "credibility_level": "medium",
+    "summary": "Test summary",
+    "key_points": [],
+    "contradictions": [],
+    "source_analysis": {
+        "likely_origin": "news",
+        "spread_pattern": "organic",
+        "red_flags": []
+    },
+    "disclaimer": "This is a test disclaimer"
+}
+
+
+async def fake_analyze(claim, language):
+    if "fail" in claim:
+        raise Exception("LLM API error: 503")
+    return {**MOCK_RESULT, "summary": claim}
+
+
+def _claims(*texts):
+    return [{"claim": text, "language": "en"} for text in texts]
+
+
+@pytest.mark.asyncio
+async def test_batch_refunds_failed_items(client):
+    await add_tokens("batch-device", 3, "basic", "txn_batch_1")
+    
+    with patch("app.services.fact_check_service.analyze_claim", new=fake_analyze):
+        response = await client.post(
+            "/api/v1/check/batch",
+            json={"claims": _claims("first claim to check", "this one will fail", "third claim to check")},
+            headers={"X-Device-Id": "batch-device"}
+        )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["status"] for item in data["results"]] == ["ok", "error", "ok"]
+    assert data["results"][0]["result"]["summary"] == "first claim to check"
+    assert data["tokens_charged"] == 2
+    assert await get_token_balance("batch-device") == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_requires_tokens_for_every_claim(client):
+    # A fresh device only has its single free trial
+    with patch("app.services.fact_check_service.analyze_claim", new=fake_analyze):
+        response = await client.post(
+            "/api/v1/check/batch",
+            json={"claims": _claims("first claim to check", "second claim to check")},
+            headers={"X-Device-Id": "poor-device"}
+        )
+    
+    assert response.status_code == 402
+    assert response.json()["detail"]["code"] == "payment_required"
+    trial = await client.get("/api/v1/trial-status", headers={"X-Device-Id": "poor-device"})
+    assert trial.json()["has_free_trial"] is True
+
+
+@pytest.mark.asyncio
+async def test_batch_ndjson_stream(client):
+    await add_tokens("stream-device", 2, "basic", "txn_batch_2")
+    
+    with patch("app.services.fact_check_service.analyze_claim", new=fake_analyze):
+        response = await client.post(
+            "/api/v1/check/batch",
+            json={"claims": _claims("first claim to check", "this one will fail"), "stream": True},
+            headers={"X-Device-Id": "stream-device"}
+        )
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    items = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda item: item["index"])
+    assert [item["status"] for item in items] == ["ok", "error"]
+    assert await get_token_balance("stream-device") == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_stream_refunded_when_client_leaves_before_first_line(client):
+    await add_tokens("early-leaver", 2, "basic", "txn_batch_3")
+    request = BatchCheckRequest(claims=_claims("first claim to check", "second claim to check"), stream=True)
+    http_request = Request({"type": "http", "method": "POST", "path": "/", "headers": [], "client": ("203.0.113.9", 1)})
+    
+    with patch("app.services.fact_check_service.analyze_claim", new=fake_analyze):
+        response = await check_claims_batch(request, http_request, x_device_id="early-leaver")
+        assert await get_token_balance("early-leaver") == 0
+        await response.background()  # the body was never iterated
+    
+    assert await get_token_balance("early-leaver") == 2
@@ -1,5 +1,11 @@
 import pytest
 from unittest.mock import patch, AsyncMock
+from starlette.requests import Request
+from app.api.v1.fact_check import check_claim_stream
+from app.schemas.fact_check import ClaimRequest
+from app.services.rate_limit import device_limiter
+from app.services.resilience import CircuitOpenError
+from app.services.token_service import add_tokens, get_token_balance
 
 
 @pytest.mark.asyncio
@@ -37,7 +43,7 @@ async def test_check_claim_success(client):
     }
     
     with patch("app.api.v1.fact_check.check_and_consume_token", new=AsyncMock(return_value=(True, "free_trial"))):
-        with patch("app.api.v1.fact_check.analyze_claim", new=AsyncMock(return_value=mock_result)):
+        with patch("app.services.fact_check_service.analyze_claim", new=AsyncMock(return_value=mock_result)):
             response = await client.post(
                 "/api/v1/check",
                 json={
@@ -87,3 +93,198 @@ async def test_trial_status(client):
     data = response.json()
     assert "has_free_trial" in data
     assert "remaining_checks" in data
+
+
+@pytest.mark.asyncio
+async def test_check_claim_served_from_cache(client):
+    """A repeated claim (modulo case and whitespace) is answered from the result cache."""
+    mock_result = {
+        "credibility_score": 20,
+        "credibility_level": "low",
+        "summary": "Cached summary",
+        "key_points": [],
+        "contradictions": [],
+        "source_analysis": {
+            "likely_origin": "social media",
+            "spread_pattern": "viral",
+            "red_flags": []
+        },
+        "disclaimer": "This is a test disclaimer"
+    }
+    analyze = AsyncMock(return_value=mock_result)
+    
+    with patch("app.api.v1.fact_check.check_and_consume_token", new=AsyncMock(return_value=(True, "paid_token"))):
+        with patch("app.services.fact_check_service.analyze_claim", new=analyze):
+            first = await client.post(
+                "/api/v1/check",
+                json={"claim": "The moon landing was filmed in a studio", "language": "en"},
+                headers={"X-Device-Id": "test-device"}
+            )
+            second = await client.post(
+                "/api/v1/check",
+                json={"claim": "  the MOON landing was filmed   in a studio ", "language": "en"},
+                headers={"X-Device-Id": "test-device"}
+            )
+    
+    assert first.status_code == 200
+    assert first.json()["cached"] is False
+    assert second.status_code == 200
+    assert second.json()["cached"] is True
+    assert second.json()["summary"] == "Cached summary"
+    assert analyze.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_check_claim_near_duplicate_served_from_cache(client):
+    """A lightly reworded copy of an analyzed claim reuses its result."""
+    mock_result = {
+        "credibility_score": 10,
+        "credibility_level": "very_low",
+        "summary": "Prior summary",
+        "key_points": [],
+        "contradictions": [],
+        "source_analysis": {
+            "likely_origin": "social media",
+            "spread_pattern": "viral",
+            "red_flags": []
+        },
+        "disclaimer": "This is a test disclaimer"
+    }
+    analyze = AsyncMock(return_value=mock_result)
+    
+    with patch("app.api.v1.fact_check.check_and_consume_token", new=AsyncMock(return_value=(True, "paid_token"))):
+        with patch("app.services.fact_check_service.analyze_claim", new=analyze):
+            first = await client.post(
+                "/api/v1/check",
+                json={"claim": "5G towers are spreading the virus", "language": "en"},
+                headers={"X-Device-Id": "test-device"}
+            )
+            second = await client.post(
+                "/api/v1/check",
+                json={"claim": "BREAKING: 5G towers are spreading the virus!!! 😱", "language": "en"},
+                headers={"X-Device-Id": "test-device"}
+            )
+    
+    assert first.json()["cached"] is False
+    assert second.status_code == 200
+    assert second.json()["cached"] is True
+    assert second.json()["summary"] == "Prior summary"
+    assert analyze.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_check_claim_failure_refunds_token(client):
+    """A failed analysis gives the consumed free trial back."""
+    with patch("app.services.fact_check_service.analyze_claim", new=AsyncMock(side_effect=Exception("LLM API error: 503"))):
+        response = await client.post(
+            "/api/v1/check",
+            json={"claim": "This is a test claim that is long enough to pass validation", "language": "en"},
+            headers={"X-Device-Id": "refund-device"}
+        )
+    assert response.status_code == 500
+    
+    trial = await client.get("/api/v1/trial-status", headers={"X-Device-Id": "refund-device"})
+    assert trial.json() == {"has_free_trial": True, "remaining_checks": 1}
+
+
+@pytest.mark.asyncio
+async def test_check_claim_stream(client):
+    """The streaming endpoint emits fields as they complete, then the validated result."""
+    content = (
+        '{"credibility_score": 80, "credibility_level": "high", "summary": "Plausible", '
+        '"key_points": [{"point": "p", "assessment": "likely_true", "explanation": "e"}], '
+        '"contradictions": [], '
+        '"source_analysis": {"likely_origin": "news", "spread_pattern": "organic", "red_flags": []}}'
+    )
+    
+    async def fake_stream(claim, language, info=None):
+        for start in range(0, len(content), 7):
+            yield content[start:start + 7]
+    
+    with patch("app.api.v1.fact_check.check_and_consume_token", new=AsyncMock(return_value=(True, "free_trial"))):
+        with patch("app.services.fact_check_service.stream_claim_analysis", new=fake_stream):
+            response = await client.post(
+                "/api/v1/check/stream",
+                json={"claim": "This is a test claim that is long enough to pass validation", "language": "en"},
+                headers={"X-Device-Id": "test-device"}
+            )
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n")[0][len("event: "):] for block in response.text.strip().split("\n\n")]
+    assert events == [
+        "credibility_score", "credibility_level", "summary", "key_point",
+        "contradictions", "source_analysis", "result"
+    ]
+    assert '"disclaimer"' in response.text.strip().split("\n\n")[-1]
+
+
+@pytest.mark.asyncio
+async def test_check_claim_circuit_open(client):
+    """While the LLM circuit is open the check fails fast with 503 and the token is refunded."""
+    refund = AsyncMock()
+    with patch("app.api.v1.fact_check.check_and_consume_token", new=AsyncMock(return_value=(True, "paid_token"))):
+        with patch("app.api.v1.fact_check.refund_token", new=refund):
+            with patch("app.services.fact_check_service.analyze_claim",
+                       new=AsyncMock(side_effect=CircuitOpenError("llm", 12.4))):
+                response = await client.post(
+                    "/api/v1/check",
+                    json={"claim": "The earth is flat and this is a long claim", "language": "en"},
+                    headers={"X-Device-Id": "test-device"}
+                )
+    
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "12"
+    refund.assert_awaited_once_with("test-device", "paid_token")
+
+
+@pytest.mark.asyncio
+async def test_check_claim_rate_limited_per_device(client, monkeypatch):
+    """A device over its request budget gets 429 before any token is consumed."""
+    monkeypatch.setattr(device_limiter, "burst", 2)
+    consume = AsyncMock(return_value=(False, "No tokens remaining. Please purchase more."))
+    with patch("app.api.v1.fact_check.check_and_consume_token", new=consume):
+        statuses = []
+        for device in ("flood-device", "flood-device", "flood-device", "other-device"):
+            response = await client.post(
+                "/api/v1/check",
+                json={"claim": "The earth is flat and this is a long claim", "language": "en"},
+                headers={"X-Device-Id": device}
+            )
+            statuses.append(response.status_code)
+            if response.status_code == 429:
+                assert int(response.headers["Retry-After"]) >= 1
+                assert response.json()["detail"]["code"] == "rate_limited"
+    
+    assert statuses == [402, 402, 429, 402]
+    assert consume.await_count == 3
+
+
+def _request() -> Request:
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": [], "client": ("203.0.113.9", 1)})
+
+
+@pytest.mark.asyncio
+async def test_stream_refunds_when_client_leaves(client):
+    """A client gone before the stream starts, or before the result, gets its token back."""
+    await add_tokens("leaving-device", 2, "basic", "txn_leaving_1")
+    claim = ClaimRequest(claim="This is a test claim that is long enough to pass validation", language="en")
+    
+    async def fake_stream(claim, language, info=None):
+        yield '{"credibility_score": 80, '
+        yield '"credibility_level": "high"'
+    
+    with patch("app.services.fact_check_service.stream_claim_analysis", new=fake_stream):
+        # Disconnected before the body was ever iterated: only the background task runs
+        response = await check_claim_stream(claim, _request(), x_device_id="leaving-device")
+        assert await get_token_balance("leaving-device") == 1
+        await response.background()
+        assert await get_token_balance("leaving-device") == 2
+        
+        # Disconnected after the first event
+        response = await check_claim_stream(claim, _request(), x_device_id="leaving-device")
+        body = response.body_iterator
+        assert (await body.__anext__()).startswith("event: credibility_score")
+        await body.aclose()
+        await response.background()
+        assert await get_token_balance("leaving-device") == 2
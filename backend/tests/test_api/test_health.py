@@ -1,4 +1,8 @@
 import pytest
+from unittest.mock import AsyncMock
+from app.services.http_client import http_clients
+from app.services.result_cache import make_cache_key, result_cache
+from app.services.startup import startup
 
 
 @pytest.mark.asyncio
@@ -8,3 +12,41 @@ async def test_health_check(client):
     data = response.json()
     assert data["status"] == "healthy"
     assert data["service"] == "ai-fact-checker"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", ["/health", "/api/v1/products"])
+async def test_static_responses_revalidate_with_etag(client, path):
+    response = await client.get(path)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"]
+
+    revalidated = await client.get(path, headers={"If-None-Match": f'"stale", W/{etag}'})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["etag"] == etag
+
+    changed = await client.get(path, headers={"If-None-Match": '"stale"'})
+    assert changed.status_code == 200
+    assert changed.json() == response.json()
+
+
+@pytest.mark.asyncio
+async def test_ready_only_after_warmup(client, monkeypatch):
+    monkeypatch.setattr(startup, "warm", False)
+    monkeypatch.setattr(http_clients, "warm", AsyncMock(return_value=True))
+    assert (await client.get("/livez")).status_code == 200
+
+    response = await client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["checks"] == {"warmup": "running", "database": "ok", "llm": "ok"}
+
+    await result_cache.set(make_cache_key("A claim checked before the restart", "en"), {"n": 1}, "en")
+    result_cache.clear()
+    await startup.warm_up()
+    assert len(result_cache) == 1  # loaded back into memory
+
+    response = await client.get("/readyz")
+    assert response.status_code == 200
+    assert set(response.json()["startup"]) >= {"claim_index", "result_cache", "llm_connection", "ready"}
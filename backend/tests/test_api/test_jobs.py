@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import hmac
+import json
+from datetime import timedelta
+import httpx
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, patch
+from app.config import Settings
+from app.database import get_db_session
+from app.models.job import FactCheckJob
+from app.services.job_queue import _utcnow, callback_allowed, job_queue
+
+MOCK_RESULT = {
+    "credibility_score": 10,
+    "credibility_level": "low",
+    "summary": "Debunked",
+    "key_points": [],
+    "contradictions": ["Contradicts official records"],
+    "source_analysis": {
+        "likely_origin": "social media",
+        "spread_pattern": "viral",
+        "red_flags": ["no source"]
+    },
+    "disclaimer": "This is a test disclaimer"
+}
+
+CLAIM = {"claim": "This is a test claim that is long enough to pass validation", "language": "en"}
+
+
+@pytest_asyncio.fixture
+async def workers():
+    await job_queue.start(workers=2)
+    yield job_queue
+    await job_queue.stop()
+
+
+async def _wait_finished(client, job_id):
+    for _ in range(100):
+        response = await client.get(f"/api/v1/jobs/{job_id}")
+        if response.json()["status"] in ("succeeded", "failed"):
+            return response.json()
+        await asyncio.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+@pytest.mark.asyncio
+async def test_job_runs_in_background(client, workers):
+    with patch("app.services.fact_check_service.analyze_claim", new=AsyncMock(return_value=MOCK_RESULT)):
+        response = await client.post("/api/v1/jobs", json=CLAIM, headers={"X-Device-Id": "job-device"})
+        assert response.status_code == 202
+        assert response.json()["status"] == "queued"
+        
+        job = await _wait_finished(client, response.json()["job_id"])
+    
+    assert job["status"] == "succeeded"
+    assert job["result"]["summary"] == "Debunked"
+    assert job["finished_at"] is not None
+
+
+@pytest.mark.asyncio
+async def test_failed_job_refunds_and_calls_back(client, workers):
+    callbacks, callback_headers = [], []
+    
+    def handler(request):
+        callbacks.append(json.loads(request.content))
+        callback_headers.append(request.headers)
+        return httpx.Response(200)
+    
+    callback_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    with patch("app.services.fact_check_service.analyze_claim", new=AsyncMock(side_effect=Exception("LLM API error: 500"))):
+        with patch("app.services.job_queue.get_http_client", return_value=callback_client), \
+                patch("app.services.job_queue._resolve", new=AsyncMock(return_value=["93.184.215.14"])):
+            response = await client.post(
+                "/api/v1/jobs",
+                json={**CLAIM, "callback_url": "https://partner.example/hooks/facts"},
+                headers={"X-Device-Id": "job-fail-device"}
+            )
+            job = await _wait_finished(client, response.json()["job_id"])
+            for _ in range(100):
+                if callbacks:
+                    break
+                await asyncio.sleep(0.01)
+    
+    assert job["status"] == "failed"
+    assert "X-Signature" not in callback_headers[0]
+    assert callbacks == [{"job_id": job["job_id"], "status": "failed", "error": job["error"]}]
+    trial = await client.get("/api/v1/trial-status", headers={"X-Device-Id": "job-fail-device"})
+    assert trial.json()["has_free_trial"] is True
+
+
+@pytest.mark.asyncio
+async def test_unfinished_jobs_resume_on_start(client):
+    async with get_db_session() as session:
+        session.add(FactCheckJob(
+            id="interrupted-job", device_id="job-device", claim=CLAIM["claim"], language="en",
+            token_kind="free_trial", status="running", attempts=1
+        ))
+        await session.commit()
+    
+    with patch("app.services.fact_check_service.analyze_claim", new=AsyncMock(return_value=MOCK_RESULT)):
+        await job_queue.start(workers=1)
+        try:
+            job = await _wait_finished(client, "interrupted-job")
+        finally:
+            await job_queue.stop()
+    
+    assert job["status"] == "succeeded"
+
+
+@pytest.mark.asyncio
+async def test_unknown_job(client):
+    response = await client.get("/api/v1/jobs/does-not-exist")
+    assert response.status_code == 404
+
+
+def _job(job_id, **values):
+    return FactCheckJob(
+        id=job_id, device_id="job-device", claim=CLAIM["claim"], language="en", token_kind="free_trial",
+        attempts=0, **values
+    )
+
+
+@pytest.mark.asyncio
+async def test_job_is_claimed_once():
+    async with get_db_session() as session:
+        session.add(_job("contended-job", status="queued"))
+        await session.commit()
+    
+    claims = await asyncio.gather(*[job_queue._claim("contended-job") for _ in range(5)])
+    assert sum(claim is not None for claim in claims) == 1
+    assert (await job_queue.get("contended-job")).attempts == 1
+
+
+@pytest.mark.asyncio
+async def test_only_expired_leases_are_resumed(client):
+    async with get_db_session() as session:
+        session.add(_job("held-job", status="running", lease_expires_at=_utcnow() + timedelta(minutes=5)))
+        session.add(_job("abandoned-job", status="running", lease_expires_at=_utcnow() - timedelta(seconds=1)))
+        await session.commit()
+    
+    with patch("app.services.fact_check_service.analyze_claim", new=AsyncMock(return_value=MOCK_RESULT)):
+        await job_queue.start(workers=1)
+        try:
+            assert (await _wait_finished(client, "abandoned-job"))["status"] == "succeeded"
+        finally:
+            await job_queue.stop()
+    assert (await job_queue.get("held-job")).status == "running"
+
+
+@pytest.mark.asyncio
+async def test_taken_over_job_is_refunded_once():
+    async with get_db_session() as session:
+        session.add(_job("slow-job", status="queued"))
+        await session.commit()
+    
+    first = await job_queue._claim("slow-job")
+    await job_queue._update("slow-job", lease_expires_at=_utcnow() - timedelta(seconds=1))
+    second = await job_queue._claim("slow-job")
+    assert first and second and first != second
+    
+    assert await job_queue._finish("slow-job", first, status="failed", error="late") is False
+    assert await job_queue._finish("slow-job", second, status="failed", error="on time") is True
+    assert (await job_queue.get("slow-job")).error == "on time"
+
+
+@pytest.mark.asyncio
+async def test_callback_must_be_https(client):
+    response = await client.post(
+        "/api/v1/jobs", json={**CLAIM, "callback_url": "http://partner.example/hook"}, headers={"X-Device-Id": "d"}
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("addresses", [["127.0.0.1"], ["10.0.0.5"], ["169.254.169.254"], ["93.184.215.14", "::1"]])
+async def test_callbacks_to_internal_addresses_are_refused(addresses):
+    with patch("app.services.job_queue._resolve", new=AsyncMock(return_value=addresses)):
+        assert await callback_allowed("https://partner.example/hook") is False
+
+
+@pytest.mark.asyncio
+async def test_callback_is_signed(monkeypatch):
+    monkeypatch.setattr("app.services.job_queue.get_settings", lambda: Settings(JOB_CALLBACK_SECRET="s3cret"))
+    requests = []
+    
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200)
+    
+    callback_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    with patch("app.services.job_queue.get_http_client", return_value=callback_client), \
+            patch("app.services.job_queue._resolve", new=AsyncMock(return_value=["93.184.215.14"])):
+        assert await job_queue._deliver_callback("https://partner.example/hook", {"job_id": "j", "status": "failed"})
+    
+    [request] = requests
+    expected = hmac.new(b"s3cret", request.content, hashlib.sha256).hexdigest()
+    assert request.headers["X-Signature"] == expected
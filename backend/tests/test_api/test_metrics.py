@@ -0,0 +1,15 @@
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_requests_are_labelled_by_route_template(client):
+    await client.get("/api/v1/jobs/some-job-id")
+    await client.get("/no/such/path")
+    
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    body = response.text
+    assert 'endpoint="/api/v1/jobs/{job_id}",method="GET",status="404"' in body
+    assert 'endpoint="unmatched",method="GET",status="404"' in body
+    assert "some-job-id" not in body
+    assert "db_query_duration_seconds_bucket" in body
@@ -0,0 +1,96 @@
+import hashlib
+import hmac
+import json
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, patch
+from sqlalchemy import func, select
+from app.config import get_settings
+from app.database import get_db_session, get_write_session
+from app.models.token import PaymentTransaction
+from app.models.webhook import WebhookEvent
+from app.services.token_service import get_token_balance, grant_purchase
+from app.services.webhook_processor import webhook_processor
+
+
+def _event(event_id, transaction_id="txn_hook_1", device_id="hook-device", sku="basic"):
+    return json.dumps({
+        "id": event_id,
+        "type": "checkout.completed",
+        "object": {
+            "id": transaction_id,
+            "amount": 799,
+            "metadata": {"device_id": device_id, "product_sku": sku}
+        }
+    }).encode()
+
+
+@pytest_asyncio.fixture
+async def workers():
+    await webhook_processor.start(workers=1)
+    yield webhook_processor
+    await webhook_processor.stop()
+
+
+async def _status(event_id):
+    async with get_db_session() as session:
+        return (await session.get(WebhookEvent, event_id)).status
+
+
+@pytest.mark.asyncio
+async def test_webhook_is_acknowledged_then_processed(client, workers):
+    response = await client.post("/api/v1/webhook/creem", content=_event("evt_1"))
+    assert response.status_code == 200
+
+    await workers.join()
+    assert await _status("evt_1") == "processed"
+    assert await get_token_balance("hook-device") == 3
+
+
+@pytest.mark.asyncio
+async def test_redelivered_webhook_grants_tokens_once(client, workers):
+    for event_id in ("evt_1", "evt_1", "evt_2"):  # same delivery twice, then a new event for the same purchase
+        response = await client.post("/api/v1/webhook/creem", content=_event(event_id))
+        assert response.status_code == 200
+    await workers.join()
+
+    assert await get_token_balance("hook-device") == 3
+    async with get_db_session() as session:
+        count = await session.scalar(select(func.count()).select_from(PaymentTransaction))
+    assert count == 1
+
+
+@pytest.mark.asyncio
+async def test_grant_purchase_is_idempotent():
+    for expected in (True, False):
+        async with get_write_session() as session:
+            assert await grant_purchase(session, "grant-device", 10, "standard", "txn_grant_1", 1999) is expected
+            await session.commit()
+    assert await get_token_balance("grant-device") == 10
+
+
+@pytest.mark.asyncio
+async def test_webhook_signature_required_when_secret_set(client, monkeypatch):
+    monkeypatch.setattr(get_settings(), "CREEM_WEBHOOK_SECRET", "whsec")
+    body = _event("evt_signed")
+
+    unsigned = await client.post("/api/v1/webhook/creem", content=body)
+    assert unsigned.status_code == 401
+
+    signature = hmac.new(b"whsec", body, hashlib.sha256).hexdigest()
+    signed = await client.post("/api/v1/webhook/creem", content=body, headers={"creem-signature": signature})
+    assert signed.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_failed_event_can_be_replayed(client, monkeypatch):
+    monkeypatch.setattr(get_settings(), "WEBHOOK_MAX_ATTEMPTS", 1)
+    await client.post("/api/v1/webhook/creem", content=_event("evt_fail"))
+
+    failing = AsyncMock(side_effect=RuntimeError("database is locked"))
+    with patch("app.services.webhook_processor.grant_purchase", new=failing):
+        assert await webhook_processor.process("evt_fail") == "failed"
+    assert await get_token_balance("hook-device") == 0
+
+    assert await webhook_processor.replay() == {"processed": 1}
+    assert await get_token_balance("hook-device") == 3
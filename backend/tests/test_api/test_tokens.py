@@ -0,0 +1,32 @@
+import pytest
+from unittest.mock import patch
+from app.services.token_service import add_tokens, check_and_consume_token
+
+
+@pytest.mark.asyncio
+async def test_balance_for_new_device(client):
+    response = await client.get("/api/v1/tokens/balance", headers={"X-Device-Id": "fresh-device"})
+    assert response.status_code == 200
+    assert response.json() == {
+        "device_id": "fresh-device",
+        "paid_tokens": 0,
+        "free_trial_remaining": 1,
+        "total_available": 1
+    }
+
+
+@pytest.mark.asyncio
+async def test_balance_is_written_through_on_consume(client):
+    await add_tokens("poll-device", 3, "basic", "txn_poll_1")
+    first = await client.get("/api/v1/tokens/balance", headers={"X-Device-Id": "poll-device"})
+    assert first.json()["paid_tokens"] == 3
+    
+    await check_and_consume_token("poll-device")
+    
+    # Served from the cache, already reflecting the consumed token
+    with patch("app.services.token_service.get_db_session", side_effect=AssertionError("no DB read expected")):
+        second = await client.get("/api/v1/tokens/balance", headers={"X-Device-Id": "poll-device"})
+        trial = await client.get("/api/v1/trial-status", headers={"X-Device-Id": "poll-device"})
+    assert second.json()["paid_tokens"] == 2
+    assert second.json()["total_available"] == 3
+    assert trial.json() == {"has_free_trial": True, "remaining_checks": 1}
@@ -0,0 +1,75 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.cli import build_parser, usage_report
+from app.services import accounting
+from app.services.accounting import ledger
+from app.services.llm_service import MODEL
+from app.services.write_behind import write_behind
+
+ANALYSIS = {"credibility_score": 35, "credibility_level": "low", "summary": "Not supported by evidence"}
+COMPLETION = {
+    "choices": [{"message": {"content": json.dumps(ANALYSIS)}}],
+    "usage": {"prompt_tokens": 700, "completion_tokens": 300, "prompt_tokens_details": {"cached_tokens": 512}}
+}
+CLAIM = "Drinking eight glasses of water a day is medically required"
+
+
+async def _consume_slowly(device_id):
+    await asyncio.sleep(0.01)
+    return True, "paid_token"
+
+
+@pytest.mark.asyncio
+async def test_check_requests_are_accounted(client):
+    await write_behind.start()
+    with patch("app.api.v1.fact_check.check_and_consume_token", new=_consume_slowly), \
+            patch("app.services.llm_service._complete", new=AsyncMock(return_value=COMPLETION)):
+        for _ in range(2):
+            response = await client.post(
+                "/api/v1/check", json={"claim": CLAIM, "language": "en"}, headers={"X-Device-Id": "ledger-device"}
+            )
+            assert response.status_code == 200
+
+    assert await ledger.summary() == []  # nothing is written on the request path
+    await write_behind.stop()
+
+    [row] = await ledger.summary(["device", "model", "language"])
+    assert row["device"] == "ledger-device" and row["model"] == MODEL and row["language"] == "en"
+    assert (row["requests"], row["claims"], row["cached_claims"], row["errors"]) == (2, 2, 1, 0)
+    assert (row["llm_calls"], row["prompt_tokens"], row["completion_tokens"], row["cached_prompt_tokens"]) == (
+        1, 700, 300, 512
+    )
+    assert row["avg_token_check_ms"] >= 10
+    assert row["avg_total_ms"] >= row["avg_token_check_ms"] + row["avg_llm_latency_ms"] / 2
+
+    assert await ledger.summary(["day"], device_id="other-device") == []
+
+
+@pytest.mark.asyncio
+async def test_batch_items_add_to_one_entry(client):
+    texts = [CLAIM, "Vitamin C cures the common cold within a day", "Cracking knuckles causes arthritis later in life"]
+    claims = [{"claim": text, "language": "de"} for text in texts]
+    with patch("app.api.v1.fact_check.reserve_tokens", new=AsyncMock(return_value={"paid_token": 3, "free_trial": 0})), \
+            patch("app.services.llm_service._complete", new=AsyncMock(return_value=COMPLETION)):
+        response = await client.post("/api/v1/check/batch", json={"claims": claims}, headers={"X-Device-Id": "batcher"})
+    assert response.json()["tokens_charged"] == 3
+
+    [row] = await ledger.summary(["endpoint", "language"])
+    assert (row["endpoint"], row["language"], row["requests"], row["claims"]) == ("batch", "de", 1, 3)
+    assert (row["llm_calls"], row["prompt_tokens"]) == (3, 2100)
+
+
+@pytest.mark.asyncio
+async def test_usage_report_command(capsys):
+    entry = accounting.begin("job", "cli-device", "fr")
+    accounting.record_llm_call("model-a", 1.5, 100, 50, None)
+    await ledger.submit(entry)
+
+    args = build_parser().parse_args(["usage-report", "--by", "model", "--since", "2000-01-01"])
+    assert await usage_report(args) == 0
+    row = json.loads(capsys.readouterr().out)
+    assert (row["model"], row["llm_calls"], row["completion_tokens"], row["avg_llm_latency_ms"]) == (
+        "model-a", 1, 50, 1500.0
+    )
@@ -0,0 +1,34 @@
+from app.services.balance_cache import BalanceCache
+
+
+def test_adjust_updates_cached_entry():
+    cache = BalanceCache(ttl=60, max_entries=10)
+    cache.fill("device", 5, 1, cache.sequence)
+    cache.adjust("device", paid=-1)
+    cache.adjust("device", trial=-1)
+    assert cache.get("device") == (4, 0)
+
+
+def test_fill_ignores_value_loaded_before_a_write():
+    cache = BalanceCache(ttl=60, max_entries=10)
+    sequence = cache.sequence  # a reader starts its query
+    cache.adjust("device", paid=-1)  # a consume commits meanwhile
+    cache.fill("device", 5, 1, sequence)  # the reader's now-stale result
+    assert cache.get("device") is None
+
+
+def test_invalidate_and_expiry():
+    cache = BalanceCache(ttl=60, max_entries=10)
+    cache.fill("device", 5, 1, cache.sequence)
+    cache.invalidate("device")
+    assert cache.get("device") is None
+    
+    expired = BalanceCache(ttl=0, max_entries=10)
+    expired.fill("device", 5, 1, expired.sequence)
+    assert expired.get("device") is None
+
+
+def test_disabled_cache_never_serves():
+    cache = BalanceCache(ttl=60, max_entries=10, enabled=False)
+    cache.fill("device", 5, 1, cache.sequence)
+    assert cache.get("device") is None
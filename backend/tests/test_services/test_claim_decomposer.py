@@ -0,0 +1,121 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import patch
+from app.config import get_settings
+from app.schemas.fact_check import FactCheckResult
+from app.services.accounting import RequestCost
+from app.services.claim_decomposer import merge_results, split_claim
+from app.services.fact_check_service import run_fact_check
+
+SENTENCES = [
+    "A new study shows that drinking coffee every morning doubles your lifespan.",
+    "The government has been hiding this result from the public since 1998.",
+    "Doctors in Sweden now prescribe three cups a day to all patients over fifty.",
+]
+
+
+def _analysis(score, point, origin="blog"):
+    return {
+        "credibility_score": score,
+        "credibility_level": "medium",
+        "summary": f"About: {point}",
+        "key_points": [{"point": point, "assessment": "uncertain", "explanation": ""}],
+        "contradictions": ["Shared contradiction"],
+        "source_analysis": {"likely_origin": origin, "spread_pattern": "viral", "red_flags": [origin]},
+        "disclaimer": "x",
+    }
+
+
+def test_short_claims_are_not_split():
+    assert split_claim(SENTENCES[0], min_chars=200, max_parts=6, min_part_chars=20) == [SENTENCES[0]]
+
+
+def test_split_by_sentence_joins_short_ones_and_drops_repeats():
+    claim = " ".join([SENTENCES[0], "Really.", SENTENCES[1], SENTENCES[0]])
+    assert split_claim(claim, min_chars=50, max_parts=6, min_part_chars=20) == [
+        SENTENCES[0], f"Really. {SENTENCES[1]}"
+    ]
+
+
+def test_split_groups_sentences_beyond_max_parts():
+    claim = " ".join(f"Report number {i} says the river flooded the old town again." for i in range(9))
+    parts = split_claim(claim, min_chars=50, max_parts=4, min_part_chars=20)
+    assert 1 < len(parts) <= 4
+    assert " ".join(parts) == claim
+
+
+def test_merge_results_weights_toward_weakest_part():
+    merged = merge_results(["a" * 10, "b" * 30], [_analysis(90, "A", "forum"), _analysis(10, "B", "tabloid")], "en")
+    # length-weighted mean 30, lowest 10
+    assert merged["credibility_score"] == 20
+    assert merged["credibility_level"] == "low"
+    assert [point["point"] for point in merged["key_points"]] == ["A", "B"]
+    assert merged["contradictions"] == ["Shared contradiction"]
+    assert merged["source_analysis"]["likely_origin"] == "tabloid"
+    assert merged["source_analysis"]["red_flags"] == ["forum", "tabloid"]
+    FactCheckResult(**merged)
+
+
+@pytest.mark.asyncio
+async def test_long_claim_checks_sub_claims_in_parallel_and_reuses_them(monkeypatch):
+    monkeypatch.setattr(get_settings(), "DECOMPOSE_ENABLED", True)
+    monkeypatch.setattr(get_settings(), "DECOMPOSE_MIN_CHARS", 100)
+    calls = []
+
+    async def analyze(claim, language):
+        calls.append(claim)
+        await asyncio.sleep(0.2)
+        return _analysis(60, claim)
+
+    with patch("app.services.fact_check_service.analyze_claim", new=analyze):
+        started = time.monotonic()
+        result = await run_fact_check(" ".join(SENTENCES), "en")
+        elapsed = time.monotonic() - started
+
+        assert sorted(calls) == sorted(SENTENCES)
+        assert elapsed < 0.4  # bounded by the slowest sub-claim, not their sum
+        assert result["sub_claims"] == 3 and not result["cached"]
+        assert len(result["key_points"]) == 3
+
+        # Another post repeating two of the sentences only analyzes the new one
+        other = " ".join([SENTENCES[2], "Pharmacies have started stocking coffee beans next to the vitamins.", SENTENCES[0]])
+        result = await run_fact_check(other, "en")
+        assert calls[3:] == ["Pharmacies have started stocking coffee beans next to the vitamins."]
+        assert result["sub_claims"] == 3
+
+        # The merged result is cached under the whole claim too
+        assert (await run_fact_check(" ".join(SENTENCES), "en"))["cached"]
+        assert len(calls) == 4
+
+
+@pytest.mark.asyncio
+async def test_long_claim_makes_at_most_max_parts_llm_calls(monkeypatch):
+    monkeypatch.setattr(get_settings(), "DECOMPOSE_ENABLED", True)
+    settings = get_settings()
+    topics = ["coffee", "vaccines", "tides", "bridges", "elections", "wheat", "volcanoes", "satellites"]
+    claim = " ".join(
+        f"Report {i} claims that {topics[i % 8]} were secretly changed in region {i} during the year {1900 + i}, "
+        f"according to an anonymous source quoted by several outlets."
+        for i in range(40)
+    )
+    assert len(claim) > 6 * settings.DECOMPOSE_MIN_CHARS
+    calls = []
+
+    async def analyze(part, language):
+        calls.append(part)
+        return {**_analysis(50, part[:40]), "model": "m"}
+
+    with patch("app.services.fact_check_service.analyze_claim", new=analyze):
+        result = await run_fact_check(claim, "en")
+
+    assert result["sub_claims"] == len(calls) <= settings.DECOMPOSE_MAX_PARTS
+    assert " ".join(sorted(calls, key=claim.index)) == claim
+
+
+def test_merged_models_split_back_into_names():
+    results = [{**_analysis(50, "A"), "model": "model-a"}, {**_analysis(50, "B"), "model": "model-b"}]
+    merged = merge_results(["a", "b"], results, "en")
+    entry = RequestCost("check", "device", "en")
+    entry.add_result(merged)
+    assert entry.models == {"model-a", "model-b"}
@@ -0,0 +1,47 @@
+import pytest
+from app.services.claim_index import ClaimIndex, claim_fingerprint, dedup_text
+from app.services.result_cache import make_cache_key
+
+CLAIM = "Drinking hot water every hour kills the coronavirus in your throat"
+
+
+def test_dedup_text_strips_noise():
+    assert dedup_text("BREAKING: Drinking hot water kills the virus!!! 🔥🔥") == "drinking hot water kills the virus"
+    assert claim_fingerprint("Just in — drinking hot water kills the virus 😱") == claim_fingerprint(
+        "drinking hot water kills the virus."
+    )
+
+
+def test_find_near_duplicates_per_language():
+    index = ClaimIndex(threshold=0.9, max_age=60, persistent=False)
+    key = make_cache_key(CLAIM, "en")
+    index.insert("en", claim_fingerprint(CLAIM), key)
+    
+    match = index.find("BREAKING: drinking hot water every hour KILLS the corona virus in your throat!!", "en")
+    assert match is not None
+    assert match[0] == key
+    assert match[1] >= 0.9
+    
+    assert index.find(CLAIM, "de") is None
+    assert index.find("The Eiffel Tower was sold twice by a con artist", "en") is None
+
+
+def test_insert_skips_already_indexed_key():
+    index = ClaimIndex(threshold=0.95, max_age=60, persistent=False)
+    key = make_cache_key(CLAIM, "en")
+    assert index.insert("en", claim_fingerprint(CLAIM), key) is True
+    assert index.insert("en", claim_fingerprint(CLAIM), key) is False
+    assert len(index) == 1
+
+
+@pytest.mark.asyncio
+async def test_load_rebuilds_from_database():
+    index = ClaimIndex(threshold=0.95, max_age=60, persistent=True)
+    claims = [f"Claim number {i} about the water supply" for i in range(50)]
+    for claim in claims:
+        await index.add(claim, "en", make_cache_key(claim, "en"))
+    
+    rebuilt = ClaimIndex(threshold=0.95, max_age=60, persistent=True)
+    assert await rebuilt.load() == 50
+    for claim in claims:
+        assert rebuilt.find(claim, "en") == (make_cache_key(claim, "en"), 1.0)
@@ -0,0 +1,66 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.cli import build_parser, ingest
+from app.services.claim_ingest import IngestProgress, ingest_claims, load_checkpoint, read_claims
+from app.services.result_cache import make_cache_key, result_cache
+
+ANALYSIS = {"credibility_score": 40, "credibility_level": "uncertain", "summary": "Mixed evidence"}
+
+
+def _write_jsonl(path, rows):
+    path.write_text("\n".join(row if isinstance(row, str) else json.dumps(row) for row in rows) + "\n")
+
+
+def test_read_claims_streams_jsonl_and_csv(tmp_path):
+    jsonl = tmp_path / "claims.jsonl"
+    _write_jsonl(jsonl, [
+        {"claim": "The moon landing was staged in a studio", "language": "de"},
+        "not json",
+        "",
+        {"claim": "short"},
+    ])
+    records = [(number, request and (request.claim, request.language)) for number, request in read_claims(str(jsonl))]
+    assert records == [(1, ("The moon landing was staged in a studio", "de")), (2, None), (3, None)]
+
+    table = tmp_path / "claims.csv"
+    table.write_text('title,lang\n"Coffee stunts growth, doctors say",\n')
+    records = list(read_claims(str(table), claim_field="title", language_field="lang", default_language="fr"))
+    assert [(r.claim, r.language) for _, r in records] == [("Coffee stunts growth, doctors say", "fr")]
+
+
+@pytest.mark.asyncio
+async def test_ingest_caches_results_and_skips_cached_claims(tmp_path):
+    claims = [f"Claim number {i} about public health policy" for i in range(6)]
+    path = tmp_path / "claims.jsonl"
+    _write_jsonl(path, [{"claim": claim} for claim in claims + claims[:2]] + ["{broken"])
+    checkpoint = str(tmp_path / "claims.checkpoint")
+
+    analyze = AsyncMock(return_value=ANALYSIS)
+    with patch("app.services.fact_check_service.analyze_claim", new=analyze):
+        progress = IngestProgress(total=9)
+        counts = await ingest_claims(read_claims(str(path)), progress, concurrency=1, checkpoint=checkpoint)
+
+    assert counts == {"analyzed": 6, "cached": 2, "invalid": 1, "failed": 0}
+    assert analyze.await_count == 6
+    assert load_checkpoint(checkpoint) == 9
+    result_cache.clear()
+    assert await result_cache.get(make_cache_key(claims[3], "en")) == ANALYSIS  # from the persistent tier
+
+
+@pytest.mark.asyncio
+async def test_ingest_resumes_after_checkpoint(tmp_path):
+    path = tmp_path / "claims.jsonl"
+    _write_jsonl(path, [{"claim": f"Claim number {i} about public health policy"} for i in range(5)])
+    (tmp_path / "claims.jsonl.checkpoint").write_text(json.dumps({"done": 3}))
+
+    analyze = AsyncMock(side_effect=[ANALYSIS, RuntimeError("upstream down")])
+    args = build_parser().parse_args(["ingest", str(path), "--concurrency", "2"])
+    with patch("app.services.fact_check_service.analyze_claim", new=analyze):
+        assert await ingest(args) == 1
+
+    assert analyze.await_count == 2
+    assert sorted(call.args[0] for call in analyze.await_args_list) == [
+        "Claim number 3 about public health policy", "Claim number 4 about public health policy"
+    ]
+    assert load_checkpoint(str(tmp_path / "claims.jsonl.checkpoint")) == 5
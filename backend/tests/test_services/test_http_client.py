@@ -0,0 +1,31 @@
+import pytest
+from app.services.http_client import HTTPClientRegistry
+
+
+@pytest.mark.asyncio
+async def test_registry_reuses_client_per_upstream():
+    """The same pooled client is handed out until the registry is closed."""
+    registry = HTTPClientRegistry()
+    llm = registry.get("llm")
+    assert registry.get("llm") is llm
+    assert registry.get("creem") is not llm
+    assert str(llm.base_url).startswith("https://")
+    
+    await registry.aclose()
+    assert llm.is_closed
+    assert registry.get("llm") is not llm
+    await registry.aclose()
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_and_wait_metric(client):
+    """Pool stats are reported per upstream and exported on /metrics."""
+    registry = HTTPClientRegistry()
+    registry.get("llm")
+    stats = registry.pool_stats()
+    assert stats["llm"] == {"in_use": 0, "idle": 0, "queued": 0}
+    await registry.aclose()
+    
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert "http_client_pool_wait_seconds" in response.text
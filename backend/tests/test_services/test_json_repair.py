@@ -0,0 +1,78 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.services.json_repair import extract_object, loads_tolerant, repair_json
+from app.services.llm_service import AnalysisParseError, complete_analysis, parse_analysis
+
+VALID = {
+    "credibility_score": 40,
+    "credibility_level": "medium",
+    "summary": "Partly accurate",
+    "key_points": [{"point": "p", "assessment": "uncertain", "explanation": "e"}],
+    "contradictions": [],
+    "source_analysis": {"likely_origin": "news", "spread_pattern": "shares", "red_flags": []}
+}
+
+
+def test_extract_object_ignores_surrounding_prose():
+    text = 'Sure, here it is:\n```json\n{"a": "}", "b": {"c": 1}}\n```\nLet me know!'
+    assert extract_object(text) == '{"a": "}", "b": {"c": 1}}'
+    assert extract_object("no json here") is None
+
+
+def test_repairs_common_defects():
+    data, repairs = loads_tolerant("{'a': True, 'b': [1, 2,], // note\n \"c\": \"two\nlines\",}")
+    assert data == {"a": True, "b": [1, 2], "c": "two\nlines"}
+    assert repairs == {"single_quotes", "python_literal", "trailing_comma", "comment", "control_character"}
+
+
+def test_truncated_output_is_cut_to_last_complete_member():
+    text, repairs = repair_json('{"score": 30, "points": [{"p": "a"}, {"p": "b", "e": "cut mid-sent')
+    assert json.loads(text) == {"score": 30, "points": [{"p": "a"}, {"p": "b"}]}
+    assert "truncated" in repairs
+
+
+def test_parse_analysis_fills_defaults():
+    result = parse_analysis('{"credibility_score": "82", "summary": "Accurate", "key_points": [{"point": "p"}]}', "en")
+    
+    assert result["credibility_score"] == 82
+    assert result["credibility_level"] == "high"
+    assert result["key_points"] == [{"point": "p", "assessment": "uncertain", "explanation": ""}]
+    assert result["contradictions"] == []
+    assert result["source_analysis"]["red_flags"] == []
+    assert result["disclaimer"]
+
+
+def test_parse_analysis_rejects_missing_required_fields():
+    with pytest.raises(AnalysisParseError):
+        parse_analysis('{"credibility_level": "low"}', "en")
+
+
+def test_out_of_range_score_without_level_is_a_parse_error():
+    with pytest.raises(AnalysisParseError):
+        parse_analysis('{"credibility_score": -5, "summary": "x"}', "en")
+
+
+@pytest.mark.asyncio
+async def test_out_of_range_score_is_reasked():
+    completion = {"choices": [{"message": {"content": json.dumps(VALID)}}], "usage": {}}
+    complete = AsyncMock(return_value=completion)
+    
+    with patch("app.services.llm_service._complete", new=complete):
+        result = await complete_analysis("Some claim", "en", '{"credibility_score": -5, "summary": "x"}')
+    
+    assert result["summary"] == "Partly accurate"
+    assert complete.await_count == 1
+
+@pytest.mark.asyncio
+async def test_unrepairable_output_is_reasked_once():
+    completion = {"choices": [{"message": {"content": json.dumps(VALID)}}], "usage": {}}
+    complete = AsyncMock(return_value=completion)
+    
+    with patch("app.services.llm_service._complete", new=complete):
+        result = await complete_analysis("Some claim", "en", "I am unable to produce JSON for this.")
+    
+    assert result["summary"] == "Partly accurate"
+    assert complete.await_count == 1
+    payload = complete.await_args.args[0]
+    assert payload["messages"][-2] == {"role": "assistant", "content": "I am unable to produce JSON for this."}
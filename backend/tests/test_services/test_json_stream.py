@@ -0,0 +1,48 @@
+from app.services.json_stream import IncrementalObjectParser
+
+DOCUMENT = (
+    'Here is the analysis:\n```json\n'
+    '{"credibility_score": 30, "summary": "Mostly \\"false\\" {really}", '
+    '"key_points": [{"point": "p1", "explanation": "e[1]"}, {"point": "p2", "explanation": "e2"}], '
+    '"source_analysis": {"likely_origin": "satire", "red_flags": ["no source"]}}\n```'
+)
+
+
+def _parse(chunk_size):
+    parser = IncrementalObjectParser()
+    events = []
+    for start in range(0, len(DOCUMENT), chunk_size):
+        events += parser.feed(DOCUMENT[start:start + chunk_size])
+    return parser, events
+
+
+def test_events_are_independent_of_chunking():
+    expected = _parse(len(DOCUMENT))[1]
+    for size in (1, 2, 5, 17):
+        assert _parse(size)[1] == expected
+
+
+def test_fields_and_array_items_are_emitted_in_order():
+    parser, events = _parse(3)
+    
+    assert [(kind, key) for kind, key, _ in events] == [
+        ("field", "credibility_score"),
+        ("field", "summary"),
+        ("item", "key_points"),
+        ("item", "key_points"),
+        ("field", "key_points"),
+        ("field", "source_analysis"),
+    ]
+    assert events[1][2] == 'Mostly "false" {really}'
+    assert events[2][2] == {"point": "p1", "explanation": "e[1]"}
+    assert parser.done
+    assert parser.object_text.startswith("{") and parser.object_text.endswith("}")
+
+
+def test_incomplete_object_is_not_done():
+    parser = IncrementalObjectParser()
+    events = parser.feed('{"credibility_score": 30, "summary": "trunc')
+    
+    assert events == [("field", "credibility_score", 30)]
+    assert not parser.done
+    assert parser.object_text is None
@@ -0,0 +1,21 @@
+import json
+from app.services.locales import LocaleTable, locales
+from app.services.llm_service import get_disclaimer
+from app.services.prompt_builder import build_prompt
+
+
+def test_unknown_languages_fall_back_to_english():
+    assert get_disclaimer("xx") == get_disclaimer("en")
+    assert "English" in build_prompt("Some claim to check here", "xx", "m").payload["messages"][1]["content"]
+    assert set(locales.languages) >= {"en", "zh", "ja", "de", "fr", "ko", "es"}
+
+
+def test_language_added_by_file(tmp_path):
+    (tmp_path / "en.json").write_text(json.dumps({"disclaimer": "For reference only.", "language_instruction": "Respond in English."}))
+    (tmp_path / "it.json").write_text(json.dumps({"language_instruction": "Rispondi in italiano."}))
+    table = LocaleTable(str(tmp_path))
+
+    assert table.languages == ["en", "it"]
+    assert table.get("it", "language_instruction") == "Rispondi in italiano."
+    assert table.get("it", "disclaimer") == "For reference only."  # missing keys come from English
+    assert not table.get("it", "dense_script")
@@ -0,0 +1,80 @@
+import pytest
+from unittest.mock import AsyncMock
+from app.services.model_router import ModelRoute, ModelRouter, ModelSpec
+from app.services.resilience import CircuitBreaker, ResilientCaller, UpstreamError
+
+SHORT_CLAIM = "Bananas are berries"
+LONG_CLAIM = "A very long claim about economics " * 20
+
+
+def make_router(**kwargs) -> ModelRouter:
+    specs = [
+        ModelSpec(name="large", cost=1.0, expected_latency=10.0),
+        ModelSpec(name="small", cost=0.2, expected_latency=2.0, max_claim_chars=280, languages=["en", "de"]),
+    ]
+    routes = [
+        ModelRoute(spec, ResilientCaller(spec.name, CircuitBreaker(spec.name, 5, 30.0), attempts=1))
+        for spec in specs
+    ]
+    return ModelRouter(routes, **kwargs)
+
+
+def test_plan_by_length_language_and_latency():
+    router = make_router(latency_weight=0.1)
+    assert [route.name for route in router.plan(SHORT_CLAIM, "en")] == ["small", "large"]
+    assert [route.name for route in router.plan(LONG_CLAIM, "en")] == ["large"]
+    assert [route.name for route in router.plan(SHORT_CLAIM, "ja")] == ["large"]
+    
+    # Observed latency outweighs the small model's lower cost
+    small = router.routes[1]
+    for _ in range(10):
+        small.caller.latencies.add(30.0)
+    assert router.plan(SHORT_CLAIM, "en")[0].name == "large"
+
+
+def test_fingerprint_follows_the_model_configuration():
+    router = make_router()
+    assert router.fingerprint == make_router().fingerprint
+    router.routes[1].spec = ModelSpec(name="small-v2", cost=0.2, expected_latency=2.0, max_claim_chars=280)
+    assert router.fingerprint != make_router().fingerprint
+
+
+@pytest.mark.asyncio
+async def test_falls_back_when_model_unavailable():
+    router = make_router()
+    
+    async def complete(model):
+        if model == "small":
+            raise UpstreamError("overloaded", 503)
+        return {"answer": model}
+    
+    result, model, latency = await router.call(SHORT_CLAIM, "en", complete)
+    assert result == {"answer": "large"}
+    assert model == "large"
+    assert latency >= 0
+    assert router.routes[1].error_rate() == 1.0
+
+
+@pytest.mark.asyncio
+async def test_other_errors_do_not_fall_back():
+    router = make_router()
+    complete = AsyncMock(side_effect=UpstreamError("bad request", 400))
+    
+    with pytest.raises(UpstreamError):
+        await router.call(SHORT_CLAIM, "en", complete)
+    assert complete.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_reports_model_used():
+    router = make_router()
+    
+    async def open_stream(model):
+        if model == "small":
+            raise UpstreamError("rate limited", 429)
+        yield "chunk"
+    
+    info = {}
+    chunks = [chunk async for chunk in router.stream(SHORT_CLAIM, "en", open_stream, info)]
+    assert chunks == ["chunk"]
+    assert info["model"] == "large"
@@ -0,0 +1,59 @@
+import json
+from app.config import get_settings
+from app.services.prompt_builder import SYSTEM_PROMPT, build_prompt, compact_claim, estimate_tokens, output_budget
+
+
+def test_static_prefix_is_identical_across_claims_and_languages(monkeypatch):
+    monkeypatch.setattr(get_settings(), "LLM_PROMPT_CACHE_MIN_TOKENS", 0)
+    first = build_prompt("The moon is made of cheese.", "en", "model-a").payload
+    second = build_prompt("地球是平的。", "zh", "model-a").payload
+    assert json.dumps(first["messages"][0]) == json.dumps(second["messages"][0])
+    block = first["messages"][0]["content"][0]
+    assert block["text"] == SYSTEM_PROMPT
+    assert block["cache_control"] == {"type": "ephemeral"}
+    # Everything request-specific comes after the prefix
+    assert "cheese" in first["messages"][1]["content"]
+    assert "用中文回复" in second["messages"][1]["content"]
+
+
+def test_no_cache_hint_on_a_prefix_too_short_to_cache():
+    assert estimate_tokens(SYSTEM_PROMPT) < get_settings().LLM_PROMPT_CACHE_MIN_TOKENS
+    message = build_prompt("The moon is made of cheese.", "en", "model-a").payload["messages"][0]
+    assert message == {"role": "system", "content": SYSTEM_PROMPT}
+
+
+def test_compact_claim_strips_noise():
+    claim = (
+        "Read this!!!! https://example.com/news/article?utm_source=x#top\n\n\n"
+        "Vaccines cause it. Vaccines cause it. Share now???"
+    )
+    assert compact_claim(claim, 1000) == "Read this! example.com/news/article Vaccines cause it. Share now?"
+
+
+def test_compact_claim_keeps_head_and_tail():
+    claim = "start " + "x" * 5000 + " end"
+    compacted = compact_claim(claim, 300)
+    assert compacted.startswith("start ")
+    assert compacted.endswith(" end")
+    assert len(compacted) < 320
+
+
+def test_short_claims_are_sent_verbatim():
+    claim = "Drinking water!!! cures everything http://x.io/a?b=c"
+    plan = build_prompt(claim, "en", "model-a")
+    assert claim in plan.payload["messages"][1]["content"]
+    assert plan.compacted_chars == 0
+
+
+def test_output_budget_scales_and_is_clamped():
+    settings = get_settings()
+    one = output_budget("One claim.", "en")
+    three = output_budget("One. Two. Three.", "en")
+    assert settings.LLM_MIN_OUTPUT_TOKENS <= one < three
+    assert output_budget("One. Two. Three.", "ja") > three
+    assert output_budget("x. " * 50, "ko") == settings.LLM_MAX_OUTPUT_TOKENS
+
+
+def test_estimate_tokens_counts_cjk_per_character():
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("地球是平的") == 5
@@ -0,0 +1,109 @@
+import asyncio
+import pytest
+from app.services.rate_limit import ConcurrencyGovernor, RateLimiter, RateLimitExceeded, check_rate_limit
+from app.services.resilience import LLMBusyError, is_unavailable
+
+
+@pytest.mark.asyncio
+async def test_bucket_allows_burst_then_refills(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("app.services.rate_limit.time.monotonic", lambda: now[0])
+    limiter = RateLimiter("device", rate=0.5, burst=3, max_keys=10)
+    
+    assert [await limiter.hit("a") for _ in range(3)] == [0, 0, 0]
+    assert await limiter.hit("a") == pytest.approx(2.0)
+    assert await limiter.hit("b") == 0  # other keys have their own bucket
+    
+    now[0] += 2.0
+    assert await limiter.hit("a") == 0
+    assert await limiter.hit("a") > 0
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_keys_are_evicted():
+    limiter = RateLimiter("ip", rate=1, burst=1, max_keys=2)
+    for key in ("a", "b", "c"):
+        await limiter.hit(key)
+    assert len(limiter) == 2
+    assert await limiter.hit("a") == 0  # forgotten, so it starts with a full bucket
+
+
+@pytest.mark.asyncio
+async def test_refused_request_is_not_charged_to_the_other_bucket(monkeypatch):
+    device = RateLimiter("device", rate=0.01, burst=5, max_keys=10)
+    ip = RateLimiter("ip", rate=0.01, burst=1, max_keys=10)
+    monkeypatch.setattr("app.services.rate_limit.device_limiter", device)
+    monkeypatch.setattr("app.services.rate_limit.ip_limiter", ip)
+    
+    await check_rate_limit("dev-1", "198.51.100.7")
+    for _ in range(3):
+        with pytest.raises(RateLimitExceeded) as refused:
+            await check_rate_limit("dev-1", "198.51.100.7")  # the IP's bucket is empty
+        assert refused.value.scope == "ip"
+    
+    assert await device.wait("dev-1") == 0
+    assert [await device.hit("dev-1") for _ in range(4)] == [0, 0, 0, 0]  # only the first request was charged
+
+
+async def _hold(governor, order, name, priority, key, release: asyncio.Event):
+    async with governor.slot(priority, key):
+        order.append(name)
+        await release.wait()
+
+
+@pytest.mark.asyncio
+async def test_governor_serves_paid_first_and_devices_in_turn():
+    governor = ConcurrencyGovernor(max_concurrency=1, max_queue=10, queue_timeout=5, weights={"paid": 2, "free": 1})
+    order = []
+    go = asyncio.Event()
+    go.set()
+    
+    await governor.acquire("free", "holder")
+    waiters = [
+        ("free-a1", "free", "a"), ("free-a2", "free", "a"), ("free-b1", "free", "b"),
+        ("paid-c1", "paid", "c"), ("paid-c2", "paid", "c"), ("paid-d1", "paid", "d"),
+    ]
+    tasks = []
+    for name, priority, key in waiters:
+        tasks.append(asyncio.create_task(_hold(governor, order, name, priority, key, go)))
+        await asyncio.sleep(0)
+    assert governor.depth() == 6
+    
+    governor.release()
+    await asyncio.gather(*tasks)
+    # Two paid grants per free one; within a class devices alternate
+    assert order == ["paid-c1", "paid-d1", "free-a1", "paid-c2", "free-b1", "free-a2"]
+    assert governor.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_governor_rejects_when_queue_full_or_wait_too_long():
+    governor = ConcurrencyGovernor(max_concurrency=1, max_queue=1, queue_timeout=0.05, weights={"paid": 4, "free": 1})
+    await governor.acquire()
+    
+    waiting = asyncio.create_task(governor.acquire("paid", "x"))
+    await asyncio.sleep(0)
+    with pytest.raises(LLMBusyError) as full:
+        await governor.acquire("free", "y")
+    assert is_unavailable(full.value)
+    
+    with pytest.raises(LLMBusyError):
+        await waiting
+    assert governor.depth() == 0
+    governor.release()
+    assert governor.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_a_slot():
+    governor = ConcurrencyGovernor(max_concurrency=1, max_queue=5, queue_timeout=5, weights={"paid": 4, "free": 1})
+    await governor.acquire()
+    waiting = asyncio.create_task(governor.acquire("free", "x"))
+    await asyncio.sleep(0)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    
+    governor.release()
+    assert governor.in_flight == 0
+    assert governor.depth() == 0
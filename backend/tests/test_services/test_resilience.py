@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.services.fact_check_service import run_fact_check
+from app.services.resilience import CircuitBreaker, CircuitOpenError, ResilientCaller, UpstreamError
+from app.services.result_cache import make_cache_key, result_cache
+
+
+def make_caller(**kwargs) -> ResilientCaller:
+    breaker = CircuitBreaker("test", failure_threshold=kwargs.pop("failure_threshold", 5),
+                             reset_timeout=kwargs.pop("reset_timeout", 30.0))
+    return ResilientCaller("test", breaker, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_retries_honor_retry_after():
+    caller = make_caller(attempts=3, base_delay=0.01, max_delay=5.0)
+    fn = AsyncMock(side_effect=[UpstreamError("busy", 429, retry_after=2.0), UpstreamError("down", 503), "ok"])
+    sleep = AsyncMock()
+    
+    with patch("app.services.resilience.asyncio.sleep", new=sleep):
+        assert await caller.call(fn) == "ok"
+    
+    assert fn.await_count == 3
+    assert sleep.await_args_list[0].args[0] == 2.0
+    assert sleep.await_args_list[1].args[0] <= 0.02
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried():
+    caller = make_caller(attempts=3)
+    fn = AsyncMock(side_effect=UpstreamError("bad request", 400))
+    
+    with pytest.raises(UpstreamError):
+        await caller.call(fn)
+    assert fn.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_then_recovers():
+    caller = make_caller(attempts=1, failure_threshold=2, reset_timeout=0.05)
+    failing = AsyncMock(side_effect=UpstreamError("down", 502))
+    
+    for _ in range(2):
+        with pytest.raises(UpstreamError):
+            await caller.call(failing)
+    assert caller.breaker.state == "open"
+    
+    with pytest.raises(CircuitOpenError):
+        await caller.call(failing)
+    assert failing.await_count == 2  # failed fast without calling the upstream
+    
+    await asyncio.sleep(0.06)
+    assert await caller.call(AsyncMock(return_value="ok")) == "ok"
+    assert caller.breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_hedged_call_takes_the_faster_response():
+    caller = make_caller(hedge=True, hedge_min_delay=0.05, hedge_min_samples=1)
+    caller.latencies.add(0.01)
+    delays = iter([1.0, 0.01])
+    
+    async def fn():
+        delay = next(delays)
+        await asyncio.sleep(delay)
+        return delay
+    
+    started = asyncio.get_running_loop().time()
+    assert await caller.call(fn) == 0.01
+    assert asyncio.get_running_loop().time() - started < 0.5
+
+
+@pytest.mark.asyncio
+async def test_stale_result_served_when_llm_unavailable():
+    claim, language = "The great wall is visible from the moon", "en"
+    stale = {
+        "credibility_score": 5,
+        "credibility_level": "low",
+        "summary": "Old summary",
+        "key_points": [],
+        "contradictions": [],
+        "source_analysis": {"likely_origin": "myth", "spread_pattern": "word of mouth", "red_flags": []},
+        "disclaimer": "d"
+    }
+    with patch.object(result_cache, "ttl", 0):
+        await result_cache.set(make_cache_key(claim, language), stale, language)
+    
+    with patch("app.services.fact_check_service.analyze_claim", new=AsyncMock(side_effect=CircuitOpenError("llm", 30))):
+        result = await run_fact_check(claim, language)
+    assert result["summary"] == "Old summary"
+    assert result["stale"] is True
+    
+    with patch("app.services.fact_check_service.analyze_claim", new=AsyncMock(side_effect=ValueError("bad JSON"))):
+        with pytest.raises(ValueError):
+            await run_fact_check(claim, language)
@@ -0,0 +1,52 @@
+import orjson
+import pytest
+from app.services.result_cache import ResultCache, make_cache_key
+
+
+def test_cache_key_normalizes_claim():
+    assert make_cache_key("Vaccines  cause AUTISM", "en") == make_cache_key(" vaccines cause autism ", "en")
+    assert make_cache_key("Vaccines cause autism", "en") != make_cache_key("Vaccines cause autism", "de")
+    assert make_cache_key("Vaccines cause autism", "en") != make_cache_key("Vaccines cause autism", "en", models="other")
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_by_entry_count():
+    cache = ResultCache(ttl=60, max_entries=2, max_bytes=1 << 20, persistent=False)
+    await cache.set("a", {"n": 1}, "en")
+    await cache.set("b", {"n": 2}, "en")
+    assert await cache.get("a") == {"n": 1}  # "a" becomes most recently used
+    await cache.set("c", {"n": 3}, "en")
+    
+    assert await cache.get("b") is None
+    assert await cache.get("a") == {"n": 1}
+    assert await cache.get("c") == {"n": 3}
+
+
+@pytest.mark.asyncio
+async def test_size_is_counted_in_bytes():
+    result = {"summary": "Ärzte bestätigen: 確認済み"}
+    size = len(orjson.dumps(result))
+    cache = ResultCache(ttl=60, max_entries=10, max_bytes=size, persistent=False)
+    await cache.set("a", result, "de")
+    assert cache._bytes == size > len(orjson.dumps(result).decode())
+    await cache.set("b", result, "de")  # evicts "a" to stay within max_bytes
+    assert await cache.get("a") is None
+    assert cache._bytes == size
+
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_dropped():
+    cache = ResultCache(ttl=0, max_entries=10, max_bytes=1 << 20, persistent=False)
+    await cache.set("a", {"n": 1}, "en")
+    assert await cache.get("a") is None
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_persistent_tier_survives_memory_loss():
+    cache = ResultCache(ttl=60, max_entries=10, max_bytes=1 << 20, persistent=True)
+    await cache.set("a", {"n": 1}, "en")
+    cache.clear()
+    
+    assert await cache.get("a") == {"n": 1}
+    assert len(cache) == 1  # promoted back into memory
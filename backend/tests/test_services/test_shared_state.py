@@ -0,0 +1,141 @@
+import asyncio
+import os
+import subprocess
+import sys
+import pytest
+import pytest_asyncio
+from benchmarks.fake_kv import start_fake_kv
+from app.services.rate_limit import RateLimiter
+from app.services.shared_state import MemoryState, RespState, SharedStateError
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest_asyncio.fixture(params=["memory", "resp"])
+async def state(request):
+    if request.param == "memory":
+        yield MemoryState()
+        return
+    server, _ = await start_fake_kv(password="secret")
+    port = server.sockets[0].getsockname()[1]
+    backend = RespState(f"redis://:secret@127.0.0.1:{port}/1", pool_size=4, timeout=1.0)
+    yield backend
+    await backend.close()
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_get_set_delete(state):
+    assert await state.get("missing") is None
+    assert await state.set("key", "one")
+    assert not await state.set("key", "two", only_if_absent=True)
+    assert await state.get("key") == "one"
+    await state.delete("key")
+    assert await state.get("key") is None
+
+
+@pytest.mark.asyncio
+async def test_values_expire(state):
+    await state.set("short", "value", ttl=0.05)
+    assert await state.get("short") == "value"
+    await asyncio.sleep(0.1)
+    assert await state.get("short") is None
+
+
+@pytest.mark.asyncio
+async def test_incr_keeps_the_expiry_it_was_created_with(state):
+    assert await state.incr("counter", ttl=0.1) == 1
+    assert await state.incr("counter", 4, ttl=10) == 5
+    await asyncio.sleep(0.15)
+    assert await state.incr("counter", ttl=0.1) == 1
+
+
+@pytest.mark.asyncio
+async def test_delete_if_equals(state):
+    await state.set("key", "mine")
+    assert not await state.delete_if_equals("key", "theirs")
+    assert await state.get("key") == "mine"
+    assert await state.delete_if_equals("key", "mine")
+    assert await state.get("key") is None
+    assert not await state.delete_if_equals("key", "mine")
+
+
+@pytest.mark.asyncio
+async def test_lock_is_exclusive(state):
+    async with state.lock("job", ttl=5) as first:
+        assert first
+        async with state.lock("job", ttl=5, wait=0.1) as second:
+            assert not second
+    async with state.lock("job", ttl=5) as again:
+        assert again
+
+
+@pytest.mark.asyncio
+async def test_expired_holder_does_not_release_the_next_holders_lock(state):
+    stale = state.lock("job", ttl=0.05)
+    assert await stale.__aenter__()
+    await asyncio.sleep(0.1)  # the first holder overruns its ttl
+    async with state.lock("job", ttl=5) as second:
+        assert second
+        await stale.__aexit__(None, None, None)  # the late holder finishes
+        async with state.lock("job", ttl=5) as third:
+            assert not third  # still held by the second holder
+
+@pytest.mark.asyncio
+async def test_error_reply_raises_and_keeps_connection():
+    server, _ = await start_fake_kv()
+    backend = RespState(f"redis://127.0.0.1:{server.sockets[0].getsockname()[1]}")
+    await backend.set("text", "abc")
+    with pytest.raises(SharedStateError):
+        await backend.incr("text")
+    assert await backend.get("text") == "abc"
+    await backend.close()
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_unreachable_backend_raises_shared_state_error():
+    backend = RespState("redis://127.0.0.1:1", timeout=0.2)
+    with pytest.raises(SharedStateError):
+        await backend.get("key")
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_counts_across_workers():
+    server, _ = await start_fake_kv()
+    url = f"redis://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+    workers = [RespState(url), RespState(url)]
+    limiters = [RateLimiter("device", rate=0.01, burst=3, max_keys=10, state=backend) for backend in workers]
+
+    results = [await limiters[i % 2].hit("dev-1") for i in range(4)]
+    assert results[:3] == [0.0, 0.0, 0.0]
+    assert 0 < results[3] <= 300
+
+    for backend in workers:
+        await backend.close()
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_fails_open_without_backend():
+    limiter = RateLimiter("device", rate=1.0, burst=1, max_keys=10, state=RespState("redis://127.0.0.1:1", timeout=0.2))
+    assert [await limiter.hit("dev-1") for _ in range(3)] == [0.0, 0.0, 0.0]
+
+
+def test_multiprocess_metrics_are_summed(tmp_path):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path), TOOL_NAME="fact-checker")
+    increment = (
+        "from app.metrics import TOOL_NAME, shared_state_errors;"
+        "shared_state_errors.labels(tool=TOOL_NAME, kind='reply').inc(2)"
+    )
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", increment], cwd=BACKEND_DIR, env=env, check=True)
+
+    scrape = "import asyncio; from app.metrics import metrics; print(asyncio.run(metrics()).body.decode())"
+    output = subprocess.run(
+        [sys.executable, "-c", scrape], cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    assert 'shared_state_errors_total{kind="reply",tool="fact-checker"} 4.0' in output
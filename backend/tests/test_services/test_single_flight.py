@@ -0,0 +1,72 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from app.services.fact_check_service import run_fact_check
+from app.services.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    calls = 0
+    
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "done"
+    
+    results = await asyncio.gather(*[flight.do("key", work) for _ in range(5)])
+    
+    assert calls == 1
+    assert [value for value, _ in results] == ["done"] * 5
+    assert sum(shared for _, shared in results) == 4
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_caller():
+    flight = SingleFlight("test")
+    
+    async def work():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+    
+    results = await asyncio.gather(*[flight.do("key", work) for _ in range(3)], return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_cancel_followers():
+    flight = SingleFlight("test")
+    
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+    
+    leader = asyncio.ensure_future(flight.do("key", work))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flight.do("key", work))
+    await asyncio.sleep(0)
+    leader.cancel()
+    
+    assert await follower == ("done", True)
+
+
+@pytest.mark.asyncio
+async def test_run_fact_check_coalesces_identical_claims():
+    calls = 0
+    
+    async def slow_analyze(claim, language):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"summary": "ok"}
+    
+    with patch("app.services.fact_check_service.analyze_claim", new=slow_analyze):
+        results = await asyncio.gather(*[
+            run_fact_check("A trending claim about the election", "en") for _ in range(10)
+        ])
+    
+    assert calls == 1
+    assert all(r["summary"] == "ok" for r in results)
@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from app.services import token_service
+from app.services.token_service import (
+    add_tokens, check_and_consume_token, get_free_trial_status, get_token_balance,
+    refund_token, reserve_tokens
+)
+
+
+@pytest.mark.asyncio
+async def test_consumes_across_multiple_purchases():
+    await add_tokens("multi-device", 1, "basic", "txn_multi_1")
+    await add_tokens("multi-device", 2, "basic", "txn_multi_2")
+    
+    results = [await check_and_consume_token("multi-device") for _ in range(5)]
+    
+    assert [reason for _, reason in results] == ["paid_token"] * 3 + ["free_trial", results[4][1]]
+    assert results[4][0] is False
+    assert await get_token_balance("multi-device") == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_consumes_never_overspend():
+    """Hundreds of simultaneous consumes on one device spend exactly what it owns."""
+    await add_tokens("stress-device", 30, "standard", "txn_stress_1")
+    await add_tokens("stress-device", 20, "standard", "txn_stress_2")
+    
+    results = await asyncio.gather(*[check_and_consume_token("stress-device") for _ in range(300)])
+    
+    granted = [reason for ok, reason in results if ok]
+    assert granted.count("paid_token") == 50
+    assert granted.count("free_trial") == 1
+    assert len(granted) == 51
+    assert await get_token_balance("stress-device") == 0
+    assert await get_free_trial_status("stress-device") == (False, 0)
+
+
+@pytest.mark.asyncio
+async def test_lost_row_race_retries_paid_before_the_free_trial():
+    """A paid UPDATE that loses the row-lock race must not fall through to the free trial."""
+    await add_tokens("race-device", 1, "basic", "txn_race_1")
+    take = token_service._take_paid_token
+    misses = [True]
+    
+    async def lose_once(session, device_id):
+        if misses and misses.pop():
+            return False  # a concurrent consume held the row we picked
+        return await take(session, device_id)
+    
+    with patch("app.services.token_service._take_paid_token", new=lose_once):
+        assert await check_and_consume_token("race-device") == (True, "paid_token")
+    
+    assert await get_token_balance("race-device") == 0
+    assert await get_free_trial_status("race-device") == (True, 1)
+
+@pytest.mark.asyncio
+async def test_concurrent_reservations_never_overspend():
+    await add_tokens("reserve-device", 10, "standard", "txn_reserve_1")
+    
+    results = await asyncio.gather(*[reserve_tokens("reserve-device", 3) for _ in range(20)])
+    
+    granted = [r for r in results if r is not None]
+    assert sum(r["paid_token"] + r["free_trial"] for r in granted) <= 11
+    assert len(granted) == 3  # 3 + 3 + 3 paid; a 4th would need 1 paid + 2 trial
+    assert await get_token_balance("reserve-device") == 1
+
+
+@pytest.mark.asyncio
+async def test_refund_restores_balance():
+    await add_tokens("refund-device", 2, "basic", "txn_refund_1")
+    await check_and_consume_token("refund-device")
+    await check_and_consume_token("refund-device")
+    await check_and_consume_token("refund-device")  # free trial
+    
+    await refund_token("refund-device", "paid_token", count=5)
+    await refund_token("refund-device", "free_trial")
+    
+    assert await get_token_balance("refund-device") == 2
+    assert await get_free_trial_status("refund-device") == (True, 1)
@@ -0,0 +1,138 @@
+import asyncio
+from datetime import datetime
+import pytest
+from unittest.mock import patch
+from prometheus_client import REGISTRY
+from sqlalchemy import select
+from app.database import get_db_session
+from app.metrics import TOOL_NAME
+from app.models.cache import CachedResult
+from app.models.ledger import RequestLedgerEntry
+from app.models.token import DeviceUsage
+from app.services.accounting import RequestCost
+from app.services.token_service import add_tokens, check_and_consume_token, get_balance
+from app.services.write_behind import WriteBehind, write_behind
+
+
+def _commits() -> float:
+    return REGISTRY.get_sample_value("db_commits_total", {"tool": TOOL_NAME}) or 0.0
+
+
+def _cached(key: str, result: str) -> dict:
+    return {"cache_key": key, "language": "en", "result": result, "expires_at": datetime(2100, 1, 1)}
+
+
+async def _results() -> dict:
+    async with get_db_session() as session:
+        return dict((await session.execute(select(CachedResult.cache_key, CachedResult.result))).all())
+
+
+@pytest.mark.asyncio
+async def test_buffered_writes_are_coalesced_into_one_commit():
+    buffer = WriteBehind(max_delay=60, batch_size=100, max_pending=100)
+    await buffer.start()
+    await buffer.upsert(CachedResult, _cached("a", "first"), key=("cache_key",), update=("result",))
+    await buffer.upsert(CachedResult, _cached("a", "second"), key=("cache_key",), update=("result",))
+    await buffer.upsert(CachedResult, _cached("b", "only"), key=("cache_key",), update=("result",))
+    await buffer.insert(RequestLedgerEntry, RequestCost("check", "device", "en").row())
+    assert len(buffer) == 3
+    assert await _results() == {}
+
+    commits = _commits()
+    await buffer.stop()  # flushes what is left
+    assert _commits() == commits + 1
+    assert await _results() == {"a": "second", "b": "only"}
+    assert len(buffer) == 0
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_without_waiting_for_the_delay():
+    buffer = WriteBehind(max_delay=60, batch_size=2, max_pending=100)
+    await buffer.start()
+    try:
+        await buffer.upsert(CachedResult, _cached("a", "x"), key=("cache_key",))
+        await buffer.upsert(CachedResult, _cached("b", "y"), key=("cache_key",))
+        for _ in range(50):
+            if len(buffer) == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert await _results() == {"a": "x", "b": "y"}
+    finally:
+        await buffer.stop()
+
+
+@pytest.mark.asyncio
+async def test_buffer_is_bounded_and_kept_when_a_flush_fails():
+    buffer = WriteBehind(max_delay=60, batch_size=100, max_pending=3)
+    await buffer.start()
+    for device in ("a", "b", "c", "d"):
+        await buffer.insert(RequestLedgerEntry, RequestCost("check", device, "en").row())
+    assert len(buffer) == 3
+
+    with patch("app.services.write_behind.get_write_session", side_effect=RuntimeError("database down")):
+        assert await buffer.flush() == 0
+    assert len(buffer) == 3
+
+    await buffer.stop()
+    async with get_db_session() as session:
+        devices = (await session.execute(select(RequestLedgerEntry.device_id))).scalars().all()
+    assert sorted(devices) == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_token_use_stays_exact_while_activity_is_written_behind():
+    await add_tokens("busy-device", 20, "standard", "txn_busy_1")
+    await write_behind.start()
+    try:
+        results = await asyncio.gather(*[check_and_consume_token("busy-device") for _ in range(40)])
+        # The balance is read from the database while activity rows are still buffered
+        assert sum(ok for ok, _ in results) == 21
+        assert await get_balance("busy-device") == (0, 0)
+    finally:
+        await write_behind.stop()
+
+    async with get_db_session() as session:
+        usage = (await session.execute(select(DeviceUsage).where(DeviceUsage.device_id == "busy-device"))).scalar_one()
+    assert usage.usage_count == 1 and usage.updated_at is not None
+
+
+@pytest.mark.asyncio
+async def test_stop_during_a_slow_flush_loses_nothing():
+    buffer = WriteBehind(max_delay=60, batch_size=2, max_pending=100)
+    apply = buffer._apply
+    started = asyncio.Event()
+
+    async def slow_apply(inserts, upserts):
+        started.set()
+        await asyncio.sleep(0.2)
+        await apply(inserts, upserts)
+
+    await buffer.start()
+    with patch.object(buffer, "_apply", side_effect=slow_apply):
+        await buffer.upsert(CachedResult, _cached("a", "x"), key=("cache_key",))
+        await buffer.upsert(CachedResult, _cached("b", "y"), key=("cache_key",))
+        await started.wait()  # the background flush is now inside _apply
+        await buffer.upsert(CachedResult, _cached("c", "z"), key=("cache_key",))
+        await buffer.stop()
+
+    assert await _results() == {"a": "x", "b": "y", "c": "z"}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_flush_keeps_its_rows():
+    buffer = WriteBehind(max_delay=60, batch_size=100, max_pending=100)
+    await buffer.start()
+    await buffer.upsert(CachedResult, _cached("a", "x"), key=("cache_key",))
+
+    async def hang(inserts, upserts):
+        await asyncio.sleep(10)
+
+    with patch.object(buffer, "_apply", side_effect=hang):
+        flush = asyncio.create_task(buffer.flush())
+        await asyncio.sleep(0.01)
+        flush.cancel()
+        await asyncio.gather(flush, return_exceptions=True)
+    assert len(buffer) == 1
+
+    await buffer.stop()
+    assert await _results() == {"a": "x"}